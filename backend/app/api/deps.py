@@ -0,0 +1,55 @@
+"""
+Dependencias compartidas de los endpoints de la API
+"""
+
+from typing import Any, Dict
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+import structlog
+
+from app.services.auth_service import AuthService
+
+logger = structlog.get_logger()
+security = HTTPBearer()
+
+# AuthService no guarda estado por petición: una instancia por worker
+auth_service = AuthService()
+
+
+async def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Dict[str, Any]:
+    """
+    Claims del token de la petición.
+    
+    El resultado se memoriza en `request.state.principal`, de modo que
+    middlewares o dependencias posteriores de la misma petición no vuelven
+    a verificar el token.
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+    
+    try:
+        user_data = await auth_service.verify_token(credentials.credentials)
+    except Exception as e:
+        logger.error("Error verifying token", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    
+    if not user_data.get("user_id"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials"
+        )
+    
+    request.state.principal = user_data
+    return user_data
+
+
+async def get_current_user_id(user_data: Dict[str, Any] = Depends(get_current_user)) -> str:
+    """Obtener ID del usuario actual desde el token"""
+    return user_data["user_id"]
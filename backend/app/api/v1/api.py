@@ -4,7 +4,7 @@ Router principal de la API v1
 
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import campaigns, media, users, geolocation
+from app.api.v1.endpoints import campaigns, media, users, geolocation, events, decisions
 
 api_router = APIRouter()
 
@@ -32,3 +32,15 @@ api_router.include_router(
     prefix="/geolocation",
     tags=["geolocation"]
 )
+
+api_router.include_router(
+    events.router,
+    prefix="/events",
+    tags=["events"]
+)
+
+api_router.include_router(
+    decisions.router,
+    prefix="/decide",
+    tags=["decisions"]
+)
@@ -2,51 +2,48 @@
 Endpoints para gestión de campañas
 """
 
+from datetime import datetime
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.security import HTTPBearer
 import structlog
 
 from app.models.campaign import (
     Campaign, CampaignCreate, CampaignUpdate, CampaignList, 
-    CampaignStats, CampaignStatus
+    CampaignStats, CampaignStatus, SearchMode, MetricGranularity, CampaignSummary
 )
 from app.services.campaign_service import CampaignService
-from app.services.auth_service import AuthService
+from app.services.targeting_service import notify_campaign_changed
+from app.api.deps import get_current_user_id
+from app.core.config import settings
 from app.core.database import get_database
 from app.core.redis_client import get_cache
 from app.core.exceptions import NotFoundError, ValidationError
+from app.core.pagination import TotalMode
 
 logger = structlog.get_logger()
 router = APIRouter()
-security = HTTPBearer()
 
 
-async def get_current_user_id(token: str = Depends(security)):
-    """Obtener ID del usuario actual desde el token"""
-    auth_service = AuthService()
-    try:
-        user_data = await auth_service.verify_token(token.credentials)
-        return user_data.get("user_id")
-    except Exception as e:
-        logger.error("Error verifying token", error=str(e))
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
+def user_campaigns_tag(user_id: str) -> str:
+    """Etiqueta de caché que agrupa los listados de campañas de un usuario"""
+    return f"campaigns:{user_id}"
 
 
 @router.post("/", response_model=Campaign, status_code=status.HTTP_201_CREATED)
 async def create_campaign(
     campaign_data: CampaignCreate,
     current_user_id: str = Depends(get_current_user_id),
-    db=Depends(get_database)
+    db=Depends(get_database),
+    cache=Depends(get_cache)
 ):
     """Crear una nueva campaña"""
     try:
         campaign_service = CampaignService(db)
         campaign = await campaign_service.create_campaign(campaign_data, current_user_id)
         
+        # Invalidar listados cacheados del usuario
+        await cache.invalidate_tags(user_campaigns_tag(current_user_id))
+        
         logger.info(
             "Campaign created successfully",
             campaign_id=campaign.id,
@@ -73,35 +70,48 @@ async def create_campaign(
 async def list_campaigns(
     page: int = Query(1, ge=1, description="Número de página"),
     size: int = Query(10, ge=1, le=100, description="Tamaño de página"),
-    status: Optional[CampaignStatus] = Query(None, description="Filtrar por estado"),
+    status_filter: Optional[CampaignStatus] = Query(None, alias="status", description="Filtrar por estado"),
     search: Optional[str] = Query(None, description="Buscar por nombre"),
+    search_mode: SearchMode = Query(SearchMode.REGEX, description="Modo de búsqueda: regex, prefix o text"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente (ignora page)"),
+    total_mode: TotalMode = Query(TotalMode.EXACT, alias="total", description="Cálculo del total"),
     current_user_id: str = Depends(get_current_user_id),
     db=Depends(get_database),
     cache=Depends(get_cache)
 ):
-    """Listar campañas del usuario con paginación"""
+    """Listar campañas del usuario con paginación por offset o por cursor"""
     try:
         campaign_service = CampaignService(db)
         
-        # Intentar obtener del caché primero
-        cache_key = f"campaigns:{current_user_id}:{page}:{size}:{status}:{search}"
-        cached_result = await cache.get(cache_key)
-        
-        if cached_result:
-            logger.info("Campaigns retrieved from cache", user_id=current_user_id)
-            return CampaignList(**cached_result)
-        
-        # Obtener de la base de datos
-        campaigns_data = await campaign_service.list_campaigns(
-            user_id=current_user_id,
-            page=page,
-            size=size,
-            status=status,
-            search=search
+        cache_key = (
+            f"campaigns:{current_user_id}:{page}:{size}:{status_filter}:{search}:"
+            f"{search_mode.value}:{cursor}:{total_mode.value}"
         )
         
-        # Guardar en caché por 5 minutos
-        await cache.set(cache_key, campaigns_data.dict(), expire=300)
+        async def load_campaigns() -> dict:
+            campaigns_data = await campaign_service.list_campaigns(
+                user_id=current_user_id,
+                page=page,
+                size=size,
+                status=status_filter,
+                search=search,
+                cursor=cursor,
+                total_mode=total_mode,
+                search_mode=search_mode
+            )
+            return campaigns_data.dict()
+        
+        # Obtener del caché (5 minutos) o calcular una sola vez entre peticiones concurrentes
+        cached_result = await cache.get_or_compute(
+            cache_key,
+            load_campaigns,
+            expire=300,
+            tags=[user_campaigns_tag(current_user_id)],
+            stale_ttl=settings.CACHE_STALE_TTL_SECONDS,
+            lock_timeout=settings.CACHE_LOCK_TIMEOUT_SECONDS,
+            wait_timeout=settings.CACHE_LOCK_WAIT_SECONDS
+        )
+        campaigns_data = CampaignList(**cached_result)
         
         logger.info(
             "Campaigns retrieved successfully",
@@ -111,6 +121,11 @@ async def list_campaigns(
         
         return campaigns_data
         
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.message
+        )
     except Exception as e:
         logger.error("Error listing campaigns", error=str(e))
         raise HTTPException(
@@ -119,6 +134,71 @@ async def list_campaigns(
         )
 
 
+@router.get("/summary", response_model=CampaignSummary)
+async def get_campaigns_summary(
+    recent: int = Query(5, ge=0, le=50, description="Número de campañas recientes"),
+    current_user_id: str = Depends(get_current_user_id),
+    db=Depends(get_database),
+    cache=Depends(get_cache)
+):
+    """Resumen de las campañas del usuario para el dashboard"""
+    try:
+        campaign_service = CampaignService(db)
+        
+        async def load_summary() -> dict:
+            summary = await campaign_service.get_campaign_summary(current_user_id, recent_limit=recent)
+            return summary.dict()
+        
+        # Se invalida con los cambios de campañas del usuario; los contadores de
+        # eventos no invalidan, por eso el TTL es corto (1 minuto)
+        cached_result = await cache.get_or_compute(
+            f"campaigns:{current_user_id}:summary:{recent}",
+            load_summary,
+            expire=60,
+            tags=[user_campaigns_tag(current_user_id)],
+            stale_ttl=settings.CACHE_STALE_TTL_SECONDS,
+            lock_timeout=settings.CACHE_LOCK_TIMEOUT_SECONDS,
+            wait_timeout=settings.CACHE_LOCK_WAIT_SECONDS
+        )
+        
+        return CampaignSummary(**cached_result)
+        
+    except Exception as e:
+        logger.error("Error getting campaign summary", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error retrieving campaign summary"
+        )
+
+
+@router.get("/autocomplete", response_model=List[dict])
+async def autocomplete_campaigns(
+    q: str = Query(..., min_length=1, description="Prefijo del nombre"),
+    limit: int = Query(10, ge=1, le=50, description="Límite de resultados"),
+    current_user_id: str = Depends(get_current_user_id),
+    db=Depends(get_database)
+):
+    """Sugerir campañas por prefijo del nombre (sin distinguir mayúsculas ni acentos)"""
+    try:
+        campaign_service = CampaignService(db)
+        suggestions = await campaign_service.autocomplete_campaigns(current_user_id, q, limit)
+        
+        logger.info(
+            "Campaign autocomplete completed",
+            user_id=current_user_id,
+            results_count=len(suggestions)
+        )
+        
+        return suggestions
+        
+    except Exception as e:
+        logger.error("Error autocompleting campaigns", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error autocompleting campaigns"
+        )
+
+
 @router.get("/{campaign_id}", response_model=Campaign)
 async def get_campaign(
     campaign_id: str,
@@ -166,12 +246,7 @@ async def update_campaign(
     try:
         campaign_service = CampaignService(db)
         
-        # Verificar que la campaña existe y pertenece al usuario
-        existing_campaign = await campaign_service.get_campaign(campaign_id, current_user_id)
-        if not existing_campaign:
-            raise NotFoundError("Campaign", campaign_id)
-        
-        # Actualizar la campaña
+        # Actualizar la campaña (la propiedad se verifica en la propia operación)
         updated_campaign = await campaign_service.update_campaign(
             campaign_id, 
             campaign_data, 
@@ -179,8 +254,9 @@ async def update_campaign(
         )
         
         # Invalidar caché relacionado
-        await cache.delete_pattern(f"campaigns:{current_user_id}:*")
+        await cache.invalidate_tags(user_campaigns_tag(current_user_id))
         await cache.delete(f"campaign:{campaign_id}")
+        await notify_campaign_changed(campaign_id, updated_campaign.dict())
         
         logger.info(
             "Campaign updated successfully",
@@ -220,17 +296,13 @@ async def delete_campaign(
     try:
         campaign_service = CampaignService(db)
         
-        # Verificar que la campaña existe y pertenece al usuario
-        existing_campaign = await campaign_service.get_campaign(campaign_id, current_user_id)
-        if not existing_campaign:
-            raise NotFoundError("Campaign", campaign_id)
-        
-        # Eliminar la campaña
+        # Eliminar la campaña (la propiedad se verifica en la propia operación)
         await campaign_service.delete_campaign(campaign_id, current_user_id)
         
         # Invalidar caché relacionado
-        await cache.delete_pattern(f"campaigns:{current_user_id}:*")
+        await cache.invalidate_tags(user_campaigns_tag(current_user_id))
         await cache.delete(f"campaign:{campaign_id}")
+        await notify_campaign_changed(campaign_id)
         
         logger.info(
             "Campaign deleted successfully",
@@ -263,12 +335,7 @@ async def update_campaign_status(
     try:
         campaign_service = CampaignService(db)
         
-        # Verificar que la campaña existe y pertenece al usuario
-        existing_campaign = await campaign_service.get_campaign(campaign_id, current_user_id)
-        if not existing_campaign:
-            raise NotFoundError("Campaign", campaign_id)
-        
-        # Actualizar el estado
+        # Actualizar el estado (propiedad y transición se verifican en la propia operación)
         updated_campaign = await campaign_service.update_campaign_status(
             campaign_id, 
             new_status, 
@@ -276,8 +343,9 @@ async def update_campaign_status(
         )
         
         # Invalidar caché relacionado
-        await cache.delete_pattern(f"campaigns:{current_user_id}:*")
+        await cache.invalidate_tags(user_campaigns_tag(current_user_id))
         await cache.delete(f"campaign:{campaign_id}")
+        await notify_campaign_changed(campaign_id, updated_campaign.dict())
         
         logger.info(
             "Campaign status updated successfully",
@@ -293,6 +361,12 @@ async def update_campaign_status(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Campaign with id '{campaign_id}' not found"
         )
+    except ValidationError as e:
+        logger.error("Validation error updating campaign status", error=str(e.message))
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.message
+        )
     except Exception as e:
         logger.error("Error updating campaign status", error=str(e))
         raise HTTPException(
@@ -304,10 +378,13 @@ async def update_campaign_status(
 @router.get("/{campaign_id}/stats", response_model=CampaignStats)
 async def get_campaign_stats(
     campaign_id: str,
+    from_date: Optional[datetime] = Query(None, alias="from", description="Inicio del rango (incluido)"),
+    to_date: Optional[datetime] = Query(None, alias="to", description="Fin del rango (excluido)"),
+    granularity: Optional[MetricGranularity] = Query(None, description="Granularidad de la serie"),
     current_user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
-    """Obtener estadísticas de una campaña"""
+    """Obtener estadísticas de una campaña, acumuladas o por rango de fechas"""
     try:
         campaign_service = CampaignService(db)
         
@@ -317,7 +394,7 @@ async def get_campaign_stats(
             raise NotFoundError("Campaign", campaign_id)
         
         # Obtener estadísticas
-        stats = await campaign_service.get_campaign_stats(campaign_id)
+        stats = await campaign_service.get_campaign_stats(campaign_id, from_date, to_date, granularity)
         
         logger.info(
             "Campaign stats retrieved successfully",
@@ -332,6 +409,11 @@ async def get_campaign_stats(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Campaign with id '{campaign_id}' not found"
         )
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.message
+        )
     except Exception as e:
         logger.error("Error getting campaign stats", error=str(e))
         raise HTTPException(
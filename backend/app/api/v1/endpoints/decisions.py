@@ -0,0 +1,59 @@
+"""
+Endpoint de decisión de anuncios (campañas elegibles para una petición)
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+import structlog
+
+from app.models.decision import DecisionCampaign, DecisionRequest, DecisionResponse
+from app.services.targeting_service import get_targeting_engine
+from app.api.deps import get_current_user_id
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+
+@router.post("/", response_model=DecisionResponse)
+async def decide(
+    request: DecisionRequest,
+    current_user_id: str = Depends(get_current_user_id)
+):
+    """
+    Mejores campañas activas para la ubicación, el canal y los datos
+    demográficos de la petición, ordenadas por prioridad.
+    
+    Se resuelve en memoria con el índice de elegibilidad, sin consultar
+    MongoDB; si el índice no está cargado responde 503.
+    """
+    engine = get_targeting_engine()
+    if engine is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Decision index not available",
+            headers={"Retry-After": "5"}
+        )
+    
+    profiles = engine.decide(
+        channel=request.channel,
+        longitude=request.longitude,
+        latitude=request.latitude,
+        country=request.country,
+        region=request.region,
+        demographics=request.demographics,
+        limit=request.limit
+    )
+    
+    return DecisionResponse(
+        campaigns=[
+            DecisionCampaign(
+                id=profile.campaign_id,
+                name=profile.name,
+                channel=profile.channel,
+                priority=profile.priority,
+                budget=profile.budget,
+                media_files=profile.media_files
+            )
+            for profile in profiles
+        ],
+        count=len(profiles)
+    )
@@ -0,0 +1,57 @@
+"""
+Endpoints para ingesta de eventos de campañas (vistas, clics y conversiones)
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+import structlog
+
+from app.models.event import CampaignEvent, CampaignEventBatch, EventIngestResponse
+from app.services.event_service import get_event_aggregator
+from app.api.deps import get_current_user_id
+from app.core.exceptions import ServiceUnavailableError
+
+logger = structlog.get_logger()
+router = APIRouter()
+
+
+def _ingest(aggregator, events) -> EventIngestResponse:
+    """Acumular eventos y traducir la saturación a 503 con Retry-After"""
+    try:
+        accepted = aggregator.add_events(events)
+        return EventIngestResponse(accepted=accepted, pending=aggregator.pending_events)
+    except ServiceUnavailableError as e:
+        logger.warning("Event ingestion overloaded", pending=aggregator.pending_events)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=e.message,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+@router.post("/", response_model=EventIngestResponse, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_event(
+    event: CampaignEvent,
+    current_user_id: str = Depends(get_current_user_id),
+    aggregator=Depends(get_event_aggregator)
+):
+    """Registrar un evento; los contadores se actualizan en el siguiente volcado"""
+    return _ingest(aggregator, [event])
+
+
+@router.post("/batch", response_model=EventIngestResponse, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_event_batch(
+    batch: CampaignEventBatch,
+    current_user_id: str = Depends(get_current_user_id),
+    aggregator=Depends(get_event_aggregator)
+):
+    """Registrar un lote de eventos"""
+    return _ingest(aggregator, batch.events)
+
+
+@router.get("/stats")
+async def get_ingestion_stats(
+    current_user_id: str = Depends(get_current_user_id),
+    aggregator=Depends(get_event_aggregator)
+):
+    """Contadores del acumulador de eventos de este worker"""
+    return {**aggregator.stats, "pending": aggregator.pending_events}
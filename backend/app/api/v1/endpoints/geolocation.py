@@ -3,33 +3,20 @@ Endpoints para servicios de geolocalización
 """
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.security import HTTPBearer
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 import structlog
 
-from app.models.campaign import GeoLocation, LocationType
+from app.models.campaign import (
+    DistanceMatrixRequest, DistanceMatrixResponse, GeoLocation, LocationType, TargetedCampaigns
+)
 from app.services.geolocation_service import GeolocationService
-from app.services.auth_service import AuthService
+from app.api.deps import get_current_user_id
 from app.core.database import get_database
 from app.core.exceptions import GeolocationError, ValidationError
 
 logger = structlog.get_logger()
 router = APIRouter()
-security = HTTPBearer()
-
-
-async def get_current_user_id(token: str = Depends(security)):
-    """Obtener ID del usuario actual desde el token"""
-    auth_service = AuthService()
-    try:
-        user_data = await auth_service.verify_token(token.credentials)
-        return user_data.get("user_id")
-    except Exception as e:
-        logger.error("Error verifying token", error=str(e))
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
 
 
 @router.get("/search", response_model=List[dict])
@@ -284,3 +271,102 @@ async def calculate_distance(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error calculating distance"
         )
+
+
+@router.post("/distance-matrix", response_model=DistanceMatrixResponse)
+async def calculate_distance_matrix(
+    request: DistanceMatrixRequest,
+    current_user_id: str = Depends(get_current_user_id),
+    db=Depends(get_database)
+):
+    """Calcular distancias entre muchos puntos en una sola petición"""
+    try:
+        geolocation_service = GeolocationService(db)
+        
+        matrix = await geolocation_service.calculate_distance_matrix(
+            request.origins,
+            request.destinations,
+            request.mode
+        )
+        
+        logger.info(
+            "Distance matrix calculated successfully",
+            user_id=current_user_id,
+            rows=matrix.rows,
+            columns=matrix.columns,
+            mode=request.mode
+        )
+        
+        # Serializar fuera del event loop: con 10^6 celdas tarda décimas de segundo
+        content = await asyncio.to_thread(matrix.model_dump_json)
+        return Response(content=content, media_type="application/json")
+        
+    except ValidationError as e:
+        logger.error("Validation error", error=str(e.message))
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.message
+        )
+    except GeolocationError as e:
+        logger.error("Geolocation error", error=str(e.message))
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=e.message
+        )
+    except Exception as e:
+        logger.error("Error calculating distance matrix", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error calculating distance matrix"
+        )
+
+
+@router.get("/targeting", response_model=TargetedCampaigns)
+async def find_targeted_campaigns(
+    latitude: float = Query(..., ge=-90, le=90, description="Latitud"),
+    longitude: float = Query(..., ge=-180, le=180, description="Longitud"),
+    country: Optional[str] = Query(None, description="País del punto, para objetivos de tipo country"),
+    region: Optional[str] = Query(None, description="Región del punto, para objetivos de tipo region"),
+    current_user_id: str = Depends(get_current_user_id),
+    db=Depends(get_database)
+):
+    """Campañas activas cuyos objetivos geográficos cubren un punto"""
+    try:
+        geolocation_service = GeolocationService(db)
+        
+        targeted = await geolocation_service.find_targeted_campaigns(
+            longitude=longitude,
+            latitude=latitude,
+            country=country,
+            region=region
+        )
+        
+        logger.debug(
+            "Targeted campaigns found",
+            latitude=latitude,
+            longitude=longitude,
+            count=targeted.count,
+            source=targeted.source,
+            user_id=current_user_id
+        )
+        
+        return targeted
+        
+    except ValidationError as e:
+        logger.error("Validation error", error=str(e.message))
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.message
+        )
+    except GeolocationError as e:
+        logger.error("Geolocation error", error=str(e.message))
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=e.message
+        )
+    except Exception as e:
+        logger.error("Error finding targeted campaigns", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error finding targeted campaigns"
+        )
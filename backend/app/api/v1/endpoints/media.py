@@ -4,7 +4,6 @@ Endpoints para gestión de archivos multimedia
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, status
-from fastapi.security import HTTPBearer
 import structlog
 
 from app.models.media import (
@@ -12,27 +11,13 @@ from app.models.media import (
     MediaProcessingStatus, MediaType
 )
 from app.services.media_service import MediaService
-from app.services.auth_service import AuthService
+from app.api.deps import get_current_user_id
 from app.core.database import get_database
 from app.core.exceptions import FileUploadError, NotFoundError, ValidationError
+from app.core.pagination import TotalMode
 
 logger = structlog.get_logger()
 router = APIRouter()
-security = HTTPBearer()
-
-
-async def get_current_user_id(token: str = Depends(security)):
-    """Obtener ID del usuario actual desde el token"""
-    auth_service = AuthService()
-    try:
-        user_data = await auth_service.verify_token(token.credentials)
-        return user_data.get("user_id")
-    except Exception as e:
-        logger.error("Error verifying token", error=str(e))
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials"
-        )
 
 
 @router.post("/upload", response_model=MediaUploadResponse)
@@ -94,10 +79,12 @@ async def list_media_files(
     file_type: Optional[MediaType] = Query(None, description="Filtrar por tipo de archivo"),
     page: int = Query(1, ge=1, description="Número de página"),
     size: int = Query(10, ge=1, le=100, description="Tamaño de página"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página siguiente (ignora page)"),
+    total_mode: TotalMode = Query(TotalMode.EXACT, alias="total", description="Cálculo del total"),
     current_user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
-    """Listar archivos multimedia con paginación"""
+    """Listar archivos multimedia con paginación por offset o por cursor"""
     try:
         media_service = MediaService(db)
         
@@ -106,7 +93,9 @@ async def list_media_files(
             campaign_id=campaign_id,
             file_type=file_type,
             page=page,
-            size=size
+            size=size,
+            cursor=cursor,
+            total_mode=total_mode
         )
         
         logger.info(
@@ -117,6 +106,11 @@ async def list_media_files(
         
         return files_data
         
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.message
+        )
     except Exception as e:
         logger.error("Error listing media files", error=str(e))
         raise HTTPException(
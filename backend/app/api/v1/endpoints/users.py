@@ -3,7 +3,6 @@ Endpoints para gestión de usuarios
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import structlog
 
 from app.models.user import (
@@ -11,13 +10,12 @@ from app.models.user import (
     UserLogin, Token
 )
 from app.services.user_service import UserService
-from app.services.auth_service import AuthService
+from app.api.deps import auth_service, get_current_user, get_current_user_id
 from app.core.database import get_database
-from app.core.exceptions import NotFoundError, ValidationError, UnauthorizedError
+from app.core.exceptions import NotFoundError, ValidationError, UnauthorizedError, ServiceUnavailableError
 
 logger = structlog.get_logger()
 router = APIRouter()
-security = HTTPBearer()
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -28,7 +26,6 @@ async def register_user(
     """Registrar un nuevo usuario"""
     try:
         user_service = UserService(db)
-        auth_service = AuthService()
         
         # Verificar si el usuario ya existe
         existing_user = await user_service.get_user_by_username(user_data.username)
@@ -56,6 +53,12 @@ async def register_user(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=e.message
         )
+    except ServiceUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=e.message,
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logger.error("Error registering user", error=str(e))
         raise HTTPException(
@@ -72,7 +75,6 @@ async def login_user(
     """Iniciar sesión de usuario"""
     try:
         user_service = UserService(db)
-        auth_service = AuthService()
         
         # Verificar credenciales
         user = await auth_service.authenticate_user(
@@ -114,6 +116,12 @@ async def login_user(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=e.message
         )
+    except ServiceUnavailableError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=e.message,
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logger.error("Error logging in user", error=str(e))
         raise HTTPException(
@@ -122,23 +130,36 @@ async def login_user(
         )
 
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_user(user_data: dict = Depends(get_current_user)):
+    """Cerrar sesión revocando el token actual"""
+    try:
+        await auth_service.revoke_token(user_data)
+        
+        logger.info("User logged out successfully", user_id=user_data.get("user_id"))
+        
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.message
+        )
+    except Exception as e:
+        logger.error("Error logging out user", error=str(e))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error logging out user"
+        )
+
+
 @router.get("/me", response_model=UserResponse)
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+async def read_current_user(
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
     """Obtener información del usuario actual"""
     try:
-        auth_service = AuthService()
         user_service = UserService(db)
         
-        # Verificar token
-        user_data = await auth_service.verify_token(credentials.credentials)
-        user_id = user_data.get("user_id")
-        
-        if not user_id:
-            raise UnauthorizedError("Invalid token")
-        
         # Obtener usuario
         user = await user_service.get_user_by_id(user_id)
         if not user:
@@ -152,12 +173,6 @@ async def get_current_user(
         
         return UserResponse(**user.dict())
         
-    except UnauthorizedError as e:
-        logger.error("Authentication error", error=str(e.message))
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=e.message
-        )
     except NotFoundError as e:
         logger.error("User not found", error=str(e.message))
         raise HTTPException(
@@ -175,21 +190,13 @@ async def get_current_user(
 @router.put("/me", response_model=UserResponse)
 async def update_current_user(
     user_data: UserUpdate,
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
     """Actualizar información del usuario actual"""
     try:
-        auth_service = AuthService()
         user_service = UserService(db)
         
-        # Verificar token
-        user_data_token = await auth_service.verify_token(credentials.credentials)
-        user_id = user_data_token.get("user_id")
-        
-        if not user_id:
-            raise UnauthorizedError("Invalid token")
-        
         # Verificar que el usuario existe
         existing_user = await user_service.get_user_by_id(user_id)
         if not existing_user:
@@ -218,12 +225,6 @@ async def update_current_user(
         
         return UserResponse(**updated_user.dict())
         
-    except UnauthorizedError as e:
-        logger.error("Authentication error", error=str(e.message))
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=e.message
-        )
     except NotFoundError as e:
         logger.error("User not found", error=str(e.message))
         raise HTTPException(
@@ -246,21 +247,13 @@ async def update_current_user(
 
 @router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    user_id: str = Depends(get_current_user_id),
     db=Depends(get_database)
 ):
     """Eliminar el usuario actual"""
     try:
-        auth_service = AuthService()
         user_service = UserService(db)
         
-        # Verificar token
-        user_data = await auth_service.verify_token(credentials.credentials)
-        user_id = user_data.get("user_id")
-        
-        if not user_id:
-            raise UnauthorizedError("Invalid token")
-        
         # Verificar que el usuario existe
         existing_user = await user_service.get_user_by_id(user_id)
         if not existing_user:
@@ -268,6 +261,7 @@ async def delete_current_user(
         
         # Eliminar usuario
         await user_service.delete_user(user_id)
+        auth_service.forget_user_tokens(user_id)
         
         logger.info(
             "User deleted successfully",
@@ -275,12 +269,6 @@ async def delete_current_user(
             username=existing_user.username
         )
         
-    except UnauthorizedError as e:
-        logger.error("Authentication error", error=str(e.message))
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=e.message
-        )
     except NotFoundError as e:
         logger.error("User not found", error=str(e.message))
         raise HTTPException(
@@ -0,0 +1,49 @@
+"""
+Filtro de Bloom en memoria del proceso
+
+Responde "seguro que no está" o "puede que esté" con un único bloque de bits
+y k posiciones por elemento. No admite borrados: se reconstruye desde la
+fuente de verdad cuando hace falta descartar elementos caducados.
+"""
+
+import hashlib
+import math
+from typing import Iterable
+
+
+class BloomFilter:
+    """Filtro de Bloom dimensionado para `capacity` elementos y una tasa de falsos positivos"""
+    
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        
+        # m = -n·ln(p) / ln(2)^2 bits, k = m/n·ln(2) funciones hash
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, item: str):
+        """Posiciones de bit por doble hashing (Kirsch-Mitzenmacher) sobre blake2b"""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+    
+    def add(self, item: str):
+        """Añadir un elemento"""
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def update(self, items: Iterable[str]):
+        """Añadir varios elementos"""
+        for item in items:
+            self.add(item)
+    
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
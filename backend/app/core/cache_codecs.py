@@ -0,0 +1,238 @@
+"""
+Códecs de serialización y compresión para el caché en Redis
+
+Cada valor se guarda precedido de un byte de cabecera:
+    
+    1 c c c  k k k k
+    │ └─┬─┘  └──┬──┘
+    │   │       └── códec (1 = json, 2 = orjson, 3 = msgpack)
+    │   └────────── compresión (0 = ninguna, 1 = zstd, 2 = lz4)
+    └────────────── siempre 1
+
+Un JSON válido siempre empieza por un carácter ASCII (< 0x80), así que los
+valores guardados antes de existir la cabecera se siguen leyendo como JSON.
+La lectura acepta cualquier códec/compresión conocidos, independientemente
+de la configuración actual, lo que permite migrar de formato en caliente.
+"""
+
+import datetime
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+
+import structlog
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # dependencia opcional
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # dependencia opcional
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # dependencia opcional
+    lz4_frame = None
+
+logger = structlog.get_logger()
+
+HEADER_MARKER = 0x80
+
+CODEC_JSON = 1
+CODEC_ORJSON = 2
+CODEC_MSGPACK = 3
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZSTD = 1
+COMPRESSION_LZ4 = 2
+
+# Tipo de extensión msgpack para datetimes (microsegundos desde epoch, UTC)
+MSGPACK_EXT_DATETIME = 1
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class CacheCodec(ABC):
+    """Interfaz de un códec de serialización"""
+    
+    codec_id: int = 0
+    name: str = ""
+    
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        ...
+    
+    @abstractmethod
+    def decode(self, data: bytes) -> Any:
+        ...
+
+
+class JsonCodec(CacheCodec):
+    """JSON de la librería estándar (formato histórico del caché)"""
+    
+    codec_id = CODEC_JSON
+    name = "json"
+    
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, default=str, separators=(",", ":")).encode("utf-8")
+    
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(CacheCodec):
+    """
+    JSON con orjson.
+    
+    Los datetimes se guardan como cadenas ISO 8601; los modelos Pydantic los
+    vuelven a convertir al reconstruirse. Para conservar el tipo usar msgpack.
+    """
+    
+    codec_id = CODEC_ORJSON
+    name = "orjson"
+    
+    def encode(self, value: Any) -> bytes:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+    
+    def decode(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec(CacheCodec):
+    """MessagePack binario; conserva los datetimes mediante un tipo de extensión"""
+    
+    codec_id = CODEC_MSGPACK
+    name = "msgpack"
+    
+    @staticmethod
+    def _default(value: Any) -> Any:
+        if isinstance(value, datetime.datetime):
+            if value.tzinfo is not None:
+                value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+            micros = (value - _EPOCH) // datetime.timedelta(microseconds=1)
+            return msgpack.ExtType(MSGPACK_EXT_DATETIME, micros.to_bytes(8, "big", signed=True))
+        return str(value)
+    
+    @staticmethod
+    def _ext_hook(code: int, data: bytes) -> Any:
+        if code == MSGPACK_EXT_DATETIME:
+            micros = int.from_bytes(data, "big", signed=True)
+            return _EPOCH + datetime.timedelta(microseconds=micros)
+        return msgpack.ExtType(code, data)
+    
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=self._default, use_bin_type=True, datetime=False)
+    
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+
+
+def _available_codecs() -> Dict[int, CacheCodec]:
+    """Códecs cuyas dependencias están instaladas"""
+    codecs = {CODEC_JSON: JsonCodec()}
+    if orjson is not None:
+        codecs[CODEC_ORJSON] = OrjsonCodec()
+    if msgpack is not None:
+        codecs[CODEC_MSGPACK] = MsgpackCodec()
+    return codecs
+
+
+CODECS: Dict[int, CacheCodec] = _available_codecs()
+CODECS_BY_NAME: Dict[str, CacheCodec] = {codec.name: codec for codec in CODECS.values()}
+
+COMPRESSIONS_BY_NAME = {"none": COMPRESSION_NONE, "zstd": COMPRESSION_ZSTD, "lz4": COMPRESSION_LZ4}
+
+
+class CacheSerializer:
+    """
+    Serializador del caché: códec + compresión opcional por encima de un umbral.
+    
+    Si el códec o la compresión configurados no están instalados se usa el
+    mejor disponible (json / sin compresión) y se registra un aviso.
+    """
+    
+    def __init__(
+        self,
+        codec: str = "msgpack",
+        compression: str = "zstd",
+        compress_threshold: int = 1024,
+        compression_level: int = 3
+    ):
+        if codec not in CODECS_BY_NAME:
+            logger.warning("Cache codec not available, falling back to json", codec=codec)
+            codec = "json"
+        self.codec = CODECS_BY_NAME[codec]
+        
+        self.compression = COMPRESSIONS_BY_NAME.get(compression, COMPRESSION_NONE)
+        if self.compression == COMPRESSION_ZSTD and zstandard is None:
+            logger.warning("zstandard not installed, cache compression disabled")
+            self.compression = COMPRESSION_NONE
+        if self.compression == COMPRESSION_LZ4 and lz4_frame is None:
+            logger.warning("lz4 not installed, cache compression disabled")
+            self.compression = COMPRESSION_NONE
+        
+        self.compress_threshold = compress_threshold
+        self.compression_level = compression_level
+        self._zstd_compressor = (
+            zstandard.ZstdCompressor(level=compression_level) if zstandard is not None else None
+        )
+        self._zstd_decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+    
+    def dumps(self, value: Any) -> bytes:
+        """Serializar un valor con su byte de cabecera"""
+        payload = self.codec.encode(value)
+        compression = COMPRESSION_NONE
+        
+        if self.compression != COMPRESSION_NONE and len(payload) >= self.compress_threshold:
+            compression = self.compression
+            payload = self._compress(payload, compression)
+        
+        header = HEADER_MARKER | (compression << 4) | self.codec.codec_id
+        return bytes((header,)) + payload
+    
+    def loads(self, data: Optional[bytes]) -> Any:
+        """Deserializar un valor escrito con cualquier códec conocido"""
+        if data is None:
+            return None
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        
+        header = data[0]
+        if not header & HEADER_MARKER:
+            # Valor anterior a la cabecera: JSON plano
+            return json.loads(data)
+        
+        codec_id = header & 0x0F
+        compression = (header >> 4) & 0x07
+        codec = CODECS.get(codec_id)
+        if codec is None:
+            raise ValueError(f"Unknown or unavailable cache codec id {codec_id}")
+        
+        payload = memoryview(data)[1:]
+        if compression != COMPRESSION_NONE:
+            payload = self._decompress(payload, compression)
+        return codec.decode(bytes(payload))
+    
+    def _compress(self, payload: bytes, compression: int) -> bytes:
+        if compression == COMPRESSION_ZSTD:
+            return self._zstd_compressor.compress(payload)
+        return lz4_frame.compress(payload, compression_level=self.compression_level)
+    
+    def _decompress(self, payload: memoryview, compression: int) -> bytes:
+        if compression == COMPRESSION_ZSTD:
+            if self._zstd_decompressor is None:
+                raise ValueError("zstandard not installed, cannot decode cached value")
+            return self._zstd_decompressor.decompress(payload)
+        if compression == COMPRESSION_LZ4:
+            if lz4_frame is None:
+                raise ValueError("lz4 not installed, cannot decode cached value")
+            return lz4_frame.decompress(payload)
+        raise ValueError(f"Unknown cache compression id {compression}")
@@ -2,7 +2,7 @@
 Configuración de la aplicación usando Pydantic Settings
 """
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import validator
 from pydantic_settings import BaseSettings
 import os
@@ -31,22 +31,120 @@ class Settings(BaseSettings):
     # Configuración de Redis
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Serialización del caché: msgpack (conserva los datetimes), json u orjson
+    # (más rápido, devuelve los datetimes como cadenas); compresión none, zstd o lz4
+    CACHE_CODEC: str = "msgpack"
+    CACHE_COMPRESSION: str = "zstd"
+    CACHE_COMPRESSION_THRESHOLD: int = 1024  # bytes
+    
+    # Configuración de caché en memoria (L1) delante de Redis
+    CACHE_L1_ENABLED: bool = False
+    CACHE_L1_MAX_ENTRIES: int = 1024
+    CACHE_L1_TTL_SECONDS: int = 30
+    CACHE_INVALIDATION_CHANNEL: str = "cache:invalidations"
+    
+    # Protección contra estampidas al expirar entradas del caché
+    CACHE_STALE_TTL_SECONDS: int = 0  # 0 desactiva stale-while-revalidate
+    CACHE_LOCK_TIMEOUT_SECONDS: float = 10.0
+    CACHE_LOCK_WAIT_SECONDS: float = 5.0
+    
     # Configuración de JWT
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Caché en memoria de tokens JWT ya verificados
+    AUTH_TOKEN_CACHE_ENABLED: bool = True
+    AUTH_TOKEN_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_TOKEN_CACHE_MAX_TTL_SECONDS: int = 1800  # nunca más allá del exp del token
+    
+    # Revocación de tokens (lista en Redis + filtro de Bloom por worker)
+    AUTH_REVOCATION_CHANNEL: str = "auth:revocations"
+    AUTH_REVOCATION_BLOOM_CAPACITY: int = 100000
+    AUTH_REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    AUTH_REVOCATION_REBUILD_SECONDS: int = 600
+    
+    # Limitación de tasa (ventana deslizante en Redis)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_DEFAULT: str = "1000/hour"  # resto de /api/ por principal
+    # "[MÉTODO ]prefijo" -> límite; gana el prefijo más largo
+    RATE_LIMIT_RULES: Dict[str, str] = {
+        "POST /api/v1/users/login": "10/minute",
+        "POST /api/v1/users/register": "5/minute",
+        "GET /api/v1/geolocation/search": "60/minute",
+        "POST /api/v1/geolocation/reverse": "60/minute",
+        "/api/v1/campaigns": "300/minute",
+        "POST /api/v1/events": "6000/minute",
+        "POST /api/v1/decide": "60000/minute"
+    }
+    # Límites propios de principales concretos ("user:<id>" o "ip:<dirección>")
+    RATE_LIMIT_PRINCIPAL_RULES: Dict[str, str] = {}
+    RATE_LIMIT_LOCAL_THRESHOLD: float = 0.5  # fracción restante para admitir sin Redis
+    RATE_LIMIT_LOCAL_SYNC_EVERY: int = 10  # peticiones locales máximas entre consultas
+    RATE_LIMIT_LOCAL_MAX_ENTRIES: int = 10000
+    RATE_LIMIT_FAIL_OPEN: bool = True  # admitir si Redis no responde
+    
+    # Hash de contraseñas (bcrypt en un pool de hilos acotado)
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32  # por encima se responde 503
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    
     # Configuración de AWS S3
     AWS_ACCESS_KEY_ID: Optional[str] = None
     AWS_SECRET_ACCESS_KEY: Optional[str] = None
     AWS_S3_BUCKET: Optional[str] = None
     AWS_REGION: str = "us-east-1"
+    AWS_S3_ENDPOINT_URL: Optional[str] = None  # MinIO / moto server (p. ej. http://localhost:9000)
+    AWS_S3_PUBLIC_URL: Optional[str] = None  # base de las URLs públicas (por defecto la del bucket)
+    AWS_S3_MAX_WORKERS: int = 8  # hilos para llamadas a S3 que no son subidas
+    AWS_S3_MULTIPART_THRESHOLD: int = 8388608  # 8MB: por encima, subida multipart
+    AWS_S3_MULTIPART_CHUNKSIZE: int = 8388608  # tamaño de cada parte
+    AWS_S3_MAX_CONCURRENCY: int = 10  # partes en paralelo entre todas las subidas
     
     # Configuración de Mapbox
     MAPBOX_ACCESS_TOKEN: Optional[str] = None
     
+    # Cliente HTTP compartido para servicios externos
+    HTTP_CLIENT_HTTP2: bool = True
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 100
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_CLIENT_READ_TIMEOUT_SECONDS: float = 10.0
+    HTTP_CLIENT_POOL_TIMEOUT_SECONDS: float = 5.0  # espera por una conexión libre
+    
+    # Caché de geocodificación (Redis + colección locations)
+    GEOCODING_CACHE_ENABLED: bool = True
+    GEOCODING_CACHE_TTL_SECONDS: int = 604800  # 7 días en Redis
+    GEOCODING_NEGATIVE_TTL_SECONDS: int = 3600  # búsquedas sin resultados
+    GEOCODING_PERSIST_DAYS: int = 90  # retención en locations
+    GEOCODING_GEOHASH_PRECISION: int = 7  # ~150 m por celda en reverse
+    GEOCODING_SEARCH_FETCH_LIMIT: int = 10  # máximo de Mapbox por búsqueda
+    
+    # Gazetteer local (volcados de GeoNames); sin ruta no se usa
+    GAZETTEER_PATH: Optional[str] = None  # p. ej. cities500.txt
+    GAZETTEER_ADMIN1_PATH: Optional[str] = None  # admin1CodesASCII.txt
+    GAZETTEER_COUNTRY_INFO_PATH: Optional[str] = None  # countryInfo.txt
+    GAZETTEER_MIN_POPULATION: int = 0
+    GAZETTEER_ALTERNATE_NAMES: bool = False  # indexar también los nombres alternativos
+    
+    # Matriz de distancias (orígenes x destinos)
+    DISTANCE_MATRIX_MAX_CELLS: int = 1000000
+    
+    # Segmentación geográfica en memoria (STRtree de campañas activas)
+    TARGETING_ENABLED: bool = True
+    TARGETING_CHANNEL: str = "campaigns:targeting"  # pub/sub de cambios entre workers
+    TARGETING_POINT_RADIUS_KM: float = 1.0  # radio de los objetivos point sin radio
+    TARGETING_CIRCLE_SEGMENTS: int = 64  # vértices de los círculos geodésicos
+    TARGETING_REBUILD_THRESHOLD: int = 128  # campañas cambiadas antes de reconstruir el árbol
+    TARGETING_RELOAD_SECONDS: float = 900.0  # recarga completa desde MongoDB
+    
     # Configuración de archivos
     MAX_FILE_SIZE: int = 10485760  # 10MB
+    MEDIA_UPLOAD_CHUNK_SIZE: int = 1048576  # 1MB por bloque al guardar subidas
+    STORAGE_BACKEND: str = "auto"  # auto (s3 si está configurado, si no local), local, s3, memory
+    LOCAL_STORAGE_DIR: str = "uploads"  # direccionado por contenido: ab/cd/<sha256><ext>
+    LOCAL_STORAGE_URL_PREFIX: str = "/uploads"
     ALLOWED_IMAGE_TYPES: List[str] = [
         "image/jpeg",
         "image/png", 
@@ -59,6 +157,23 @@ class Settings(BaseSettings):
         "video/quicktime"
     ]
     
+    # Procesamiento de multimedia (cola en Redis + python -m app.workers.media_worker)
+    MEDIA_QUEUE_NAME: str = "media:jobs"
+    MEDIA_WORKER_PROCESSES: int = 2  # procesos para el trabajo de CPU
+    MEDIA_WORKER_CONCURRENCY: int = 4  # trabajos simultáneos por worker
+    MEDIA_JOB_MAX_ATTEMPTS: int = 5
+    MEDIA_JOB_RETRY_BASE_SECONDS: float = 5.0  # espera 5s, 10s, 20s... entre intentos
+    MEDIA_WORKER_HEARTBEAT_SECONDS: float = 5.0
+    MEDIA_WORKER_STALE_SECONDS: float = 60.0  # sin latido: sus trabajos vuelven a la cola
+    MEDIA_DEAD_LETTER_MAX: int = 10000
+    
+    # Miniatura y versiones adaptativas de las imágenes (las genera el worker)
+    MEDIA_RENDITIONS_ENABLED: bool = True
+    MEDIA_RENDITION_WIDTHS: List[int] = [320, 640, 1280]  # nunca mayores que el original
+    MEDIA_RENDITION_FORMATS: List[str] = ["webp", "jpeg"]
+    MEDIA_THUMBNAIL_SIZE: int = 256  # cabe en 256x256 (thumbnail_url)
+    MEDIA_RENDITION_QUALITY: int = 80
+    
     # Configuración de email
     SMTP_HOST: Optional[str] = None
     SMTP_PORT: int = 587
@@ -69,6 +184,19 @@ class Settings(BaseSettings):
     ENABLE_EMAIL_NOTIFICATIONS: bool = False
     ENABLE_PUSH_NOTIFICATIONS: bool = False
     
+    # Configuración de ingesta de eventos (vistas, clics, conversiones)
+    EVENTS_FLUSH_INTERVAL_SECONDS: float = 1.0
+    EVENTS_FLUSH_THRESHOLD: int = 50000  # eventos pendientes que fuerzan un volcado
+    EVENTS_MAX_PENDING: int = 200000  # por encima se responde 503
+    EVENTS_BULK_BATCH_SIZE: int = 1000
+    
+    # Configuración de métricas por intervalos (campaign_metrics)
+    METRICS_ROLLUP_INTERVAL_SECONDS: float = 60.0
+    METRICS_ROLLUP_LOOKBACK_MINUTES: int = 60  # eventos más tardíos no llegan a horas/días
+    METRICS_MINUTE_RETENTION_HOURS: int = 48
+    METRICS_HOUR_RETENTION_DAYS: int = 90
+    METRICS_MAX_SERIES_POINTS: int = 1500
+    
     @validator("CORS_ORIGINS", pre=True)
     def assemble_cors_origins(cls, v):
         """Validar y procesar CORS origins"""
@@ -90,6 +218,15 @@ class Settings(BaseSettings):
             return [i.strip() for i in v.split(",")]
         return v
     
+    @validator("MEDIA_RENDITION_FORMATS")
+    def validate_rendition_formats(cls, v):
+        """Validar formatos de las versiones de imágenes"""
+        formats = [i.strip().lower() for i in v]
+        unknown = set(formats) - {"webp", "jpeg"}
+        if unknown:
+            raise ValueError(f"Unsupported rendition formats: {', '.join(sorted(unknown))}")
+        return formats
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -66,13 +66,35 @@ async def create_indexes():
         await db.campaigns.create_index("status")
         await db.campaigns.create_index("start_date")
         await db.campaigns.create_index("end_date")
-        await db.campaigns.create_index([("location", "2dsphere")])  # Índice geoespacial
+        await db.campaigns.create_index([("target_geometry", "2dsphere")])  # GeoJSON de target_locations
+        
+        # Índice de texto para búsqueda por relevancia (misma definición que mongo-init.js)
+        await db.campaigns.create_index([("name", "text"), ("description", "text")])
+        
+        # Autocompletado por prefijo sobre el nombre normalizado
+        await db.campaigns.create_index([("user_id", 1), ("name_normalized", 1)])
+        
+        # Índices compuestos para paginación keyset por (created_at, _id)
+        await db.campaigns.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+        await db.campaigns.create_index([("user_id", 1), ("status", 1), ("created_at", -1), ("_id", -1)])
         
         # Índices para la colección de archivos multimedia
         await db.media_files.create_index("campaign_id")
         await db.media_files.create_index("file_type")
         await db.media_files.create_index("upload_date")
         
+        # Índices compuestos para paginación keyset por (upload_date, _id)
+        await db.media_files.create_index([("user_id", 1), ("upload_date", -1), ("_id", -1)])
+        await db.media_files.create_index([("user_id", 1), ("campaign_id", 1), ("upload_date", -1), ("_id", -1)])
+        
+        # Índices para la colección de métricas por intervalos
+        await db.campaign_metrics.create_index(
+            [("campaign_id", 1), ("granularity", 1), ("bucket", 1)],
+            unique=True
+        )
+        await db.campaign_metrics.create_index([("granularity", 1), ("bucket", 1)])  # Rollups
+        await db.campaign_metrics.create_index("expires_at", expireAfterSeconds=0)
+        
         # Índices para la colección de usuarios
         await db.users.create_index("email", unique=True)
         await db.users.create_index("username", unique=True)
@@ -82,6 +104,16 @@ async def create_indexes():
         await db.locations.create_index("name")
         await db.locations.create_index("country")
         
+        # Resultados de geocodificación persistidos (caché de Mapbox)
+        await db.locations.create_index(
+            "mapbox_id",
+            unique=True,
+            partialFilterExpression={"mapbox_id": {"$type": "string"}}
+        )
+        await db.locations.create_index("search_keys")
+        await db.locations.create_index("geohashes")
+        await db.locations.create_index("expires_at", expireAfterSeconds=0)
+        
         logger.info("Database indexes created successfully")
         
     except Exception as e:
@@ -0,0 +1,271 @@
+"""
+Índice de elegibilidad para decisiones de anuncios
+
+Dada una petición (ubicación, canal y datos demográficos), devuelve las
+campañas activas que pueden servirse, ordenadas por prioridad. Todo se
+resuelve en memoria:
+
+- ubicación: TargetingIndex (STRtree) para las campañas con objetivos
+  geográficos; las campañas sin target_locations son elegibles en cualquier
+  ubicación y se guardan aparte, ya ordenadas por canal
+- canal: comparación exacta tras normalizar
+- demographics: cada clave de la campaña es una restricción. Listas exigen
+  coincidir en algún valor, "25-35" / "18+" son rangos numéricos y "all"
+  (o vacío) no restringe. Un atributo que la petición no indica no descarta
+  la campaña.
+
+Orden: prioridad (urgent > high > medium > low) y, a igual prioridad, mayor
+presupuesto.
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.core.targeting import TargetingIndex
+from app.core.text import normalize_search_text
+
+PRIORITY_RANK = {"urgent": 3, "high": 2, "medium": 1, "low": 0}
+
+# Valores de demographics que no restringen
+_UNRESTRICTED = {"", "all", "any", "todos", "todas", "cualquiera"}
+_RANGE = re.compile(r"^\s*(\d+(?:\.\d+)?)?\s*(?:-\s*(\d+(?:\.\d+)?)?|\+)\s*$")
+
+
+def _normalize(value: Any) -> str:
+    return normalize_search_text(str(getattr(value, "value", value)))
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return None
+
+
+# Valor de un atributo de la petición ya preparado: (textos normalizados, números)
+PreparedValue = Tuple[frozenset, tuple]
+Predicate = Callable[[frozenset, tuple], bool]
+
+
+def prepare_demographics(demographics: Optional[Dict[str, Any]]) -> Dict[str, PreparedValue]:
+    """Normalizar una sola vez los datos demográficos de una petición"""
+    prepared = {}
+    for key, value in (demographics or {}).items():
+        if value is None:
+            continue
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        numbers = tuple(number for number in map(_as_number, values) if number is not None)
+        prepared[key] = (frozenset(_normalize(item) for item in values), numbers)
+    return prepared
+
+
+def _range_predicate(minimum: Optional[float], maximum: Optional[float]) -> Predicate:
+    low = float("-inf") if minimum is None else minimum
+    high = float("inf") if maximum is None else maximum
+    
+    def matches(strings: frozenset, numbers: tuple) -> bool:
+        return any(low <= number <= high for number in numbers)
+    return matches
+
+
+def _values_predicate(allowed: frozenset) -> Predicate:
+    def matches(strings: frozenset, numbers: tuple) -> bool:
+        return not allowed.isdisjoint(strings)
+    return matches
+
+
+def compile_demographics(demographics: Optional[Dict[str, Any]]) -> List[Tuple[str, Predicate]]:
+    """Convertir los demographics de una campaña en (clave, predicado)"""
+    rules = []
+    for key, value in (demographics or {}).items():
+        if value is None:
+            continue
+        
+        if isinstance(value, dict) and ("min" in value or "max" in value):
+            rules.append((key, _range_predicate(_as_number(value.get("min")), _as_number(value.get("max")))))
+            continue
+        
+        if isinstance(value, (list, tuple, set)):
+            allowed = frozenset(_normalize(item) for item in value)
+            if allowed and allowed.isdisjoint(_UNRESTRICTED):
+                rules.append((key, _values_predicate(allowed)))
+            continue
+        
+        if isinstance(value, str):
+            match = _RANGE.match(value)
+            if match and (match.group(1) or match.group(2)):
+                minimum = float(match.group(1)) if match.group(1) else None
+                maximum = float(match.group(2)) if match.group(2) else None
+                rules.append((key, _range_predicate(minimum, maximum)))
+                continue
+        
+        normalized = _normalize(value)
+        if normalized not in _UNRESTRICTED:
+            rules.append((key, _values_predicate(frozenset([normalized]))))
+    return rules
+
+
+class CampaignProfile:
+    """Atributos no geográficos de una campaña activa para decidir y ordenar"""
+    
+    __slots__ = (
+        "campaign_id", "name", "channel", "channel_key", "priority", "rank", "budget",
+        "media_files", "rules", "targeted", "start_date", "end_date"
+    )
+    
+    def __init__(self, campaign: Dict[str, Any]):
+        self.campaign_id = str(campaign.get("_id") or campaign.get("id"))
+        self.name = campaign.get("name", "")
+        self.channel = campaign.get("channel") or ""
+        self.channel_key = _normalize(self.channel)
+        priority = campaign.get("priority") or "medium"
+        self.priority = getattr(priority, "value", priority)
+        self.rank = PRIORITY_RANK.get(self.priority, 0)
+        self.budget = float(campaign.get("budget") or 0)
+        self.media_files = list(campaign.get("media_files") or [])
+        self.rules = compile_demographics(campaign.get("demographics"))
+        self.targeted = bool(campaign.get("target_locations"))
+        self.start_date = campaign.get("start_date")
+        self.end_date = campaign.get("end_date")
+    
+    @property
+    def sort_key(self) -> tuple:
+        return (-self.rank, -self.budget, self.campaign_id)
+    
+    def is_running(self, at: datetime) -> bool:
+        """Si la fecha está dentro del periodo de la campaña"""
+        if self.start_date and at < self.start_date:
+            return False
+        if self.end_date and at > self.end_date:
+            return False
+        return True
+    
+    def matches(self, demographics: Dict[str, PreparedValue]) -> bool:
+        """Si los datos demográficos (preparados) de la petición cumplen las restricciones"""
+        for key, predicate in self.rules:
+            value = demographics.get(key)
+            if value is not None and not predicate(*value):
+                return False
+        return True
+
+
+class EligibilityIndex:
+    """Campañas activas indexadas por ubicación y canal"""
+    
+    def __init__(self, point_radius_km: float = 0.0, circle_segments: int = 64, rebuild_threshold: int = 128):
+        self.targeting = TargetingIndex(point_radius_km, circle_segments, rebuild_threshold)
+        self._profiles: Dict[str, CampaignProfile] = {}
+        # Campañas sin objetivos geográficos por canal, ordenadas por sort_key
+        # (None si hay que reordenar tras un cambio)
+        self._untargeted: Dict[str, Optional[List[CampaignProfile]]] = {}
+        
+        self.stats = {
+            "decisions": 0,
+            "empty_decisions": 0
+        }
+    
+    def __len__(self) -> int:
+        return len(self._profiles)
+    
+    def load(self, campaigns: Iterable[Dict[str, Any]]):
+        """Sustituir el contenido por el de `campaigns`"""
+        campaigns = list(campaigns)
+        self.targeting.load(campaigns)
+        self._profiles = {}
+        self._untargeted = {}
+        for campaign in campaigns:
+            self._add(CampaignProfile(campaign))
+    
+    def upsert(self, campaign: Dict[str, Any]):
+        """Añadir o reemplazar una campaña"""
+        profile = CampaignProfile(campaign)
+        self._discard(profile.campaign_id)
+        self._add(profile)
+        self.targeting.upsert(campaign)
+    
+    def remove(self, campaign_id: str):
+        """Quitar una campaña del índice"""
+        self._discard(campaign_id)
+        self.targeting.remove(campaign_id)
+    
+    def decide(
+        self,
+        channel: str,
+        longitude: float,
+        latitude: float,
+        country: Optional[str] = None,
+        region: Optional[str] = None,
+        demographics: Optional[Dict[str, Any]] = None,
+        limit: int = 1,
+        at: Optional[datetime] = None
+    ) -> List[CampaignProfile]:
+        """Las `limit` mejores campañas elegibles para la petición"""
+        self.stats["decisions"] += 1
+        channel = _normalize(channel)
+        demographics = prepare_demographics(demographics)
+        at = at or datetime.utcnow()
+        
+        # Campañas con objetivos que cubren la ubicación (ya filtradas por fechas)
+        selected = []
+        for campaign_id in self.targeting.query(longitude, latitude, country, region, at):
+            profile = self._profiles.get(campaign_id)
+            if profile is not None and profile.channel_key == channel and profile.matches(demographics):
+                selected.append(profile)
+        selected.sort(key=lambda profile: profile.sort_key)
+        selected = selected[:limit]
+        
+        # Campañas sin objetivos: basta con recorrer hasta reunir `limit`
+        untargeted = []
+        for profile in self._get_untargeted(channel):
+            if len(untargeted) >= limit:
+                break
+            if profile.is_running(at) and profile.matches(demographics):
+                untargeted.append(profile)
+        
+        if untargeted:
+            selected = sorted(selected + untargeted, key=lambda profile: profile.sort_key)[:limit]
+        if not selected:
+            self.stats["empty_decisions"] += 1
+        return selected
+    
+    def get_stats(self) -> dict:
+        """Tamaño del índice y contadores de decisiones"""
+        return {
+            **self.stats,
+            "campaigns": len(self._profiles),
+            "untargeted": sum(
+                1 for profile in self._profiles.values() if not profile.targeted
+            ),
+            "targeting": self.targeting.get_stats()
+        }
+    
+    def _add(self, profile: CampaignProfile):
+        self._profiles[profile.campaign_id] = profile
+        if not profile.targeted:
+            self._untargeted[profile.channel_key] = None
+    
+    def _discard(self, campaign_id: str):
+        profile = self._profiles.pop(campaign_id, None)
+        if profile is not None and not profile.targeted:
+            self._untargeted[profile.channel_key] = None
+    
+    def _get_untargeted(self, channel: str) -> List[CampaignProfile]:
+        if channel not in self._untargeted:
+            return []
+        
+        profiles = self._untargeted[channel]
+        if profiles is None:
+            profiles = sorted(
+                (
+                    profile for profile in self._profiles.values()
+                    if not profile.targeted and profile.channel_key == channel
+                ),
+                key=lambda profile: profile.sort_key
+            )
+            self._untargeted[channel] = profiles
+        return profiles
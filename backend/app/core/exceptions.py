@@ -77,6 +77,21 @@ class DatabaseError(CustomException):
         super().__init__(message, 500, details)
 
 
+class ServiceUnavailableError(CustomException):
+    """Error cuando el servicio está saturado y rechaza carga (backpressure)"""
+    
+    def __init__(self, message: str = "Service temporarily overloaded", retry_after: int = 1):
+        self.retry_after = retry_after
+        super().__init__(message, 503, {"retry_after": retry_after})
+
+
+class MediaProcessingError(CustomException):
+    """Error del contenido de un archivo multimedia (no se reintenta)"""
+    
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message, 422, details)
+
+
 class ExternalServiceError(CustomException):
     """Error en servicios externos (AWS, Mapbox, etc.)"""
     
@@ -0,0 +1,349 @@
+"""
+Gazetteer local (sin conexión) a partir de un volcado de GeoNames
+
+Carga un fichero con el formato de la tabla `geoname` de GeoNames
+(cities500.txt, cities15000.txt, ES.txt, allCountries.txt...) en arrays
+paralelos: una posición por lugar, sin un objeto por fila. Opcionalmente
+usa admin1CodesASCII.txt y countryInfo.txt para los nombres de regiones y
+países.
+
+El autocompletado usa un trie implícito: los nombres normalizados (sin
+acentos ni mayúsculas, con text.normalize_search_text) se guardan ordenados
+en un array y todas las entradas de un prefijo forman un rango contiguo que
+se localiza con dos búsquedas binarias. Los rangos grandes (prefijos cortos)
+se resuelven una vez y se memorizan, de modo que las búsquedas repetidas
+responden en microsegundos.
+
+Descarga: https://download.geonames.org/export/dump/
+"""
+
+import heapq
+import time
+from itertools import islice
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+from app.core.config import settings
+from app.core.local_cache import LocalLRUCache
+from app.core.text import normalize_search_text
+
+logger = structlog.get_logger()
+
+# Columnas de la tabla geoname
+_COL_ID, _COL_NAME, _COL_ASCII, _COL_ALTERNATE = 0, 1, 2, 3
+_COL_LAT, _COL_LON, _COL_CLASS, _COL_CODE = 4, 5, 6, 7
+_COL_COUNTRY, _COL_ADMIN1, _COL_POPULATION = 8, 10, 14
+
+# Códigos de entidad política (países y territorios)
+_COUNTRY_CODES = {"PCL", "PCLI", "PCLD", "PCLF", "PCLS", "PCLIX", "TERR"}
+
+# Tipos de lugar, con los nombres que usa Mapbox
+PLACE_TYPES = ("place", "region", "country")
+_PLACE, _REGION, _COUNTRY = 0, 1, 2
+
+# Mayor número de resultados que se calcula (y memoriza) por prefijo
+MAX_RESULTS = 50
+
+# Rangos de más entradas que esto se memorizan tras resolverlos
+_MEMO_MIN_RANGE = 256
+
+# Sucesor de cualquier texto normalizado, para cerrar el rango de un prefijo
+_PREFIX_END = "\U0010ffff"
+
+
+class Gazetteer:
+    """Lugares en arrays paralelos con autocompletado por prefijo"""
+    
+    def __init__(self):
+        self.ids = array("q")
+        self.latitudes = array("d")
+        self.longitudes = array("d")
+        self.populations = array("q")
+        self.kinds = array("b")
+        self.names: List[str] = []
+        self.country_codes: List[str] = []
+        self.admin1_codes: List[str] = []
+        
+        self.country_names: Dict[str, str] = {}
+        self.admin1_names: Dict[str, str] = {}  # "ES.29" -> "Madrid"
+        
+        # Trie implícito: claves normalizadas ordenadas y lugar de cada clave
+        self._keys: List[str] = []
+        self._key_places = array("i")
+        self._memo = LocalLRUCache(max_entries=4096, default_ttl=float("inf"))
+        
+        # Listados precalculados al cargar
+        self._cities = array("i")
+        self._country_cities: Dict[str, array] = {}
+        self._countries: Optional[List[Dict[str, str]]] = None
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    # --- Carga -------------------------------------------------------------
+    
+    @classmethod
+    def from_files(
+        cls,
+        path: str,
+        admin1_path: Optional[str] = None,
+        country_info_path: Optional[str] = None,
+        min_population: int = 0,
+        alternate_names: bool = False
+    ) -> "Gazetteer":
+        """Cargar el gazetteer desde ficheros de GeoNames"""
+        gazetteer = cls()
+        if country_info_path:
+            gazetteer.country_names.update(_read_country_info(country_info_path))
+        if admin1_path:
+            gazetteer.admin1_names.update(_read_admin1_codes(admin1_path))
+        
+        with open(path, encoding="utf-8") as f:
+            gazetteer.load_rows(
+                (line.rstrip("\n").split("\t") for line in f),
+                min_population=min_population,
+                alternate_names=alternate_names
+            )
+        return gazetteer
+    
+    def load_rows(self, rows: Iterable[List[str]], min_population: int = 0, alternate_names: bool = False):
+        """Añadir filas de la tabla geoname y reconstruir el índice de prefijos"""
+        entries: List[Tuple[str, int]] = []
+        
+        for row in rows:
+            if len(row) <= _COL_POPULATION:
+                continue
+            
+            feature_class, feature_code = row[_COL_CLASS], row[_COL_CODE]
+            if feature_class == "P":
+                kind = _PLACE
+            elif feature_code == "ADM1":
+                kind = _REGION
+            elif feature_code in _COUNTRY_CODES:
+                kind = _COUNTRY
+            else:
+                continue
+            
+            population = int(row[_COL_POPULATION] or 0)
+            if kind == _PLACE and population < min_population:
+                continue
+            
+            country_code = row[_COL_COUNTRY]
+            admin1_code = row[_COL_ADMIN1]
+            name = row[_COL_NAME]
+            
+            # Los nombres de regiones y países salen del propio volcado si no
+            # se cargaron de sus ficheros
+            if kind == _REGION:
+                self.admin1_names.setdefault(f"{country_code}.{admin1_code}", name)
+            elif kind == _COUNTRY:
+                self.country_names.setdefault(country_code, name)
+            
+            index = len(self.ids)
+            self.ids.append(int(row[_COL_ID]))
+            self.latitudes.append(float(row[_COL_LAT]))
+            self.longitudes.append(float(row[_COL_LON]))
+            self.populations.append(population)
+            self.kinds.append(kind)
+            self.names.append(name)
+            self.country_codes.append(country_code)
+            self.admin1_codes.append(admin1_code)
+            
+            names = {name, row[_COL_ASCII]}
+            if alternate_names and row[_COL_ALTERNATE]:
+                names.update(row[_COL_ALTERNATE].split(","))
+            for key in {normalize_search_text(n) for n in names}:
+                if key:
+                    entries.append((key, index))
+        
+        entries.extend(zip(self._keys, self._key_places))
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._key_places = array("i", (index for _, index in entries))
+        self._memo.clear()
+        
+        # Ciudades de cada país por población descendente, para get_cities
+        by_population = sorted(
+            (i for i in range(len(self.ids)) if self.kinds[i] == _PLACE),
+            key=self.populations.__getitem__,
+            reverse=True
+        )
+        self._cities = array("i", by_population)
+        self._country_cities = {}
+        for i in by_population:
+            self._country_cities.setdefault(self.country_codes[i], array("i")).append(i)
+        self._countries = None
+    
+    # --- Consultas ---------------------------------------------------------
+    
+    def search(self, query: str, country: Optional[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Lugares cuyo nombre empieza por `query`, los más poblados primero"""
+        prefix = normalize_search_text(query)
+        if not prefix:
+            return []
+        
+        countries = frozenset(c.strip().upper() for c in country.split(",") if c.strip()) if country else None
+        return [self.to_feature(index) for index in self._top_places(prefix, countries)[:limit]]
+    
+    def _top_places(self, prefix: str, countries: Optional[frozenset]) -> Tuple[int, ...]:
+        memo_key = f"{prefix}|{','.join(sorted(countries)) if countries else ''}"
+        cached = self._memo.get(memo_key)
+        if cached is not None:
+            return cached
+        
+        keys = self._keys
+        low = bisect_left(keys, prefix)
+        high = bisect_left(keys, prefix + _PREFIX_END, low)
+        
+        # Un lugar puede aparecer con varias claves (nombre, ascii, alternativos)
+        key_places = self._key_places
+        places = {key_places[i] for i in range(low, high)}
+        if countries:
+            places = {i for i in places if self.country_codes[i] in countries}
+        
+        # Las coincidencias exactas están al principio del rango
+        exact = set(key_places[low:bisect_right(keys, prefix, low, high)])
+        populations = self.populations
+        kinds = self.kinds
+        top = tuple(heapq.nlargest(
+            MAX_RESULTS,
+            places,
+            key=lambda i: (i in exact, kinds[i] == _PLACE, populations[i])
+        ))
+        
+        if high - low >= _MEMO_MIN_RANGE:
+            self._memo.set(memo_key, top)
+        return top
+    
+    def to_feature(self, index: int) -> Dict[str, Any]:
+        """Lugar con el mismo formato que los resultados de Mapbox"""
+        country_code = self.country_codes[index]
+        country_name = self.country_names.get(country_code, country_code)
+        admin1_key = f"{country_code}.{self.admin1_codes[index]}"
+        region_name = self.admin1_names.get(admin1_key)
+        kind = self.kinds[index]
+        name = self.names[index]
+        
+        context = []
+        parts = [name]
+        if kind == _PLACE and region_name:
+            context.append({"id": f"region.{admin1_key}", "text": region_name})
+            parts.append(region_name)
+        if kind != _COUNTRY:
+            context.append({"id": f"country.{country_code}", "text": country_name, "short_code": country_code.lower()})
+            parts.append(country_name)
+        
+        return {
+            "id": f"geonames.{self.ids[index]}",
+            "name": name,
+            "full_name": ", ".join(parts),
+            "coordinates": [self.longitudes[index], self.latitudes[index]],
+            "place_type": [PLACE_TYPES[kind]],
+            "context": context,
+            "relevance": 1
+        }
+    
+    def countries(self) -> List[Dict[str, str]]:
+        """Países con nombre conocido, ordenados por nombre"""
+        if self._countries is None:
+            self._countries = sorted(
+                ({"code": code, "name": name} for code, name in self.country_names.items()),
+                key=lambda item: normalize_search_text(item["name"])
+            )
+        return self._countries
+    
+    def regions(self, country_code: Optional[str] = None) -> List[Dict[str, str]]:
+        """Regiones (admin1), de un país o de todos"""
+        regions = []
+        for key, name in self.admin1_names.items():
+            region_country, _, code = key.partition(".")
+            if country_code is None or region_country == country_code:
+                regions.append({"code": code, "name": name, "country": region_country})
+        return sorted(regions, key=lambda item: (item["country"], normalize_search_text(item["name"])))
+    
+    def cities(
+        self,
+        country_code: Optional[str] = None,
+        region_code: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Ciudades más pobladas, filtradas por país y región"""
+        candidates = self._cities if country_code is None else self._country_cities.get(country_code, ())
+        if region_code is not None:
+            candidates = (i for i in candidates if self.admin1_codes[i] == region_code)
+        top = list(islice(candidates, limit))
+        return [
+            {
+                "name": self.names[i],
+                "country": self.country_codes[i],
+                "region": self.admin1_codes[i],
+                "coordinates": [self.longitudes[i], self.latitudes[i]],
+                "population": self.populations[i]
+            }
+            for i in top
+        ]
+
+
+def _read_admin1_codes(path: str) -> Dict[str, str]:
+    """admin1CodesASCII.txt: "ES.29\\tMadrid\\tMadrid\\t3117732" """
+    names = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            row = line.rstrip("\n").split("\t")
+            if len(row) >= 2:
+                names[row[0]] = row[1]
+    return names
+
+
+def _read_country_info(path: str) -> Dict[str, str]:
+    """countryInfo.txt: código ISO en la columna 0 y nombre en la 4"""
+    names = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            row = line.rstrip("\n").split("\t")
+            if len(row) > 4:
+                names[row[0]] = row[4]
+    return names
+
+
+# Instancia global del gazetteer
+gazetteer: Optional[Gazetteer] = None
+
+
+def load_gazetteer():
+    """Cargar el gazetteer configurado (GAZETTEER_PATH); sin ruta no se usa"""
+    global gazetteer
+    
+    if not settings.GAZETTEER_PATH:
+        return
+    
+    started_at = time.perf_counter()
+    try:
+        gazetteer = Gazetteer.from_files(
+            settings.GAZETTEER_PATH,
+            admin1_path=settings.GAZETTEER_ADMIN1_PATH,
+            country_info_path=settings.GAZETTEER_COUNTRY_INFO_PATH,
+            min_population=settings.GAZETTEER_MIN_POPULATION,
+            alternate_names=settings.GAZETTEER_ALTERNATE_NAMES
+        )
+    except Exception as e:
+        # Sin gazetteer las búsquedas siguen resolviéndose con Mapbox
+        logger.error("Error loading gazetteer", path=settings.GAZETTEER_PATH, error=str(e))
+        return
+    
+    logger.info(
+        "Gazetteer loaded",
+        places=len(gazetteer),
+        countries=len(gazetteer.country_names),
+        load_seconds=round(time.perf_counter() - started_at, 2)
+    )
+
+
+def get_gazetteer() -> Optional[Gazetteer]:
+    """Obtener el gazetteer (None si no hay fichero configurado)"""
+    return gazetteer
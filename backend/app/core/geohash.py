@@ -0,0 +1,46 @@
+"""
+Codificación geohash para cuantizar coordenadas
+
+Con precisión p, todos los puntos de la misma celda comparten el mismo
+geohash: 5 caracteres ≈ 4,9 x 4,9 km, 6 ≈ 1,2 x 0,6 km, 7 ≈ 153 x 153 m,
+8 ≈ 38 x 19 m.
+"""
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode_geohash(latitude: float, longitude: float, precision: int = 7) -> str:
+    """Geohash de `precision` caracteres de un punto (lat, lon)"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # los bits pares codifican la longitud
+    
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    
+    return "".join(chars)
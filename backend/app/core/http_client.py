@@ -0,0 +1,75 @@
+"""
+Cliente HTTP compartido para servicios externos (Mapbox)
+
+Un único httpx.AsyncClient por worker mantiene un pool de conexiones
+keep-alive, de modo que las llamadas a api.mapbox.com reutilizan la conexión
+TCP/TLS en lugar de repetir el handshake en cada petición. Con HTTP/2 varias
+peticiones concurrentes se multiplexan sobre la misma conexión.
+"""
+
+from typing import Union
+
+import httpx
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Cliente HTTP global
+http_client: httpx.AsyncClient = None
+
+
+def build_http_client(verify: Union[bool, str] = True) -> httpx.AsyncClient:
+    """Crear un cliente con los límites y timeouts de la configuración"""
+    http2 = settings.HTTP_CLIENT_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:  # dependencia opcional (httpx[http2])
+            logger.warning("h2 not installed, falling back to HTTP/1.1")
+            http2 = False
+    
+    return httpx.AsyncClient(
+        http2=http2,
+        verify=verify,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY_SECONDS
+        ),
+        timeout=httpx.Timeout(
+            settings.HTTP_CLIENT_READ_TIMEOUT_SECONDS,
+            connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT_SECONDS,
+            pool=settings.HTTP_CLIENT_POOL_TIMEOUT_SECONDS
+        )
+    )
+
+
+async def connect_http_client():
+    """Crear el cliente HTTP compartido"""
+    global http_client
+    
+    http_client = build_http_client()
+    logger.info(
+        "HTTP client created",
+        http2=settings.HTTP_CLIENT_HTTP2,
+        max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS
+    )
+
+
+async def close_http_client():
+    """Cerrar el cliente HTTP y sus conexiones"""
+    global http_client
+    
+    if http_client:
+        await http_client.aclose()
+        http_client = None
+        logger.info("HTTP client closed")
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    """Obtener el cliente HTTP compartido"""
+    if http_client is None:
+        raise Exception("HTTP client not initialized")
+    return http_client
@@ -0,0 +1,232 @@
+"""
+Cola de trabajos fiable en Redis
+
+Claves (con prefijo `name`):
+
+- <name>:ready             LIST  trabajos pendientes (LPUSH / BLMOVE, FIFO)
+- <name>:processing:<id>  LIST  trabajos reservados por el worker <id>
+- <name>:delayed          ZSET  reintentos programados (score = ms en que vencen)
+- <name>:dead             LIST  trabajos descartados (dead letter), con el error
+- <name>:workers          ZSET  último latido de cada worker (ms)
+
+Un trabajo reservado no sale de Redis hasta que el worker lo confirma (ack),
+lo reprograma (retry) o lo descarta (dead_letter). Si un worker deja de latir
+durante `stale_after` segundos, sus trabajos reservados vuelven a la cola con
+un intento más, de modo que un trabajo que tumba al worker acaba descartado en
+lugar de repetirse para siempre.
+"""
+
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as redis
+import structlog
+
+logger = structlog.get_logger()
+
+# KEYS[1]: delayed, KEYS[2]: ready. ARGV: ahora (ms), máximo a mover
+PROMOTE_DUE_SCRIPT = """
+local due = redis.call("ZRANGEBYSCORE", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, tonumber(ARGV[2]))
+for _, payload in ipairs(due) do
+    redis.call("ZREM", KEYS[1], payload)
+    redis.call("LPUSH", KEYS[2], payload)
+end
+return #due
+"""
+
+# KEYS[1]: processing del worker caído, KEYS[2]: ready, KEYS[3]: workers
+# ARGV[1]: id del worker. Devuelve los trabajos recuperados
+RECOVER_SCRIPT = """
+local recovered = 0
+local payload = redis.call("RPOP", KEYS[1])
+while payload do
+    local ok, job = pcall(cjson.decode, payload)
+    if ok then
+        job["attempts"] = (tonumber(job["attempts"]) or 0) + 1
+        job["last_error"] = "Worker stopped while processing"
+        payload = cjson.encode(job)
+    end
+    redis.call("RPUSH", KEYS[2], payload)
+    recovered = recovered + 1
+    payload = redis.call("RPOP", KEYS[1])
+end
+redis.call("ZREM", KEYS[3], ARGV[1])
+return recovered
+"""
+
+
+class Job:
+    """Trabajo reservado por un worker"""
+    
+    __slots__ = ("raw", "id", "data", "attempts", "last_error", "enqueued_at")
+    
+    def __init__(self, raw: str):
+        payload = json.loads(raw)
+        self.raw = raw  # tal cual está en Redis (para LREM)
+        self.id = payload["id"]
+        self.data = payload.get("data") or {}
+        self.attempts = int(payload.get("attempts") or 0)  # intentos fallidos previos
+        self.last_error = payload.get("last_error")
+        self.enqueued_at = payload.get("enqueued_at")
+    
+    def payload(self, **changes) -> str:
+        return json.dumps({
+            "id": self.id,
+            "data": self.data,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "enqueued_at": self.enqueued_at,
+            **changes
+        })
+
+
+class RedisJobQueue:
+    """Cola con reserva, reintentos diferidos y dead letter"""
+    
+    def __init__(self, redis_client: redis.Redis, name: str, dead_letter_max: int = 10000):
+        self.redis = redis_client
+        self.name = name
+        self.dead_letter_max = dead_letter_max
+        self.ready_key = f"{name}:ready"
+        self.delayed_key = f"{name}:delayed"
+        self.dead_key = f"{name}:dead"
+        self.workers_key = f"{name}:workers"
+        self._promote_script = redis_client.register_script(PROMOTE_DUE_SCRIPT)
+        self._recover_script = redis_client.register_script(RECOVER_SCRIPT)
+    
+    def processing_key(self, worker_id: str) -> str:
+        return f"{self.name}:processing:{worker_id}"
+    
+    async def enqueue(self, data: Dict[str, Any]) -> str:
+        """Añadir un trabajo y devolver su id"""
+        job_id = uuid.uuid4().hex
+        await self.redis.lpush(self.ready_key, json.dumps({
+            "id": job_id,
+            "data": data,
+            "attempts": 0,
+            "last_error": None,
+            "enqueued_at": time.time()
+        }))
+        return job_id
+    
+    async def reserve(self, worker_id: str, timeout: float = 1.0) -> Optional[Job]:
+        """Esperar hasta `timeout` segundos por un trabajo y reservarlo"""
+        raw = await self.redis.blmove(
+            self.ready_key,
+            self.processing_key(worker_id),
+            timeout,
+            "RIGHT",
+            "LEFT"
+        )
+        if raw is None:
+            return None
+        try:
+            return Job(raw)
+        except (ValueError, KeyError, TypeError):
+            # Payload ilegible: directo a dead letter para no bloquear la cola
+            logger.error("Invalid job payload", queue=self.name, payload=raw[:200])
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.lrem(self.processing_key(worker_id), 1, raw)
+                pipe.lpush(self.dead_key, raw)
+                await pipe.execute()
+            return None
+    
+    async def ack(self, worker_id: str, job: Job):
+        """Confirmar un trabajo terminado"""
+        await self.redis.lrem(self.processing_key(worker_id), 1, job.raw)
+    
+    async def retry(self, worker_id: str, job: Job, error: str, delay: float):
+        """Reprogramar un trabajo fallido dentro de `delay` segundos"""
+        payload = job.payload(attempts=job.attempts + 1, last_error=error)
+        due = int((time.time() + delay) * 1000)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key(worker_id), 1, job.raw)
+            pipe.zadd(self.delayed_key, {payload: due})
+            await pipe.execute()
+    
+    async def dead_letter(self, worker_id: str, job: Job, error: str):
+        """Descartar un trabajo (se conserva en <name>:dead para revisarlo)"""
+        payload = job.payload(attempts=job.attempts + 1, last_error=error, failed_at=time.time())
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key(worker_id), 1, job.raw)
+            pipe.lpush(self.dead_key, payload)
+            pipe.ltrim(self.dead_key, 0, self.dead_letter_max - 1)
+            await pipe.execute()
+    
+    async def promote_due(self, limit: int = 100) -> int:
+        """Mover a la cola los reintentos que ya han vencido"""
+        now = int(time.time() * 1000)
+        return await self._promote_script(keys=[self.delayed_key, self.ready_key], args=[now, limit])
+    
+    async def heartbeat(self, worker_id: str):
+        """Registrar que el worker sigue vivo"""
+        await self.redis.zadd(self.workers_key, {worker_id: int(time.time() * 1000)})
+    
+    async def recover(self, stale_after: float) -> int:
+        """Devolver a la cola los trabajos de workers sin latido reciente"""
+        cutoff = int((time.time() - stale_after) * 1000)
+        stale_workers = await self.redis.zrangebyscore(self.workers_key, "-inf", cutoff)
+        recovered = 0
+        for worker_id in stale_workers:
+            count = await self._recover_script(
+                keys=[self.processing_key(worker_id), self.ready_key, self.workers_key],
+                args=[worker_id]
+            )
+            if count:
+                logger.warning("Recovered jobs from stale worker", queue=self.name, worker_id=worker_id, jobs=count)
+            recovered += count
+        return recovered
+    
+    async def unregister(self, worker_id: str):
+        """Baja ordenada: devolver lo reservado (sin contar intento) y borrar el latido"""
+        processing_key = self.processing_key(worker_id)
+        while await self.redis.lmove(processing_key, self.ready_key, "LEFT", "RIGHT"):
+            pass
+        await self.redis.zrem(self.workers_key, worker_id)
+    
+    async def requeue_dead(self, limit: int = 1000) -> int:
+        """Devolver a la cola trabajos descartados, con los intentos a cero"""
+        moved = 0
+        while moved < limit:
+            raw = await self.redis.rpop(self.dead_key)
+            if raw is None:
+                break
+            try:
+                job = Job(raw)
+            except (ValueError, KeyError, TypeError):
+                continue  # ilegible: se descarta definitivamente
+            await self.redis.lpush(self.ready_key, job.payload(attempts=0, last_error=None))
+            moved += 1
+        return moved
+    
+    async def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Últimos trabajos descartados"""
+        entries = []
+        for raw in await self.redis.lrange(self.dead_key, 0, limit - 1):
+            try:
+                entries.append(json.loads(raw))
+            except ValueError:
+                entries.append({"payload": raw})
+        return entries
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Tamaño de cada parte de la cola y workers activos"""
+        workers = await self.redis.zrange(self.workers_key, 0, -1)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.llen(self.ready_key)
+            pipe.zcard(self.delayed_key)
+            pipe.llen(self.dead_key)
+            for worker_id in workers:
+                pipe.llen(self.processing_key(worker_id))
+            counts = await pipe.execute()
+        
+        return {
+            "queue": self.name,
+            "ready": counts[0],
+            "delayed": counts[1],
+            "dead": counts[2],
+            "processing": sum(counts[3:]),
+            "workers": len(workers)
+        }
@@ -0,0 +1,93 @@
+"""
+Caché en memoria del proceso (L1) con expulsión LRU y expiración por TTL
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class LocalLRUCache:
+    """
+    Caché LRU acotada en número de entradas, con TTL por entrada.
+    
+    Los valores se devuelven tal cual se guardaron (sin copiar), por lo que
+    deben tratarse como de solo lectura. No es segura entre hilos: está
+    pensada para usarse desde el event loop de un único worker.
+    """
+    
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        # key -> (valor, instante de expiración, etiquetas)
+        self._entries: "OrderedDict[str, Tuple[Any, float, Tuple[str, ...]]]" = OrderedDict()
+        # etiqueta -> claves asociadas
+        self._tag_index: Dict[str, Set[str]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Obtener un valor vigente o None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, tags: Iterable[str] = ()):
+        """Guardar un valor; el TTL efectivo nunca supera default_ttl"""
+        ttl = self.default_ttl if ttl is None else min(ttl, self.default_ttl)
+        if ttl <= 0:
+            return
+        
+        if key in self._entries:
+            self._remove(key)
+        
+        tags = tuple(tags)
+        self._entries[key] = (value, time.monotonic() + ttl, tags)
+        for tag in tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+        
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+    
+    def keys(self) -> List[str]:
+        """Claves actualmente almacenadas (incluidas las ya expiradas)"""
+        return list(self._entries)
+    
+    def delete(self, key: str):
+        """Eliminar una entrada"""
+        if key in self._entries:
+            self._remove(key)
+    
+    def invalidate_tags(self, tags: Iterable[str]) -> List[str]:
+        """Eliminar todas las entradas asociadas a las etiquetas"""
+        removed = []
+        for tag in tags:
+            for key in list(self._tag_index.get(tag, ())):
+                self._remove(key)
+                removed.append(key)
+        return removed
+    
+    def clear(self):
+        """Vaciar la caché"""
+        self._entries.clear()
+        self._tag_index.clear()
+    
+    def _remove(self, key: str):
+        """Eliminar una entrada y sus referencias en el índice de etiquetas"""
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
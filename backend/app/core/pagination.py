@@ -0,0 +1,65 @@
+"""
+Utilidades de paginación por cursor (keyset)
+
+Un cursor codifica la clave de ordenación (fecha, _id) del último documento
+devuelto. La siguiente página se obtiene con un filtro de rango sobre esa
+clave, que usa el índice compuesto correspondiente: su coste no depende de
+la profundidad de la página, a diferencia de skip().
+"""
+
+import base64
+import json
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+from bson import ObjectId
+
+from app.core.exceptions import ValidationError
+
+
+class TotalMode(str, Enum):
+    """Cómo calcular el total de resultados de un listado"""
+    EXACT = "exact"          # count_documents completo
+    ESTIMATED = "estimated"  # count_documents acotado (cota inferior)
+    NONE = "none"            # sin total
+
+
+# Máximo de documentos a contar en modo estimado
+ESTIMATED_COUNT_LIMIT = 10000
+
+
+def encode_cursor(sort_value: datetime, doc_id: Any) -> str:
+    """Codificar la posición (fecha, _id) como cursor opaco"""
+    payload = json.dumps({"v": sort_value.isoformat(), "id": str(doc_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Decodificar un cursor; lanza ValidationError si no es válido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(payload["v"]), ObjectId(payload["id"])
+    except Exception:
+        raise ValidationError("Invalid pagination cursor")
+
+
+def keyset_filter(field: str, cursor: str) -> Dict[str, Any]:
+    """Filtro para los documentos posteriores al cursor en orden (field, _id) descendente"""
+    sort_value, doc_id = decode_cursor(cursor)
+    return {
+        "$or": [
+            {field: {"$lt": sort_value}},
+            {field: sort_value, "_id": {"$lt": doc_id}}
+        ]
+    }
+
+
+async def count_total(collection, filters: Dict[str, Any], mode: TotalMode) -> Optional[int]:
+    """Calcular el total según el modo solicitado"""
+    if mode == TotalMode.NONE:
+        return None
+    if mode == TotalMode.ESTIMATED:
+        return await collection.count_documents(filters, limit=ESTIMATED_COUNT_LIMIT)
+    return await collection.count_documents(filters)
@@ -0,0 +1,132 @@
+"""
+Hash y verificación de contraseñas fuera del event loop
+
+bcrypt es deliberadamente lento (cientos de ms por operación). Ejecutado
+dentro de un handler `async` bloquea el event loop del worker y con él todas
+las peticiones en curso. Aquí se ejecuta en un pool de hilos de tamaño fijo
+(la extensión de bcrypt libera el GIL mientras calcula) detrás de un único
+CryptContext reutilizable.
+
+El número de operaciones en espera está acotado: con el pool saturado se
+rechaza la petición con ServiceUnavailableError en lugar de acumular colas
+que solo aumentarían la latencia de todos los logins.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from passlib.context import CryptContext
+import structlog
+
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError
+
+logger = structlog.get_logger()
+
+
+class PasswordHasher:
+    """Pool acotado para operaciones bcrypt con métricas de cola"""
+    
+    def __init__(self, max_workers: int = 4, max_queue: int = 32, rounds: int = 12):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        
+        # Operaciones aceptadas y aún no terminadas (en ejecución + en cola)
+        self._in_flight = 0
+        
+        self.stats = {
+            "completed": 0,
+            "rejected": 0,
+            "max_queue_depth": 0,
+            "wait_ms_total": 0.0,
+            "run_ms_total": 0.0
+        }
+    
+    @property
+    def queue_depth(self) -> int:
+        """Operaciones esperando un hilo libre"""
+        return max(0, self._in_flight - self.max_workers)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas del pool para /health"""
+        completed = self.stats["completed"]
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "completed": completed,
+            "rejected": self.stats["rejected"],
+            "max_queue_depth": self.stats["max_queue_depth"],
+            "avg_wait_ms": round(self.stats["wait_ms_total"] / completed, 2) if completed else 0.0,
+            "avg_run_ms": round(self.stats["run_ms_total"] / completed, 2) if completed else 0.0
+        }
+    
+    async def hash(self, password: str) -> str:
+        """Hashear una contraseña"""
+        return await self._run(self.context.hash, password)
+    
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verificar una contraseña contra su hash"""
+        return await self._run(self.context.verify, plain_password, hashed_password)
+    
+    async def _run(self, func: Callable, *args) -> Any:
+        """Ejecutar en el pool, rechazando si la cola está llena"""
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self.stats["rejected"] += 1
+            logger.warning("Password hashing pool saturated", in_flight=self._in_flight)
+            raise ServiceUnavailableError("Authentication service overloaded", retry_after=1)
+        
+        self._in_flight += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue_depth)
+        submitted_at = time.perf_counter()
+        
+        def timed_call():
+            started_at = time.perf_counter()
+            result = func(*args)
+            return result, started_at, time.perf_counter()
+        
+        try:
+            loop = asyncio.get_running_loop()
+            result, started_at, finished_at = await loop.run_in_executor(self._executor, timed_call)
+        finally:
+            self._in_flight -= 1
+        
+        self.stats["completed"] += 1
+        self.stats["wait_ms_total"] += (started_at - submitted_at) * 1000
+        self.stats["run_ms_total"] += (finished_at - started_at) * 1000
+        return result
+    
+    def shutdown(self):
+        """Liberar los hilos del pool"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Instancia global del pool
+password_hasher: Optional[PasswordHasher] = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Obtener el pool de hash, creándolo en el primer uso"""
+    global password_hasher
+    
+    if password_hasher is None:
+        password_hasher = PasswordHasher(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+            rounds=settings.PASSWORD_BCRYPT_ROUNDS
+        )
+    return password_hasher
+
+
+def close_password_hasher():
+    """Cerrar el pool de hash"""
+    global password_hasher
+    
+    if password_hasher:
+        password_hasher.shutdown()
+        password_hasher = None
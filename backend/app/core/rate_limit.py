@@ -0,0 +1,335 @@
+"""
+Limitación de tasa con ventana deslizante en Redis
+
+Cada par (regla, principal) tiene en Redis un hash con el contador de la
+ventana fija actual y el de la anterior. Un script Lua aplica la
+aproximación de ventana deslizante (el contador anterior pondera según la
+fracción de ventana que aún solapa) y consume de forma atómica, usando el
+reloj de Redis para que todos los workers vean la misma ventana.
+
+Delante de Redis cada worker mantiene un token bucket local por par. Mientras
+la última respuesta de Redis indique que queda margen de sobra y el bucket
+tenga tokens, la petición se admite sin ir a Redis y se anota como pendiente;
+las pendientes se suman en la siguiente llamada al script. El exceso posible
+queda acotado por RATE_LIMIT_LOCAL_SYNC_EVERY peticiones por worker.
+"""
+
+import math
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+import structlog
+
+from app.core.config import settings
+from app.core.local_cache import LocalLRUCache
+
+logger = structlog.get_logger()
+
+RATE_LIMIT_KEY_PREFIX = "ratelimit:"
+
+# KEYS[1]: hash {w: inicio de ventana, c: contador actual, p: contador anterior}
+# ARGV: límite, ventana (ms), coste de la petición, peticiones ya admitidas en local
+# Devuelve {admitida, restantes, ms hasta el reset, ms hasta poder reintentar}
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local served = tonumber(ARGV[4])
+
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local current_start = now - (now % window)
+local elapsed = now - current_start
+
+local state = redis.call("HMGET", KEYS[1], "w", "c", "p")
+local start = tonumber(state[1]) or current_start
+local count = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+
+if start ~= current_start then
+    if start == current_start - window then
+        previous = count
+    else
+        previous = 0
+    end
+    count = 0
+end
+
+-- Las peticiones ya servidas desde el bucket local cuentan siempre
+count = count + served
+
+local used = previous * (window - elapsed) / window + count
+local allowed = 0
+local retry_after = 0
+if used + cost <= limit then
+    allowed = 1
+    count = count + cost
+    used = used + cost
+else
+    local room = limit - count - cost
+    if room >= 0 then
+        retry_after = window - room * window / previous - elapsed
+    else
+        local next_room = limit - cost
+        retry_after = window - elapsed
+        if count > 0 and next_room < count then
+            retry_after = retry_after + window - next_room * window / count
+        end
+    end
+end
+
+redis.call("HSET", KEYS[1], "w", current_start, "c", count, "p", previous)
+redis.call("PEXPIRE", KEYS[1], window * 2)
+
+return {allowed, math.max(0, math.floor(limit - used)), window - elapsed, math.max(0, math.ceil(retry_after))}
+"""
+
+# Unidades admitidas en las reglas ("100/minute", "10/5s", "1000/hour")
+_PERIODS = {
+    "s": 1, "sec": 1, "second": 1,
+    "m": 60, "min": 60, "minute": 60,
+    "h": 3600, "hour": 3600,
+    "d": 86400, "day": 86400
+}
+_RULE_PATTERN = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([a-z]+?)s?\s*$")
+
+
+class RateLimitRule:
+    """Límite de peticiones por ventana, p. ej. 100/minute"""
+    
+    __slots__ = ("name", "limit", "window_seconds")
+    
+    def __init__(self, name: str, limit: int, window_seconds: int):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+    
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "RateLimitRule":
+        """Construir una regla a partir de "<límite>/[n]<unidad>" """
+        match = _RULE_PATTERN.match(spec.lower())
+        if not match or match.group(3) not in _PERIODS:
+            raise ValueError(f"Invalid rate limit spec: {spec!r}")
+        
+        limit = int(match.group(1))
+        multiplier = int(match.group(2) or 1)
+        return cls(name, limit, multiplier * _PERIODS[match.group(3)])
+    
+    @property
+    def policy(self) -> str:
+        """Valor de la cabecera RateLimit-Policy"""
+        return f"{self.limit};w={self.window_seconds}"
+
+
+class RateLimitDecision:
+    """Resultado de comprobar una petición contra su regla"""
+    
+    __slots__ = ("rule", "allowed", "remaining", "reset_seconds", "retry_after")
+    
+    def __init__(self, rule: RateLimitRule, allowed: bool, remaining: int, reset_seconds: int, retry_after: int = 0):
+        self.rule = rule
+        self.allowed = allowed
+        self.remaining = remaining
+        self.reset_seconds = reset_seconds
+        self.retry_after = retry_after
+    
+    def headers(self) -> Dict[str, str]:
+        """Cabeceras RateLimit-* (y Retry-After si se rechaza)"""
+        headers = {
+            "RateLimit-Limit": str(self.rule.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset_seconds),
+            "RateLimit-Policy": self.rule.policy
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+class LocalBucket:
+    """Token bucket local de un par (regla, principal) y último estado visto en Redis"""
+    
+    __slots__ = ("tokens", "updated_at", "pending", "remaining", "reset_at")
+    
+    def __init__(self, capacity: float):
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.pending = 0
+        self.remaining = 0
+        self.reset_at = 0.0
+
+
+class RateLimiter:
+    """Limitador por ruta y principal con ventana deslizante en Redis"""
+    
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        default_rule: Optional[RateLimitRule],
+        route_rules: List[Tuple[str, str, RateLimitRule]],
+        principal_rules: Optional[Dict[str, RateLimitRule]] = None,
+        local_threshold: float = 0.5,
+        local_sync_every: int = 10,
+        local_max_entries: int = 10000,
+        fail_open: bool = True
+    ):
+        self.redis = redis_client
+        self.default_rule = default_rule
+        # (método o "*", prefijo de ruta, regla); el prefijo más largo gana
+        self.route_rules = sorted(route_rules, key=lambda item: len(item[1]), reverse=True)
+        self.principal_rules = principal_rules or {}
+        self.local_threshold = local_threshold
+        self.local_sync_every = local_sync_every
+        self.fail_open = fail_open
+        
+        self._script = redis_client.register_script(SLIDING_WINDOW_SCRIPT)
+        self._buckets = LocalLRUCache(max_entries=local_max_entries, default_ttl=86400)
+        
+        self.stats = {
+            "local_hits": 0,
+            "redis_checks": 0,
+            "rejected": 0,
+            "errors": 0
+        }
+    
+    @classmethod
+    def from_settings(cls, redis_client: redis.Redis) -> "RateLimiter":
+        """Construir el limitador con las reglas de la configuración"""
+        route_rules = []
+        for pattern, spec in settings.RATE_LIMIT_RULES.items():
+            method, _, path = pattern.strip().rpartition(" ")
+            route_rules.append((method.upper() or "*", path, RateLimitRule.parse(pattern, spec)))
+        
+        principal_rules = {
+            principal: RateLimitRule.parse(principal, spec)
+            for principal, spec in settings.RATE_LIMIT_PRINCIPAL_RULES.items()
+        }
+        default_rule = RateLimitRule.parse("default", settings.RATE_LIMIT_DEFAULT) if settings.RATE_LIMIT_DEFAULT else None
+        
+        return cls(
+            redis_client,
+            default_rule=default_rule,
+            route_rules=route_rules,
+            principal_rules=principal_rules,
+            local_threshold=settings.RATE_LIMIT_LOCAL_THRESHOLD,
+            local_sync_every=settings.RATE_LIMIT_LOCAL_SYNC_EVERY,
+            local_max_entries=settings.RATE_LIMIT_LOCAL_MAX_ENTRIES,
+            fail_open=settings.RATE_LIMIT_FAIL_OPEN
+        )
+    
+    def resolve_rule(self, method: str, path: str, principal: str) -> Optional[RateLimitRule]:
+        """Regla aplicable: la del principal, la de la ruta o la de por defecto"""
+        rule = None
+        for rule_method, prefix, candidate in self.route_rules:
+            if path.startswith(prefix) and rule_method in ("*", method):
+                rule = candidate
+                break
+        
+        if rule is None:
+            # La regla por defecto solo cubre la API, no /health ni /docs
+            if not path.startswith("/api/"):
+                return None
+            rule = self.default_rule
+        
+        override = self.principal_rules.get(principal)
+        if override is not None and rule is not None:
+            return RateLimitRule(rule.name, override.limit, override.window_seconds)
+        return rule
+    
+    async def hit(self, rule: RateLimitRule, principal: str) -> RateLimitDecision:
+        """Contabilizar una petición del principal contra la regla"""
+        key = f"{rule.name}|{principal}"
+        bucket = self._buckets.get(key)
+        now = time.monotonic()
+        
+        if bucket is not None and self._admit_locally(rule, bucket, now):
+            self.stats["local_hits"] += 1
+            return RateLimitDecision(
+                rule,
+                True,
+                max(0, bucket.remaining - bucket.pending),
+                max(0, math.ceil(bucket.reset_at - now))
+            )
+        
+        # Las pendientes salen del bucket antes de esperar a Redis: las que
+        # se admitan en local mientras tanto van en la siguiente llamada
+        served = 0
+        if bucket is not None:
+            served, bucket.pending = bucket.pending, 0
+        self.stats["redis_checks"] += 1
+        try:
+            allowed, remaining, reset_ms, retry_ms = await self._script(
+                keys=[f"{RATE_LIMIT_KEY_PREFIX}{key}"],
+                args=[rule.limit, rule.window_seconds * 1000, 1, served]
+            )
+        except Exception as e:
+            if bucket is not None:
+                bucket.pending += served
+            self.stats["errors"] += 1
+            logger.error("Rate limit check failed", rule=rule.name, error=str(e))
+            return RateLimitDecision(rule, self.fail_open, rule.limit if self.fail_open else 0, rule.window_seconds, 1)
+        
+        # Otra petición concurrente puede haber creado el bucket durante la espera
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = LocalBucket(self._local_capacity(rule))
+        bucket.remaining = remaining
+        bucket.reset_at = now + reset_ms / 1000
+        self._buckets.set(key, bucket, ttl=rule.window_seconds * 2)
+        
+        if not allowed:
+            self.stats["rejected"] += 1
+            return RateLimitDecision(rule, False, 0, math.ceil(reset_ms / 1000), max(1, math.ceil(retry_ms / 1000)))
+        return RateLimitDecision(rule, True, remaining, math.ceil(reset_ms / 1000))
+    
+    def _local_capacity(self, rule: RateLimitRule) -> float:
+        return float(min(self.local_sync_every, rule.limit))
+    
+    def _admit_locally(self, rule: RateLimitRule, bucket: LocalBucket, now: float) -> bool:
+        """Admitir sin Redis si queda margen de sobra y el bucket tiene tokens"""
+        if bucket.pending >= self.local_sync_every or now >= bucket.reset_at:
+            return False
+        if bucket.remaining - bucket.pending <= rule.limit * self.local_threshold:
+            return False
+        
+        # Recarga al ritmo medio permitido por la regla
+        capacity = self._local_capacity(rule)
+        rate = rule.limit / rule.window_seconds
+        bucket.tokens = min(capacity, bucket.tokens + (now - bucket.updated_at) * rate)
+        bucket.updated_at = now
+        if bucket.tokens < 1:
+            return False
+        
+        bucket.tokens -= 1
+        bucket.pending += 1
+        return True
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Contadores del limitador para /health"""
+        return {**self.stats, "tracked_buckets": len(self._buckets)}
+
+
+# Instancia global del limitador
+rate_limiter: Optional[RateLimiter] = None
+
+
+def start_rate_limiter(redis_client: redis.Redis):
+    """Crear el limitador de tasa si está habilitado"""
+    global rate_limiter
+    
+    if settings.RATE_LIMIT_ENABLED:
+        rate_limiter = RateLimiter.from_settings(redis_client)
+        logger.info("Rate limiter started", rules=len(rate_limiter.route_rules))
+
+
+def stop_rate_limiter():
+    """Desactivar el limitador de tasa"""
+    global rate_limiter
+    rate_limiter = None
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """Obtener el limitador (None si está deshabilitado o sin iniciar)"""
+    return rate_limiter
@@ -2,22 +2,49 @@
 Configuración y conexión a Redis
 """
 
+import asyncio
+import fnmatch
+import time
+import uuid
 import redis.asyncio as redis
 from redis.exceptions import ConnectionError
 import structlog
 import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from app.core.config import settings
+from app.core.cache_codecs import CacheSerializer
+from app.core.local_cache import LocalLRUCache
 
 logger = structlog.get_logger()
 
+# Prefijo de los contadores de generación de etiquetas
+TAG_KEY_PREFIX = "cache:tag:"
+
+# Prefijo de los locks de recálculo (single-flight entre workers)
+LOCK_KEY_PREFIX = "cache:lock:"
+
+# Liberar el lock solo si sigue perteneciendo a quien lo adquirió
+RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
 # Cliente global de Redis
 redis_client: redis.Redis = None
 
+# Cliente binario (sin decodificar respuestas) usado por el caché
+cache_redis_client: redis.Redis = None
+
+# Instancia global del caché
+cache: "RedisCache" = None
+
 
 async def connect_to_redis():
     """Conectar a Redis"""
-    global redis_client
+    global redis_client, cache_redis_client, cache
     
     try:
         redis_client = redis.from_url(
@@ -26,9 +53,19 @@ async def connect_to_redis():
             decode_responses=True
         )
         
+        # Los valores del caché son binarios (cabecera de códec + payload)
+        cache_redis_client = redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=False
+        )
+        
         # Verificar conexión
         await redis_client.ping()
         
+        # Inicializar el caché y la propagación de invalidaciones de L1
+        cache = _build_cache(cache_redis_client)
+        await cache.start_invalidation_listener()
+        
         logger.info("Successfully connected to Redis")
         
     except ConnectionError as e:
@@ -41,7 +78,14 @@ async def connect_to_redis():
 
 async def close_redis_connection():
     """Cerrar conexión a Redis"""
-    global redis_client
+    global redis_client, cache_redis_client, cache
+    
+    if cache:
+        await cache.stop_invalidation_listener()
+        cache = None
+    
+    if cache_redis_client:
+        await cache_redis_client.close()
     
     if redis_client:
         await redis_client.close()
@@ -56,17 +100,89 @@ async def get_redis() -> redis.Redis:
 
 
 class RedisCache:
-    """Clase para manejar caché en Redis"""
+    """
+    Clase para manejar caché en Redis.
     
-    def __init__(self, redis_client: redis.Redis):
+    Opcionalmente mantiene una caché L1 en memoria del proceso delante de
+    Redis (L2). Las invalidaciones se propagan al resto de workers mediante
+    pub/sub; el TTL de L1 acota la obsolescencia si se pierde algún mensaje.
+    """
+    
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        local_cache: Optional[LocalLRUCache] = None,
+        invalidation_channel: str = "cache:invalidations",
+        serializer: Optional[CacheSerializer] = None
+    ):
         self.redis = redis_client
+        self.serializer = serializer or CacheSerializer(codec="json", compression="none")
+        self.local = local_cache
+        self.invalidation_channel = invalidation_channel
+        self.instance_id = uuid.uuid4().hex
+        self.stats = {
+            "l1_hits": 0,
+            "l1_misses": 0,
+            "l2_hits": 0,
+            "l2_misses": 0,
+            "computes": 0,
+            "coalesced": 0,
+            "stale_served": 0
+        }
+        # Cálculos en curso por clave (single-flight dentro del worker)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Contadores locales de invalidación por etiqueta (evitan repoblar L1
+        # con un valor leído antes de una invalidación recibida)
+        self._local_tag_versions: Dict[str, int] = {}
+        self._pubsub = None
+        self._listener_task: Optional[asyncio.Task] = None
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Obtener contadores de aciertos/fallos de L1 y L2"""
+        stats = dict(self.stats)
+        stats["l1_enabled"] = self.local is not None
+        stats["l1_size"] = len(self.local) if self.local is not None else 0
+        return stats
+    
+    def _get_local(self, key: str) -> Optional[Any]:
+        """Consultar L1 actualizando los contadores"""
+        if self.local is None:
+            return None
+        
+        value = self.local.get(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+        else:
+            self.stats["l1_misses"] += 1
+        return value
+    
+    def _set_local(self, key: str, value: Any, pttl: Optional[int], tags: List[str] = ()):
+        """Guardar en L1 respetando el TTL restante en Redis"""
+        if self.local is None:
+            return
+        
+        ttl = pttl / 1000 if pttl and pttl > 0 else None
+        self.local.set(key, value, ttl=ttl, tags=tags)
     
     async def get(self, key: str) -> dict:
         """Obtener valor del caché"""
+        value = self._get_local(key)
+        if value is not None:
+            return value
+        
         try:
-            value = await self.redis.get(key)
-            if value:
-                return json.loads(value)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.pttl(key)
+                raw, pttl = await pipe.execute()
+            
+            if raw:
+                self.stats["l2_hits"] += 1
+                value = self.serializer.loads(raw)
+                self._set_local(key, value, pttl)
+                return value
+            
+            self.stats["l2_misses"] += 1
             return None
         except Exception as e:
             logger.error("Error getting from cache", key=key, error=str(e))
@@ -78,36 +194,480 @@ class RedisCache:
             await self.redis.setex(
                 key, 
                 expire, 
-                json.dumps(value, default=str)
+                self.serializer.dumps(value)
             )
+            if self.local is not None:
+                self.local.delete(key)
+                await self._publish_invalidation(keys=[key])
         except Exception as e:
             logger.error("Error setting cache", key=key, error=str(e))
     
     async def delete(self, key: str):
         """Eliminar valor del caché"""
         try:
+            if self.local is not None:
+                self.local.delete(key)
             await self.redis.delete(key)
+            await self._publish_invalidation(keys=[key])
         except Exception as e:
             logger.error("Error deleting from cache", key=key, error=str(e))
     
-    async def delete_pattern(self, pattern: str):
-        """Eliminar valores que coincidan con un patrón"""
+    async def delete_pattern(self, pattern: str, batch_size: int = 500):
+        """
+        Eliminar valores que coincidan con un patrón.
+        
+        Usa SCAN por lotes en lugar de KEYS para no bloquear Redis, pero sigue
+        recorriendo todo el keyspace: para invalidaciones en caminos calientes
+        usar etiquetas (invalidate_tags).
+        """
         try:
-            keys = await self.redis.keys(pattern)
-            if keys:
-                await self.redis.delete(*keys)
+            self._delete_local_pattern(pattern)
+            batch = []
+            async for key in self.redis.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    await self.redis.unlink(*batch)
+                    batch = []
+            if batch:
+                await self.redis.unlink(*batch)
+            await self._publish_invalidation(patterns=[pattern])
         except Exception as e:
             logger.error("Error deleting pattern from cache", pattern=pattern, error=str(e))
+    
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        """Clave Redis del contador de generación de una etiqueta"""
+        return f"{TAG_KEY_PREFIX}{tag}"
+    
+    def _local_versions(self, tags: List[str]) -> Tuple[int, ...]:
+        """Versiones locales de invalidación de las etiquetas"""
+        return tuple(self._local_tag_versions.get(tag, 0) for tag in tags)
+    
+    async def _read_entry(self, key: str, tags: List[str]) -> Optional[Tuple[Any, bool]]:
+        """
+        Leer una entrada con sobre (valor, generaciones, frescura).
+        
+        La entrada y las generaciones actuales de sus etiquetas se leen en un
+        único round trip. Devuelve (valor, es_fresca) o None si no existe o
+        alguna etiqueta fue invalidada después de guardarla.
+        """
+        value = self._get_local(key)
+        if value is not None:
+            return value, True
+        
+        versions = self._local_versions(tags)
+        
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            if tags:
+                pipe.mget([self._tag_key(tag) for tag in tags])
+            results = await pipe.execute()
+        
+        raw, pttl = results[0], results[1]
+        generations = results[2] if tags else []
+        
+        if not raw:
+            self.stats["l2_misses"] += 1
+            return None
+        
+        entry = self.serializer.loads(raw)
+        current = {tag: int(gen or 0) for tag, gen in zip(tags, generations)}
+        if entry.get("tags", {}) != current:
+            self.stats["l2_misses"] += 1
+            return None
+        
+        self.stats["l2_hits"] += 1
+        value = entry.get("value")
+        fresh_ms = (entry.get("fresh_until", float("inf")) - time.time()) * 1000
+        is_fresh = fresh_ms > 0
+        
+        # L1 solo guarda valores frescos para no servir datos obsoletos sin revalidar
+        if is_fresh and self._local_versions(tags) == versions:
+            self._set_local(key, value, fresh_ms if pttl < 0 else min(pttl, fresh_ms), tags)
+        
+        return value, is_fresh
+    
+    async def _write_entry(
+        self,
+        key: str,
+        value: Any,
+        generations: Dict[str, int],
+        expire: int,
+        stale_ttl: int = 0
+    ):
+        """Guardar una entrada con sobre; vive en Redis expire + stale_ttl segundos"""
+        entry = {
+            "tags": generations,
+            "value": value,
+            "fresh_until": time.time() + expire
+        }
+        await self.redis.setex(key, expire + stale_ttl, self.serializer.dumps(entry))
+        if self.local is not None:
+            self.local.delete(key)
+    
+    async def get_tagged(self, key: str, tags: List[str]) -> Optional[dict]:
+        """
+        Obtener un valor etiquetado.
+        
+        Si alguna etiqueta fue invalidada después de guardar la entrada, o la
+        entrada ya no es fresca, se considera un fallo de caché.
+        """
+        try:
+            result = await self._read_entry(key, tags)
+            if result is None or not result[1]:
+                return None
+            return result[0]
+        except Exception as e:
+            logger.error("Error getting tagged value from cache", key=key, error=str(e))
+            return None
+    
+    async def get_tag_generations(self, tags: List[str]) -> Optional[Dict[str, int]]:
+        """Obtener la generación actual de cada etiqueta"""
+        if not tags:
+            return {}
+        
+        try:
+            generations = await self.redis.mget([self._tag_key(tag) for tag in tags])
+            return {tag: int(gen or 0) for tag, gen in zip(tags, generations)}
+        except Exception as e:
+            logger.error("Error getting cache tag generations", tags=tags, error=str(e))
+            return None
+    
+    async def set_tagged(
+        self,
+        key: str,
+        value: dict,
+        tags: List[str],
+        expire: int = 3600,
+        generations: Optional[Dict[str, int]] = None
+    ):
+        """
+        Establecer un valor asociado a la generación de sus etiquetas.
+        
+        Si el valor se calculó a partir de datos leídos antes, pasar las
+        generaciones obtenidas antes de esa lectura para que una invalidación
+        concurrente no quede oculta por el valor antiguo. El valor no se copia
+        a L1: se cargará en la siguiente lectura validada contra Redis.
+        """
+        try:
+            if generations is None:
+                generations = await self.get_tag_generations(tags)
+                if generations is None:
+                    return
+            await self._write_entry(key, value, generations, expire)
+        except Exception as e:
+            logger.error("Error setting tagged cache", key=key, error=str(e))
+    
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        expire: int = 3600,
+        tags: Optional[List[str]] = None,
+        stale_ttl: int = 0,
+        lock_timeout: float = 10.0,
+        wait_timeout: float = 5.0
+    ) -> Any:
+        """
+        Obtener un valor del caché o calcularlo una sola vez.
+        
+        - Dentro del worker, las peticiones concurrentes de la misma clave
+          esperan al mismo futuro en lugar de recalcular.
+        - Entre workers, solo quien obtiene un lock corto en Redis recalcula;
+          el resto espera a que aparezca el valor (hasta wait_timeout).
+        - Con stale_ttl > 0, durante stale_ttl segundos tras expirar se sirve
+          el valor anterior mientras se recalcula en segundo plano. Una
+          invalidación por etiqueta nunca se sirve como obsoleta.
+        
+        Los errores de `compute` se propagan a todos los que esperaban.
+        """
+        tags = tags or []
+        
+        try:
+            cached = await self._read_entry(key, tags)
+        except Exception as e:
+            logger.error("Error getting from cache", key=key, error=str(e))
+            cached = None
+        
+        if cached is not None:
+            value, is_fresh = cached
+            if is_fresh:
+                return value
+            
+            # Servir el valor obsoleto y revalidar en segundo plano
+            self.stats["stale_served"] += 1
+            if key not in self._inflight:
+                task = asyncio.create_task(
+                    self._single_flight(key, compute, expire, tags, stale_ttl, lock_timeout, 0, value)
+                )
+                task.add_done_callback(self._log_refresh_error)
+            return value
+        
+        return await self._single_flight(key, compute, expire, tags, stale_ttl, lock_timeout, wait_timeout)
+    
+    async def _single_flight(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        expire: int,
+        tags: List[str],
+        stale_ttl: int,
+        lock_timeout: float,
+        wait_timeout: float,
+        stale_value: Any = None
+    ) -> Any:
+        """Agrupar los cálculos concurrentes de una clave dentro del worker"""
+        while key in self._inflight:
+            future = self._inflight[key]
+            self.stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Si se canceló quien calculaba (y no esta petición), reintentar
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+        
+        future = asyncio.get_running_loop().create_future()
+        # Evitar avisos de "exception was never retrieved" si nadie esperaba
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        
+        try:
+            value = await self._compute_with_lock(
+                key, compute, expire, tags, stale_ttl, lock_timeout, wait_timeout, stale_value
+            )
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+    
+    async def _compute_with_lock(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        expire: int,
+        tags: List[str],
+        stale_ttl: int,
+        lock_timeout: float,
+        wait_timeout: float,
+        stale_value: Any = None
+    ) -> Any:
+        """
+        Calcular un valor protegido por un lock corto en Redis.
+        
+        Con wait_timeout == 0 (revalidación en segundo plano) no se espera:
+        si otro worker tiene el lock se devuelve stale_value.
+        """
+        lock_key = f"{LOCK_KEY_PREFIX}{key}"
+        token = uuid.uuid4().hex
+        acquired = False
+        
+        try:
+            acquired = await self.redis.set(lock_key, token, nx=True, px=int(lock_timeout * 1000))
+        except Exception as e:
+            logger.error("Error acquiring cache lock", key=key, error=str(e))
+        
+        if not acquired:
+            if wait_timeout <= 0:
+                return stale_value
+            
+            cached = await self._wait_for_value(key, tags, wait_timeout)
+            if cached is not None:
+                return cached[0]
+            logger.warning("Timed out waiting for cache recompute", key=key)
+        
+        try:
+            # Generaciones previas a la lectura, para no ocultar invalidaciones concurrentes
+            generations = await self.get_tag_generations(tags)
+            
+            self.stats["computes"] += 1
+            value = await compute()
+            
+            if generations is not None:
+                try:
+                    await self._write_entry(key, value, generations, expire, stale_ttl)
+                except Exception as e:
+                    logger.error("Error setting cache", key=key, error=str(e))
+            
+            return value
+        finally:
+            if acquired:
+                try:
+                    await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except Exception as e:
+                    logger.error("Error releasing cache lock", key=key, error=str(e))
+    
+    async def _wait_for_value(
+        self,
+        key: str,
+        tags: List[str],
+        wait_timeout: float
+    ) -> Optional[Tuple[Any, bool]]:
+        """Esperar a que otro worker publique un valor fresco"""
+        deadline = time.monotonic() + wait_timeout
+        delay = 0.02
+        
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.25)
+            try:
+                cached = await self._read_entry(key, tags)
+            except Exception:
+                cached = None
+            if cached is not None and cached[1]:
+                self.stats["coalesced"] += 1
+                return cached
+        
+        return None
+    
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task):
+        """Registrar errores de revalidaciones en segundo plano"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Error refreshing stale cache entry", error=str(task.exception()))
+    
+    async def invalidate_tags(self, *tags: str):
+        """
+        Invalidar todas las entradas asociadas a las etiquetas.
+        
+        Solo incrementa un contador por etiqueta (O(1), sin recorrer claves);
+        las entradas huérfanas caducan por su propio TTL.
+        """
+        try:
+            self._invalidate_local_tags(tags)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for tag in tags:
+                    pipe.incr(self._tag_key(tag))
+                await pipe.execute()
+            await self._publish_invalidation(tags=list(tags))
+        except Exception as e:
+            logger.error("Error invalidating cache tags", tags=list(tags), error=str(e))
+    
+    def _invalidate_local_tags(self, tags):
+        """Invalidar etiquetas en L1"""
+        if self.local is None:
+            return
+        
+        for tag in tags:
+            self._local_tag_versions[tag] = self._local_tag_versions.get(tag, 0) + 1
+        self.local.invalidate_tags(tags)
+    
+    def _delete_local_pattern(self, pattern: str):
+        """Eliminar de L1 las claves que coincidan con un patrón glob"""
+        if self.local is None:
+            return
+        
+        for key in self.local.keys():
+            if fnmatch.fnmatchcase(key, pattern):
+                self.local.delete(key)
+    
+    async def _publish_invalidation(
+        self,
+        keys: List[str] = (),
+        tags: List[str] = (),
+        patterns: List[str] = ()
+    ):
+        """Notificar una invalidación al resto de workers"""
+        if self.local is None:
+            return
+        
+        message = {
+            "origin": self.instance_id,
+            "keys": list(keys),
+            "tags": list(tags),
+            "patterns": list(patterns)
+        }
+        await self.redis.publish(self.invalidation_channel, json.dumps(message))
+    
+    def _apply_invalidation(self, data: str):
+        """Aplicar en L1 una invalidación recibida por pub/sub"""
+        message = json.loads(data)
+        if message.get("origin") == self.instance_id:
+            return
+        
+        self._invalidate_local_tags(message.get("tags", []))
+        for key in message.get("keys", []):
+            self.local.delete(key)
+        for pattern in message.get("patterns", []):
+            self._delete_local_pattern(pattern)
+    
+    async def start_invalidation_listener(self):
+        """Suscribirse al canal de invalidaciones (solo si L1 está activa)"""
+        if self.local is None or self._listener_task is not None:
+            return
+        
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.invalidation_channel)
+        self._listener_task = asyncio.create_task(self._listen_invalidations())
+        
+        logger.info("Cache invalidation listener started", channel=self.invalidation_channel)
+    
+    async def stop_invalidation_listener(self):
+        """Detener la suscripción al canal de invalidaciones"""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.invalidation_channel)
+            await self._pubsub.close()
+            self._pubsub = None
+    
+    async def _listen_invalidations(self):
+        """Procesar mensajes de invalidación hasta que se cancele la tarea"""
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get("type") == "message":
+                        self._apply_invalidation(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Pudieron perderse mensajes: vaciar L1 antes de reintentar
+                logger.error("Cache invalidation listener error", error=str(e))
+                self.local.clear()
+                await asyncio.sleep(1)
 
 
-# Instancia global del caché
-cache: RedisCache = None
+def _build_cache(client: redis.Redis) -> RedisCache:
+    """Construir el caché según la configuración"""
+    local_cache = None
+    if settings.CACHE_L1_ENABLED:
+        local_cache = LocalLRUCache(
+            max_entries=settings.CACHE_L1_MAX_ENTRIES,
+            default_ttl=settings.CACHE_L1_TTL_SECONDS
+        )
+    
+    serializer = CacheSerializer(
+        codec=settings.CACHE_CODEC,
+        compression=settings.CACHE_COMPRESSION,
+        compress_threshold=settings.CACHE_COMPRESSION_THRESHOLD
+    )
+    
+    return RedisCache(
+        client,
+        local_cache=local_cache,
+        invalidation_channel=settings.CACHE_INVALIDATION_CHANNEL,
+        serializer=serializer
+    )
 
 
 async def get_cache() -> RedisCache:
     """Obtener instancia del caché"""
     global cache
     if cache is None:
-        redis_client = await get_redis()
-        cache = RedisCache(redis_client)
+        if cache_redis_client is None:
+            raise Exception("Redis not initialized")
+        cache = _build_cache(cache_redis_client)
     return cache
@@ -0,0 +1,234 @@
+"""
+Almacenamiento en S3 sin bloquear el event loop
+
+boto3 es síncrono: llamado desde un handler `async` (upload_fileobj,
+delete_object) congela el event loop del worker durante toda la transferencia
+y con él todas las peticiones en curso. Aquí nada de boto3 se ejecuta en el
+event loop:
+
+- subidas: un TransferManager (s3transfer) compartido con su propio pool de
+  hilos. Por encima de AWS_S3_MULTIPART_THRESHOLD la subida es multipart y las
+  partes de AWS_S3_MULTIPART_CHUNKSIZE se envían en paralelo (como mucho
+  AWS_S3_MAX_CONCURRENCY a la vez entre todas las subidas del worker). El fin
+  de cada transferencia se notifica al event loop con call_soon_threadsafe,
+  sin hilos bloqueados esperando.
+- resto de llamadas (delete_object...): pool dedicado de AWS_S3_MAX_WORKERS
+  hilos, separado del executor por defecto de asyncio.
+
+Implementa StorageBackend (app/core/storage.py): las claves son las de S3 y no
+hay deduplicación por contenido.
+
+Con AWS_S3_ENDPOINT_URL se puede apuntar a MinIO o a moto server en local.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, BinaryIO, Callable, Dict, Optional
+
+import boto3
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore.config import Config
+from s3transfer.subscribers import BaseSubscriber
+import structlog
+
+from app.core.storage import StorageBackend, StoredFile, copy_and_hash
+
+logger = structlog.get_logger()
+
+
+def _resolve(waiter: asyncio.Future, transfer):
+    """Copiar el resultado de una transferencia terminada al future de asyncio"""
+    if waiter.done():
+        return
+    try:
+        waiter.set_result(transfer.result())
+    except Exception as e:
+        waiter.set_exception(e)
+
+
+class _DoneSubscriber(BaseSubscriber):
+    """Avisa al event loop cuando termina una transferencia (desde su hilo)"""
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, waiter: asyncio.Future):
+        self._loop = loop
+        self._waiter = waiter
+    
+    def on_done(self, future, **kwargs):
+        self._loop.call_soon_threadsafe(_resolve, self._waiter, future)
+
+
+class S3Storage(StorageBackend):
+    """Bucket S3 con transferencias fuera del event loop"""
+    
+    name = "s3"
+    
+    def __init__(
+        self,
+        bucket: str,
+        region: str = "us-east-1",
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        endpoint_url: Optional[str] = None,
+        public_url: Optional[str] = None,
+        acl: Optional[str] = "public-read",
+        max_workers: int = 8,
+        multipart_threshold: int = 8 * 1024 * 1024,
+        multipart_chunksize: int = 8 * 1024 * 1024,
+        max_concurrency: int = 10,
+        chunk_size: int = 1024 * 1024
+    ):
+        self.bucket = bucket
+        self.chunk_size = chunk_size
+        self.acl = acl
+        self.multipart_threshold = multipart_threshold
+        self.client = boto3.client(
+            's3',
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            region_name=region,
+            endpoint_url=endpoint_url,
+            # Una conexión por hilo de ambos pools
+            config=Config(max_pool_connections=max_workers + max_concurrency)
+        )
+        self._transfers = create_transfer_manager(
+            self.client,
+            TransferConfig(
+                multipart_threshold=multipart_threshold,
+                multipart_chunksize=multipart_chunksize,
+                max_concurrency=max_concurrency,
+                use_threads=True
+            )
+        )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3")
+        
+        # Base de las URLs públicas de los objetos
+        if public_url:
+            self.base_url = public_url.rstrip("/")
+        elif endpoint_url:
+            self.base_url = f"{endpoint_url.rstrip('/')}/{bucket}"
+        else:
+            self.base_url = f"https://{bucket}.s3.{region}.amazonaws.com"
+        
+        self.stats = {
+            "uploads": 0,
+            "multipart_uploads": 0,
+            "bytes_uploaded": 0,
+            "deletes": 0,
+            "errors": 0
+        }
+    
+    def url_for(self, key: str) -> str:
+        """URL pública de un objeto"""
+        return f"{self.base_url}/{key}"
+    
+    def key_from_url(self, url: str) -> Optional[str]:
+        """Clave de un objeto a partir de su URL (None si no es de este bucket)"""
+        prefix = f"{self.base_url}/"
+        return url[len(prefix):] if url.startswith(prefix) else None
+    
+    async def save(
+        self,
+        fileobj: BinaryIO,
+        key: str,
+        content_type: Optional[str] = None,
+        max_size: Optional[int] = None
+    ) -> StoredFile:
+        # Tamaño y SHA-256 en una lectura previa (en un hilo): las partes de
+        # una subida multipart se leen en paralelo y sin orden
+        start = fileobj.tell()
+        size, checksum = await asyncio.to_thread(copy_and_hash, fileobj, None, self.chunk_size, max_size)
+        fileobj.seek(start)
+        
+        url = await self.upload_fileobj(fileobj, key, content_type=content_type)
+        return StoredFile(key, url, size, checksum)
+    
+    async def read(self, key: str) -> bytes:
+        def get_object():
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        return await self._run(get_object)
+    
+    async def fetch(self, key: str, path: str):
+        """Descargar un objeto a disco (rangos en paralelo si es grande)"""
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        transfer = self._transfers.download(
+            self.bucket,
+            key,
+            path,
+            subscribers=[_DoneSubscriber(loop, waiter)]
+        )
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            transfer.cancel()
+            raise
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+    
+    async def upload_fileobj(self, fileobj, key: str, content_type: Optional[str] = None) -> str:
+        """
+        Subir un archivo abierto (posicionado al inicio) y devolver su URL.
+        
+        Se lee desde los hilos de transferencia: no debe cerrarse ni moverse
+        hasta que termine. Si se cancela la tarea se cancela la transferencia.
+        """
+        extra_args = {}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        if self.acl:
+            extra_args["ACL"] = self.acl
+        
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        transfer = self._transfers.upload(
+            fileobj,
+            self.bucket,
+            key,
+            extra_args=extra_args,
+            subscribers=[_DoneSubscriber(loop, waiter)]
+        )
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            transfer.cancel()
+            raise
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        
+        size = transfer.meta.size or 0
+        self.stats["uploads"] += 1
+        self.stats["bytes_uploaded"] += size
+        if size >= self.multipart_threshold:
+            self.stats["multipart_uploads"] += 1
+        return self.url_for(key)
+    
+    async def delete(self, key: str) -> bool:
+        """Eliminar un objeto"""
+        await self._run(self.client.delete_object, Bucket=self.bucket, Key=key)
+        self.stats["deletes"] += 1
+        return True
+    
+    async def _run(self, func: Callable, *args, **kwargs) -> Any:
+        """Ejecutar una llamada de boto3 en el pool dedicado"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Contadores de transferencias"""
+        return {"bucket": self.bucket, **self.stats}
+    
+    def shutdown(self):
+        """Cancelar las transferencias en curso y liberar los hilos (bloqueante)"""
+        self._transfers.shutdown(cancel=True, cancel_msg="S3 storage shutting down")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def close(self):
+        await asyncio.to_thread(self.shutdown)
+
@@ -0,0 +1,362 @@
+"""
+Almacenamiento de archivos multimedia
+
+StorageBackend es la interfaz común; MediaService solo guarda, lee y borra por
+clave (`storage_key` en media_files) sin saber dónde acaban los bytes:
+
+- local: disco, direccionado por contenido. Cada archivo se guarda una sola
+  vez en <LOCAL_STORAGE_DIR>/ab/cd/<sha256><ext> aunque se suba a muchas
+  campañas, con un contador de referencias al lado (<archivo>.refs). Borrar
+  resta una referencia y el archivo desaparece con la última.
+- s3: bucket S3 (app/core/s3_storage.py)
+- memory: diccionario en memoria, para pruebas y benchmarks
+
+Todas las copias se hacen por bloques en un hilo, calculando tamaño y SHA-256
+sobre la marcha: la memoria por subida no depende del tamaño del archivo y el
+event loop no se bloquea.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import re
+import shutil
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Optional, Tuple
+
+import structlog
+
+from app.core.config import settings
+from app.core.exceptions import FileUploadError
+
+try:
+    import fcntl
+except ImportError:  # Windows: los bloqueos solo cubren el proceso actual
+    fcntl = None
+
+logger = structlog.get_logger()
+
+_EXTENSION = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+
+def copy_and_hash(
+    source: BinaryIO,
+    target: Optional[BinaryIO],
+    chunk_size: int,
+    max_size: Optional[int] = None
+) -> Tuple[int, str]:
+    """
+    Copiar `source` en `target` (o solo leerlo si es None) por bloques.
+    
+    Devuelve (tamaño, sha256). Se ejecuta en un hilo; lanza FileUploadError
+    si el archivo está vacío o supera `max_size`.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise FileUploadError(
+                f"File size exceeds maximum allowed size of {max_size // (1024*1024)}MB"
+            )
+        digest.update(chunk)
+        if target is not None:
+            target.write(chunk)
+    
+    if size == 0:
+        raise FileUploadError("Empty file")
+    return size, digest.hexdigest()
+
+
+class StoredFile:
+    """Resultado de guardar un archivo"""
+    
+    __slots__ = ("key", "url", "size", "checksum")
+    
+    def __init__(self, key: str, url: str, size: int, checksum: str):
+        self.key = key  # storage_key: identifica el archivo en su almacenamiento
+        self.url = url
+        self.size = size
+        self.checksum = checksum  # SHA-256 del contenido
+
+
+class StorageBackend(ABC):
+    """Interfaz de un almacenamiento de archivos multimedia"""
+    
+    name: str = ""
+    
+    @abstractmethod
+    async def save(
+        self,
+        fileobj: BinaryIO,
+        key: str,
+        content_type: Optional[str] = None,
+        max_size: Optional[int] = None
+    ) -> StoredFile:
+        """
+        Guardar un archivo abierto en modo binario desde su posición actual.
+        
+        `key` es la clave propuesta; un almacenamiento direccionado por
+        contenido puede usar otra (la devuelta en StoredFile.key).
+        """
+    
+    @abstractmethod
+    async def read(self, key: str) -> bytes:
+        """Contenido completo de un archivo"""
+    
+    async def fetch(self, key: str, path: str):
+        """Copiar un archivo a una ruta local (para procesarlo)"""
+        data = await self.read(key)
+        
+        def write_file():
+            with open(path, "wb") as handle:
+                handle.write(data)
+        await asyncio.to_thread(write_file)
+    
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """Quitar una referencia; True si el archivo se eliminó físicamente"""
+    
+    @abstractmethod
+    def url_for(self, key: str) -> str:
+        """URL pública de una clave"""
+    
+    @abstractmethod
+    def key_from_url(self, url: str) -> Optional[str]:
+        """Clave a partir de una URL (documentos anteriores a storage_key)"""
+    
+    async def close(self):
+        """Liberar recursos"""
+
+
+class LocalStorage(StorageBackend):
+    """Disco local direccionado por contenido con contador de referencias"""
+    
+    name = "local"
+    
+    def __init__(self, root: str = "uploads", url_prefix: str = "/uploads", chunk_size: int = 1024 * 1024):
+        self.root = os.path.abspath(root)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.chunk_size = chunk_size
+        self._temp_dir = os.path.join(self.root, ".tmp")
+        # Sin fcntl (Windows) solo se serializan los hilos de este proceso
+        self._thread_lock = threading.Lock()
+    
+    def content_key(self, checksum: str, key: str = "") -> str:
+        """Clave de un contenido: ab/cd/<sha256><ext> (extensión tomada de `key`)"""
+        extension = os.path.splitext(key)[1].lower()
+        if not _EXTENSION.match(extension):
+            extension = ""
+        return f"{checksum[:2]}/{checksum[2:4]}/{checksum}{extension}"
+    
+    def path_for(self, key: str) -> str:
+        """Ruta en disco de una clave (sin salir de la raíz)"""
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+    
+    def url_for(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+    
+    def key_from_url(self, url: str) -> Optional[str]:
+        prefix = f"{self.url_prefix}/"
+        return url[len(prefix):] if url.startswith(prefix) else None
+    
+    async def save(
+        self,
+        fileobj: BinaryIO,
+        key: str,
+        content_type: Optional[str] = None,
+        max_size: Optional[int] = None
+    ) -> StoredFile:
+        temp_path = os.path.join(self._temp_dir, f"{uuid.uuid4().hex}.part")
+        try:
+            size, checksum = await asyncio.to_thread(self._write_temp, fileobj, temp_path, max_size)
+            stored_key = self.content_key(checksum, key)
+            references = await asyncio.to_thread(self._add_reference, stored_key, temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        
+        logger.info("File stored locally", key=stored_key, size=size, references=references)
+        return StoredFile(stored_key, self.url_for(stored_key), size, checksum)
+    
+    async def read(self, key: str) -> bytes:
+        def read_file():
+            with open(self.path_for(key), "rb") as handle:
+                return handle.read()
+        return await asyncio.to_thread(read_file)
+    
+    async def fetch(self, key: str, path: str):
+        await asyncio.to_thread(shutil.copyfile, self.path_for(key), path)
+    
+    async def delete(self, key: str) -> bool:
+        return await asyncio.to_thread(self._release, key)
+    
+    def references(self, key: str) -> int:
+        """Referencias de un archivo (0 si no existe)"""
+        return self._read_refs(self.path_for(key))
+    
+    def _write_temp(self, fileobj: BinaryIO, temp_path: str, max_size: Optional[int]) -> Tuple[int, str]:
+        os.makedirs(self._temp_dir, exist_ok=True)
+        with open(temp_path, "wb") as target:
+            result = copy_and_hash(fileobj, target, self.chunk_size, max_size)
+            target.flush()
+            os.fsync(target.fileno())
+        return result
+    
+    def _add_reference(self, key: str, temp_path: str) -> int:
+        path = self.path_for(key)
+        with self._locked(os.path.dirname(path)):
+            references = self._read_refs(path) + 1
+            if not os.path.exists(path):
+                # Primera copia de este contenido: publicarla (os.replace es atómico)
+                os.replace(temp_path, path)
+            self._write_refs(path, references)
+        return references
+    
+    def _release(self, key: str) -> bool:
+        path = self.path_for(key)
+        with self._locked(os.path.dirname(path)):
+            references = self._read_refs(path)
+            if references > 1:
+                self._write_refs(path, references - 1)
+                return False
+            
+            # Última referencia (o archivo sin contador, guardado antes de
+            # direccionar por contenido)
+            removed = os.path.exists(path)
+            for file_path in (path, f"{path}.refs"):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            return removed
+    
+    @staticmethod
+    def _read_refs(path: str) -> int:
+        try:
+            with open(f"{path}.refs", "r") as handle:
+                return int(handle.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+    
+    @staticmethod
+    def _write_refs(path: str, references: int):
+        temp_path = f"{path}.refs.{uuid.uuid4().hex}"
+        with open(temp_path, "w") as handle:
+            handle.write(str(references))
+        os.replace(temp_path, f"{path}.refs")
+    
+    @contextmanager
+    def _locked(self, directory: str):
+        """Bloqueo exclusivo de un directorio, compartido entre procesos"""
+        os.makedirs(directory, exist_ok=True)
+        if fcntl is None:
+            with self._thread_lock:
+                yield
+            return
+        
+        # El archivo de bloqueo no se borra nunca: todos bloquean el mismo inodo
+        with open(os.path.join(directory, ".lock"), "a") as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            yield
+
+
+class MemoryStorage(StorageBackend):
+    """Archivos en un diccionario del proceso (pruebas y benchmarks)"""
+    
+    name = "memory"
+    
+    def __init__(self, chunk_size: int = 1024 * 1024):
+        self.chunk_size = chunk_size
+        self.objects: Dict[str, bytes] = {}
+    
+    def url_for(self, key: str) -> str:
+        return f"memory://{key}"
+    
+    def key_from_url(self, url: str) -> Optional[str]:
+        return url[len("memory://"):] if url.startswith("memory://") else None
+    
+    async def save(
+        self,
+        fileobj: BinaryIO,
+        key: str,
+        content_type: Optional[str] = None,
+        max_size: Optional[int] = None
+    ) -> StoredFile:
+        buffer = io.BytesIO()
+        size, checksum = copy_and_hash(fileobj, buffer, self.chunk_size, max_size)
+        self.objects[key] = buffer.getvalue()
+        return StoredFile(key, self.url_for(key), size, checksum)
+    
+    async def read(self, key: str) -> bytes:
+        return self.objects[key]
+    
+    async def delete(self, key: str) -> bool:
+        return self.objects.pop(key, None) is not None
+
+
+def build_storage() -> StorageBackend:
+    """Crear el almacenamiento indicado en STORAGE_BACKEND"""
+    backend = settings.STORAGE_BACKEND
+    if backend == "auto":
+        s3_configured = all([settings.AWS_S3_BUCKET, settings.AWS_ACCESS_KEY_ID, settings.AWS_SECRET_ACCESS_KEY])
+        backend = "s3" if s3_configured else "local"
+    
+    if backend == "s3":
+        from app.core.s3_storage import S3Storage
+        
+        return S3Storage(
+            bucket=settings.AWS_S3_BUCKET,
+            region=settings.AWS_REGION,
+            access_key_id=settings.AWS_ACCESS_KEY_ID,
+            secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+            public_url=settings.AWS_S3_PUBLIC_URL,
+            max_workers=settings.AWS_S3_MAX_WORKERS,
+            multipart_threshold=settings.AWS_S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=settings.AWS_S3_MULTIPART_CHUNKSIZE,
+            max_concurrency=settings.AWS_S3_MAX_CONCURRENCY,
+            chunk_size=settings.MEDIA_UPLOAD_CHUNK_SIZE
+        )
+    if backend == "local":
+        return LocalStorage(
+            root=settings.LOCAL_STORAGE_DIR,
+            url_prefix=settings.LOCAL_STORAGE_URL_PREFIX,
+            chunk_size=settings.MEDIA_UPLOAD_CHUNK_SIZE
+        )
+    if backend == "memory":
+        return MemoryStorage(chunk_size=settings.MEDIA_UPLOAD_CHUNK_SIZE)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+# Instancia global del almacenamiento
+storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """Obtener el almacenamiento, creándolo en el primer uso"""
+    global storage
+    
+    if storage is None:
+        storage = build_storage()
+        logger.info("Storage backend created", backend=storage.name)
+    return storage
+
+
+async def close_storage():
+    """Cerrar el almacenamiento"""
+    global storage
+    
+    if storage:
+        backend, storage = storage, None
+        await backend.close()
+        logger.info("Storage backend closed", backend=backend.name)
@@ -0,0 +1,405 @@
+"""
+Índice espacial en memoria de los objetivos geográficos de campañas
+
+Cada GeoLocation de tipo point, circle o polygon se convierte en una
+geometría de Shapely (los círculos, en polígonos geodésicos) y se indexa en
+un STRtree. La consulta "¿qué campañas cubren este punto?" obtiene los
+candidatos por caja envolvente en el árbol y confirma con intersects_xy sobre
+geometrías preparadas, en microsegundos.
+
+Los objetivos country y region no tienen geometría (no hay fronteras en el
+sistema): se indexan por nombre normalizado y solo coinciden cuando la
+consulta indica país o región.
+
+El STRtree es inmutable. Las campañas modificadas desde la última
+construcción se guardan en una capa de cambios que se recorre de forma
+lineal y oculta sus entradas del árbol; al superar `rebuild_threshold`
+campañas se reconstruye el árbol con todas las geometrías ya preparadas.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import shapely
+from shapely.affinity import translate
+from shapely.geometry import Point, Polygon, box
+from shapely.ops import unary_union
+
+from app.core.geodesy import enclosed_pole, geodesic_circle
+from app.core.text import normalize_search_text
+
+WORLD = box(-180.0, -90.0, 180.0, 90.0)
+
+
+def _field(location: Any, name: str) -> Any:
+    """Leer un campo de una GeoLocation o de su documento en MongoDB"""
+    if isinstance(location, dict):
+        return location.get(name)
+    return getattr(location, name, None)
+
+
+def _location_type(location: Any) -> str:
+    """Tipo de objetivo como texto (LocationType o su valor guardado)"""
+    location_type = _field(location, "type")
+    return getattr(location_type, "value", location_type)
+
+
+def _wrap_antimeridian(geometry):
+    """Trocear una geometría que sale de [-180, 180] y devolver las partes a su sitio"""
+    min_lon, _, max_lon, _ = geometry.bounds
+    if min_lon >= -180 and max_lon <= 180:
+        return geometry
+    
+    parts = [geometry.intersection(WORLD)]
+    for shift in (-360.0, 360.0):
+        part = translate(geometry, xoff=shift).intersection(WORLD)
+        if not part.is_empty:
+            parts.append(part)
+    return unary_union(parts)
+
+
+def _polar_cap(ring: np.ndarray, pole: float):
+    """
+    Polígono plano de un círculo que contiene un polo.
+    
+    Alrededor del polo el anillo da una vuelta completa en longitud, así que
+    como polígono plano no encierra nada útil: se desenrolla la longitud
+    (360° seguidos) y se cierra por la latitud del polo.
+    """
+    longitudes = np.degrees(np.unwrap(np.radians(ring[:, 0])))
+    latitudes = ring[:, 1]
+    if longitudes[-1] < longitudes[0]:
+        longitudes, latitudes = longitudes[::-1], latitudes[::-1]
+    
+    end = longitudes[0] + 360.0
+    coordinates = list(zip(longitudes, latitudes))
+    coordinates += [(end, latitudes[0]), (end, pole), (longitudes[0], pole)]
+    return _wrap_antimeridian(Polygon(coordinates))
+
+
+def build_target_geometry(
+    location: Any,
+    point_radius_km: float = 0.0,
+    circle_segments: int = 64,
+    spherical: bool = False
+):
+    """
+    Geometría de Shapely de un objetivo (None para country y region).
+    
+    Los objetivos point usan su propio radio si lo tienen o, en su defecto,
+    `point_radius_km`; con radio 0 solo coincide el punto exacto.
+    
+    Con `spherical` la geometría es para 2dsphere (aristas geodésicas): un
+    círculo que contiene un polo se deja como el anillo tal cual, que en la
+    esfera ya encierra el polo. Lanza ValueError si el radio es de un cuarto
+    de meridiano o más.
+    """
+    location_type = _location_type(location)
+    
+    if location_type in ("point", "circle"):
+        longitude, latitude = _field(location, "coordinates")
+        radius = _field(location, "radius") or (
+            point_radius_km if location_type == "point" else 0.0
+        )
+        if not radius:
+            return Point(longitude, latitude)
+        
+        ring = geodesic_circle(longitude, latitude, radius, circle_segments)
+        pole = enclosed_pole(latitude, radius)
+        if pole is None:
+            return _wrap_antimeridian(Polygon(ring))
+        if spherical:
+            ring[:, 0] = (ring[:, 0] + 180.0) % 360.0 - 180.0
+            return Polygon(ring)
+        return _polar_cap(ring, pole)
+    
+    if location_type == "polygon":
+        coordinates = _field(location, "polygon_coordinates") or []
+        if len(coordinates) < 3:
+            return None
+        geometry = shapely.make_valid(Polygon(coordinates))
+        return shapely.remove_repeated_points(geometry)
+    
+    return None
+
+
+def target_geometry_document(
+    locations: Iterable[Any],
+    point_radius_km: float = 0.0,
+    circle_segments: int = 64
+) -> Optional[dict]:
+    """
+    GeoJSON con todos los objetivos geométricos de una campaña, para el
+    índice 2dsphere de `campaigns.target_geometry` (None si no hay ninguno).
+    """
+    geometries = [
+        geometry
+        for geometry in (
+            build_target_geometry(location, point_radius_km, circle_segments, spherical=True)
+            for location in locations
+        )
+        if geometry is not None and not geometry.is_empty
+    ]
+    if not geometries:
+        return None
+    
+    documents = [json.loads(shapely.to_geojson(geometry)) for geometry in geometries]
+    if len(documents) == 1:
+        return documents[0]
+    return {"type": "GeometryCollection", "geometries": documents}
+
+
+class CampaignTargets:
+    """Objetivos de una campaña activa ya convertidos para el índice"""
+    
+    __slots__ = ("campaign_id", "geometries", "countries", "regions", "start_date", "end_date")
+    
+    def __init__(
+        self,
+        campaign_id: str,
+        geometries: list,
+        countries: Set[str],
+        regions: Set[Tuple[str, str]],
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ):
+        self.campaign_id = campaign_id
+        self.geometries = geometries
+        self.countries = countries
+        self.regions = regions
+        self.start_date = start_date
+        self.end_date = end_date
+    
+    @classmethod
+    def from_campaign(
+        cls,
+        campaign: Dict[str, Any],
+        point_radius_km: float = 0.0,
+        circle_segments: int = 64
+    ) -> "CampaignTargets":
+        """Construir desde un documento de campaña (o Campaign.dict())"""
+        campaign_id = str(campaign.get("_id") or campaign.get("id"))
+        geometries = []
+        countries = set()
+        regions = set()
+        
+        for location in campaign.get("target_locations") or []:
+            location_type = _location_type(location)
+            if location_type == "country":
+                if _field(location, "country"):
+                    countries.add(normalize_search_text(_field(location, "country")))
+                continue
+            if location_type == "region":
+                if _field(location, "region"):
+                    regions.add((
+                        normalize_search_text(_field(location, "country") or ""),
+                        normalize_search_text(_field(location, "region"))
+                    ))
+                elif _field(location, "country"):
+                    countries.add(normalize_search_text(_field(location, "country")))
+                continue
+            
+            try:
+                geometry = build_target_geometry(location, point_radius_km, circle_segments)
+            except ValueError:
+                continue  # círculo demasiado grande, guardado antes de limitar el radio
+            if geometry is not None and not geometry.is_empty:
+                shapely.prepare(geometry)
+                geometries.append(geometry)
+        
+        return cls(
+            campaign_id,
+            geometries,
+            countries,
+            regions,
+            campaign.get("start_date"),
+            campaign.get("end_date")
+        )
+    
+    def is_running(self, at: datetime) -> bool:
+        """Si la fecha está dentro del periodo de la campaña"""
+        if self.start_date and at < self.start_date:
+            return False
+        if self.end_date and at > self.end_date:
+            return False
+        return True
+
+
+class TargetingIndex:
+    """STRtree de geometrías preparadas con capa de cambios incrementales"""
+    
+    def __init__(self, point_radius_km: float = 0.0, circle_segments: int = 64, rebuild_threshold: int = 128):
+        self.point_radius_km = point_radius_km
+        self.circle_segments = circle_segments
+        self.rebuild_threshold = rebuild_threshold
+        
+        self._campaigns: Dict[str, CampaignTargets] = {}
+        self._countries: Dict[str, Set[str]] = {}
+        self._regions: Dict[Tuple[str, str], Set[str]] = {}
+        
+        # Árbol construido y, por posición, la campaña de cada geometría
+        self._tree: Optional[shapely.STRtree] = None
+        self._tree_geometries = np.empty(0, dtype=object)
+        self._tree_owners = np.empty(0, dtype=object)
+        # Campañas cambiadas desde la última construcción: sus entradas del
+        # árbol se ignoran y se usan las de aquí (lista vacía si se eliminaron)
+        self._overlay: Dict[str, list] = {}
+        # STRtree pequeño de la capa, construido en la primera consulta tras un cambio
+        self._overlay_tree: Optional[Tuple[shapely.STRtree, np.ndarray, np.ndarray]] = None
+        
+        self.stats = {
+            "queries": 0,
+            "rebuilds": 0
+        }
+    
+    def __len__(self) -> int:
+        return len(self._campaigns)
+    
+    def load(self, campaigns: Iterable[Dict[str, Any]]):
+        """Sustituir el contenido por el de `campaigns` y construir el árbol"""
+        self._campaigns = {}
+        self._countries = {}
+        self._regions = {}
+        for campaign in campaigns:
+            self._add(self._targets(campaign))
+        self.rebuild()
+    
+    def upsert(self, campaign: Dict[str, Any]):
+        """Añadir o reemplazar los objetivos de una campaña"""
+        targets = self._targets(campaign)
+        self._discard(targets.campaign_id)
+        self._add(targets)
+        self._overlay[targets.campaign_id] = targets.geometries
+        self._overlay_tree = None
+        self._maybe_rebuild()
+    
+    def remove(self, campaign_id: str):
+        """Quitar una campaña del índice"""
+        if self._discard(campaign_id):
+            self._overlay[campaign_id] = []
+            self._overlay_tree = None
+            self._maybe_rebuild()
+    
+    def rebuild(self):
+        """Construir el STRtree con todas las geometrías y vaciar la capa de cambios"""
+        self._tree_geometries, self._tree_owners = self._flatten({
+            campaign_id: targets.geometries for campaign_id, targets in self._campaigns.items()
+        })
+        self._tree = shapely.STRtree(self._tree_geometries) if len(self._tree_geometries) else None
+        self._overlay = {}
+        self._overlay_tree = None
+        self.stats["rebuilds"] += 1
+    
+    def query(
+        self,
+        longitude: float,
+        latitude: float,
+        country: Optional[str] = None,
+        region: Optional[str] = None,
+        at: Optional[datetime] = None
+    ) -> List[str]:
+        """IDs de las campañas en curso cuyos objetivos cubren el punto"""
+        self.stats["queries"] += 1
+        if not -180 <= longitude <= 180:
+            longitude = (longitude + 180.0) % 360.0 - 180.0
+        point = Point(longitude, latitude)
+        matched = set()
+        
+        if self._tree is not None:
+            matched.update(self._query_tree(
+                self._tree, self._tree_geometries, self._tree_owners, point, longitude, latitude
+            ))
+            # Las entradas del árbol de campañas cambiadas están obsoletas
+            matched.difference_update(self._overlay)
+        
+        if self._overlay:
+            matched.update(self._query_tree(*self._get_overlay_tree(), point, longitude, latitude))
+        
+        if country:
+            country_key = normalize_search_text(country)
+            matched.update(self._countries.get(country_key, ()))
+            if region:
+                region_key = normalize_search_text(region)
+                matched.update(self._regions.get((country_key, region_key), ()))
+                matched.update(self._regions.get(("", region_key), ()))
+        elif region:
+            matched.update(self._regions.get(("", normalize_search_text(region)), ()))
+        
+        at = at or datetime.utcnow()
+        return sorted(
+            campaign_id for campaign_id in matched
+            if self._campaigns[campaign_id].is_running(at)
+        )
+    
+    def get_stats(self) -> dict:
+        """Tamaño del índice y de la capa de cambios"""
+        return {
+            **self.stats,
+            "campaigns": len(self._campaigns),
+            "tree_geometries": len(self._tree_owners),
+            "pending_changes": len(self._overlay),
+            "countries": len(self._countries),
+            "regions": len(self._regions)
+        }
+    
+    def _targets(self, campaign: Dict[str, Any]) -> CampaignTargets:
+        return CampaignTargets.from_campaign(campaign, self.point_radius_km, self.circle_segments)
+    
+    def _add(self, targets: CampaignTargets):
+        self._campaigns[targets.campaign_id] = targets
+        for country in targets.countries:
+            self._countries.setdefault(country, set()).add(targets.campaign_id)
+        for region in targets.regions:
+            self._regions.setdefault(region, set()).add(targets.campaign_id)
+    
+    def _discard(self, campaign_id: str) -> bool:
+        targets = self._campaigns.pop(campaign_id, None)
+        if targets is None:
+            return False
+        
+        for index, keys in ((self._countries, targets.countries), (self._regions, targets.regions)):
+            for key in keys:
+                members = index.get(key)
+                if members is not None:
+                    members.discard(campaign_id)
+                    if not members:
+                        del index[key]
+        return True
+    
+    @staticmethod
+    def _query_tree(
+        tree: shapely.STRtree,
+        geometries: np.ndarray,
+        owners: np.ndarray,
+        point,
+        longitude: float,
+        latitude: float
+    ) -> list:
+        """Candidatos por caja envolvente, confirmados con las geometrías preparadas"""
+        candidates = tree.query(point)
+        if not len(candidates):
+            return []
+        hits = shapely.intersects_xy(geometries[candidates], longitude, latitude)
+        return owners[candidates[hits]].tolist()
+    
+    def _get_overlay_tree(self) -> Tuple[shapely.STRtree, np.ndarray, np.ndarray]:
+        if self._overlay_tree is None:
+            geometries, owners = self._flatten(self._overlay)
+            self._overlay_tree = (shapely.STRtree(geometries), geometries, owners)
+        return self._overlay_tree
+    
+    @staticmethod
+    def _flatten(campaign_geometries: Dict[str, list]) -> Tuple[np.ndarray, np.ndarray]:
+        """Geometrías de varias campañas en un array, con la campaña de cada una"""
+        geometries = []
+        owners = []
+        for campaign_id, campaign_geometry_list in campaign_geometries.items():
+            geometries.extend(campaign_geometry_list)
+            owners.extend([campaign_id] * len(campaign_geometry_list))
+        return np.array(geometries, dtype=object), np.array(owners, dtype=object)
+    
+    def _maybe_rebuild(self):
+        if len(self._overlay) >= self.rebuild_threshold:
+            self.rebuild()
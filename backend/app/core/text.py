@@ -0,0 +1,23 @@
+"""
+Utilidades de normalización de texto para búsquedas
+"""
+
+import re
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_search_text(value: str) -> str:
+    """
+    Normalizar texto para búsquedas por prefijo.
+    
+    Pasa a minúsculas, elimina acentos y diacríticos ("Campaña Ávila" ->
+    "campana avila") y colapsa los espacios.
+    """
+    if not value:
+        return ""
+    
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    folded = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _WHITESPACE_RE.sub(" ", folded).strip()
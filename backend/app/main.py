@@ -6,12 +6,24 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
+import asyncio
 import structlog
 import time
 
 from app.core.config import settings
-from app.core.database import connect_to_mongo, close_mongo_connection
-from app.core.redis_client import connect_to_redis, close_redis_connection
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.core.redis_client import connect_to_redis, close_redis_connection, get_cache, get_redis
+from app.core.gazetteer import load_gazetteer
+from app.core.http_client import connect_http_client, close_http_client
+from app.core.storage import close_storage
+from app.core.password_hashing import get_password_hasher, close_password_hasher
+from app.core.rate_limit import start_rate_limiter, stop_rate_limiter, get_rate_limiter
+from app.services.event_service import start_event_ingestion, stop_event_ingestion
+from app.services.media_service import build_media_queue
+from app.services.metrics_service import start_metrics_rollup, stop_metrics_rollup
+from app.services.revocation_service import start_token_revocation, stop_token_revocation
+from app.services.targeting_service import start_targeting, stop_targeting, get_targeting_engine
+from app.api.deps import auth_service
 from app.api.v1.api import api_router
 from app.core.exceptions import CustomException
 
@@ -60,6 +72,64 @@ app.add_middleware(
     allowed_hosts=["localhost", "127.0.0.1", "*.inmax.com"]
 )
 
+
+async def resolve_principal(request: Request) -> str:
+    """
+    Principal al que se atribuye la petición: el usuario del token si es
+    válido o, en su defecto, la IP del cliente.
+    
+    Las claims verificadas quedan en `request.state.principal`, donde las
+    reutiliza la dependencia get_current_user.
+    """
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            user_data = await auth_service.verify_token(token)
+            if user_data.get("user_id"):
+                request.state.principal = user_data
+                return f"user:{user_data['user_id']}"
+        except Exception:
+            # El endpoint responderá 401; se limita por IP
+            pass
+    
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+# Middleware de limitación de tasa
+@app.middleware("http")
+async def rate_limit_requests(request: Request, call_next):
+    limiter = get_rate_limiter()
+    if limiter is None or request.method == "OPTIONS":
+        return await call_next(request)
+    
+    principal = await resolve_principal(request)
+    rule = limiter.resolve_rule(request.method, request.url.path, principal)
+    if rule is None:
+        return await call_next(request)
+    
+    decision = await limiter.hit(rule, principal)
+    if not decision.allowed:
+        logger.warning(
+            "Rate limit exceeded",
+            rule=rule.name,
+            principal=principal,
+            retry_after=decision.retry_after
+        )
+        return JSONResponse(
+            status_code=429,
+            content={
+                "error": "Too many requests",
+                "type": "RateLimitExceeded",
+                "status_code": 429
+            },
+            headers=decision.headers()
+        )
+    
+    response = await call_next(request)
+    response.headers.update(decision.headers())
+    return response
+
 # Middleware de logging de requests
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -106,6 +176,27 @@ async def startup_event():
     await connect_to_redis()
     logger.info("Connected to Redis")
     
+    # Cargar el gazetteer local fuera del event loop
+    await asyncio.to_thread(load_gazetteer)
+    
+    # Crear el cliente HTTP compartido para servicios externos
+    await connect_http_client()
+    
+    # Cargar la lista de tokens revocados
+    await start_token_revocation(await get_redis())
+    
+    # Iniciar la limitación de tasa
+    start_rate_limiter(await get_redis())
+    
+    # Cargar el índice de segmentación de campañas activas
+    await start_targeting(await get_database(), await get_redis())
+    
+    # Iniciar el volcado periódico de eventos
+    await start_event_ingestion(await get_database())
+    
+    # Iniciar el rollup de métricas por intervalos
+    await start_metrics_rollup(await get_database(), await get_redis())
+    
     logger.info("Application startup completed")
 
 @app.on_event("shutdown")
@@ -113,14 +204,25 @@ async def shutdown_event():
     """Eventos que se ejecutan al cerrar la aplicación"""
     logger.info("Shutting down Inmax Campaigns API...")
     
+    # Volcar los eventos pendientes antes de desconectar MongoDB
+    await stop_event_ingestion()
+    await stop_metrics_rollup()
+    await stop_targeting()
+    
     # Cerrar conexión a MongoDB
     await close_mongo_connection()
     logger.info("Disconnected from MongoDB")
     
     # Cerrar conexión a Redis
+    stop_rate_limiter()
+    await stop_token_revocation()
     await close_redis_connection()
     logger.info("Disconnected from Redis")
     
+    await close_http_client()
+    await close_storage()
+    close_password_hasher()
+    
     logger.info("Application shutdown completed")
 
 # Manejador global de excepciones
@@ -155,6 +257,39 @@ async def health_check():
         "environment": settings.ENVIRONMENT
     }
 
+# Estadísticas del caché
+@app.get("/health/cache")
+async def cache_stats():
+    """Contadores de aciertos y fallos del caché L1 (memoria) y L2 (Redis)"""
+    cache = await get_cache()
+    return cache.get_stats()
+
+# Estado del pool de hash de contraseñas
+@app.get("/health/password-hashing")
+async def password_hashing_stats():
+    """Ocupación y cola del pool de bcrypt"""
+    return get_password_hasher().get_stats()
+
+# Estado del limitador de tasa
+@app.get("/health/rate-limit")
+async def rate_limit_stats():
+    """Peticiones admitidas en local, consultas a Redis y rechazos"""
+    limiter = get_rate_limiter()
+    return limiter.get_stats() if limiter else {"enabled": False}
+
+# Estado del índice de segmentación
+@app.get("/health/targeting")
+async def targeting_stats():
+    """Campañas y geometrías indexadas, cambios pendientes y reconstrucciones"""
+    engine = get_targeting_engine()
+    return engine.get_stats() if engine else {"enabled": False}
+
+# Estado de la cola de procesamiento de multimedia
+@app.get("/health/media")
+async def media_queue_stats():
+    """Trabajos pendientes, reintentos, descartados y workers de multimedia activos"""
+    return await build_media_queue(await get_redis()).get_stats()
+
 # Endpoint raíz
 @app.get("/")
 async def root():
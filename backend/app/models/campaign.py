@@ -26,6 +26,20 @@ class CampaignPriority(str, Enum):
     URGENT = "urgent"
 
 
+class MetricGranularity(str, Enum):
+    """Granularidad de los buckets de métricas"""
+    MINUTE = "minute"
+    HOUR = "hour"
+    DAY = "day"
+
+
+class SearchMode(str, Enum):
+    """Modos de búsqueda de campañas por nombre"""
+    TEXT = "text"      # Índice de texto con ranking por relevancia
+    PREFIX = "prefix"  # Autocompletado por prefijo sobre el nombre normalizado
+    REGEX = "regex"    # Subcadena sin anclar (no usa índices)
+
+
 class LocationType(str, Enum):
     """Tipos de ubicación geográfica"""
     POINT = "point"
@@ -35,11 +49,17 @@ class LocationType(str, Enum):
     REGION = "region"
 
 
+class DistanceMode(str, Enum):
+    """Cálculo de distancias: precisión frente a rendimiento"""
+    FAST = "fast"    # Haversine sobre la esfera (error de hasta ~0,5 %)
+    EXACT = "exact"  # Geodésica sobre el elipsoide WGS84 (Vincenty)
+
+
 class GeoLocation(BaseModel):
     """Modelo para ubicación geográfica"""
     type: LocationType
     coordinates: List[float] = Field(..., min_items=2, max_items=2)  # [longitude, latitude]
-    radius: Optional[float] = Field(None, gt=0)  # Para círculos
+    radius: Optional[float] = Field(None, gt=0, lt=10000)  # Para círculos, en km (menos de un cuarto de meridiano)
     polygon_coordinates: Optional[List[List[float]]] = None  # Para polígonos
     country: Optional[str] = None
     region: Optional[str] = None
@@ -61,6 +81,30 @@ class GeoLocation(BaseModel):
         return v
 
 
+class DistanceMatrixRequest(BaseModel):
+    """Petición de matriz de distancias entre dos conjuntos de puntos"""
+    origins: List[List[float]] = Field(..., min_items=1)  # [[longitude, latitude], ...]
+    destinations: Optional[List[List[float]]] = Field(None, min_items=1)  # por defecto, origins
+    mode: DistanceMode = DistanceMode.FAST
+
+
+class DistanceMatrixResponse(BaseModel):
+    """Matriz de distancias: distances_km[i][j] va de origins[i] a destinations[j]"""
+    mode: DistanceMode
+    rows: int
+    columns: int
+    distances_km: List[List[float]]
+
+
+class TargetedCampaigns(BaseModel):
+    """Campañas activas cuyos objetivos cubren un punto"""
+    longitude: float
+    latitude: float
+    campaign_ids: List[str]
+    count: int
+    source: str  # "index" (STRtree en memoria) o "database" ($geoIntersects)
+
+
 class MediaFile(BaseModel):
     """Modelo para archivos multimedia"""
     id: str = Field(..., alias="_id")
@@ -147,10 +191,20 @@ class Campaign(CampaignBase):
 class CampaignList(BaseModel):
     """Modelo para listar campañas con paginación"""
     campaigns: List[Campaign]
-    total: int
+    total: Optional[int] = None  # None si no se solicitó el total
     page: int
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # Cursor opaco para la página siguiente
+    has_more: bool = False
+
+
+class MetricBucket(BaseModel):
+    """Métricas agregadas de una campaña en un intervalo"""
+    bucket: datetime  # Inicio del intervalo (UTC)
+    views: int = 0
+    clicks: int = 0
+    conversions: int = 0
 
 
 class CampaignStats(BaseModel):
@@ -165,3 +219,23 @@ class CampaignStats(BaseModel):
     cost_per_conversion: float = 0.0
     total_spent: float = 0.0
     last_updated: datetime
+    # Solo en consultas por rango de fechas
+    granularity: Optional[MetricGranularity] = None
+    from_date: Optional[datetime] = None
+    to_date: Optional[datetime] = None
+    series: List[MetricBucket] = []
+
+
+class CampaignSummary(BaseModel):
+    """Resumen de las campañas de un usuario para el dashboard"""
+    total_campaigns: int = 0
+    by_status: Dict[str, int] = {}
+    total_budget: float = 0.0
+    budget_by_status: Dict[str, float] = {}
+    views: int = 0
+    clicks: int = 0
+    conversions: int = 0
+    ctr: float = 0.0  # Click-through rate agregado
+    conversion_rate: float = 0.0
+    recent_campaigns: List[Campaign] = []
+    generated_at: datetime
@@ -0,0 +1,35 @@
+"""
+Modelos de datos para decisiones de anuncios
+"""
+
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+from app.models.campaign import CampaignPriority
+
+
+class DecisionRequest(BaseModel):
+    """Contexto de una petición de anuncio"""
+    longitude: float = Field(..., ge=-180, le=180)
+    latitude: float = Field(..., ge=-90, le=90)
+    channel: str = Field(..., min_length=1, max_length=100)
+    country: Optional[str] = None  # Para objetivos de tipo country
+    region: Optional[str] = None  # Para objetivos de tipo region
+    demographics: Dict[str, Any] = Field(default_factory=dict)  # p. ej. {"age": 30, "interests": ["technology"]}
+    limit: int = Field(1, ge=1, le=50)
+
+
+class DecisionCampaign(BaseModel):
+    """Campaña elegible para servir"""
+    id: str
+    name: str
+    channel: str
+    priority: CampaignPriority
+    budget: float
+    media_files: List[str] = Field(default_factory=list)
+
+
+class DecisionResponse(BaseModel):
+    """Campañas elegibles ordenadas por prioridad"""
+    campaigns: List[DecisionCampaign]
+    count: int
@@ -0,0 +1,57 @@
+"""
+Modelos de datos para eventos de campañas (impresiones, clics y conversiones)
+"""
+
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field, validator
+from bson import ObjectId
+from enum import Enum
+
+
+class EventType(str, Enum):
+    """Tipos de evento de una campaña"""
+    VIEW = "view"
+    CLICK = "click"
+    CONVERSION = "conversion"
+
+
+# Contador del documento de campaña que incrementa cada tipo de evento
+EVENT_COUNTER_FIELDS = {
+    EventType.VIEW: "views_count",
+    EventType.CLICK: "clicks_count",
+    EventType.CONVERSION: "conversions_count"
+}
+
+# Métrica de los buckets de campaign_metrics que incrementa cada tipo de evento
+EVENT_METRIC_FIELDS = {
+    EventType.VIEW: "views",
+    EventType.CLICK: "clicks",
+    EventType.CONVERSION: "conversions"
+}
+
+
+class CampaignEvent(BaseModel):
+    """Evento individual (o pre-agregado con `count`)"""
+    campaign_id: str
+    type: EventType
+    count: int = Field(1, ge=1, le=10000)
+    timestamp: Optional[datetime] = None  # Por defecto, el instante de recepción
+    
+    @validator('campaign_id')
+    def validate_campaign_id(cls, v):
+        """Validar que el ID de campaña sea un ObjectId"""
+        if not ObjectId.is_valid(v):
+            raise ValueError('Invalid campaign id')
+        return v
+
+
+class CampaignEventBatch(BaseModel):
+    """Lote de eventos"""
+    events: List[CampaignEvent] = Field(..., min_items=1, max_items=5000)
+
+
+class EventIngestResponse(BaseModel):
+    """Respuesta de ingesta de eventos"""
+    accepted: int
+    pending: int
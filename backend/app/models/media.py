@@ -3,7 +3,7 @@ Modelos de datos para archivos multimedia
 """
 
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field, validator
 from bson import ObjectId
 from enum import Enum
@@ -64,12 +64,18 @@ class MediaFile(MediaFileBase):
     status: MediaStatus = MediaStatus.UPLOADING
     upload_date: datetime
     processed_date: Optional[datetime] = None
+    processing_progress: int = 0  # 0-100, lo actualiza el worker de multimedia
     user_id: str
+    checksum: Optional[str] = None  # SHA-256 del contenido
+    storage_key: Optional[str] = None  # clave en el almacenamiento (STORAGE_BACKEND)
     error_message: Optional[str] = None
+    detected_mime_type: Optional[str] = None  # según el contenido, no lo declarado
     
     # Metadatos específicos por tipo
     image_metadata: Optional[Dict[str, Any]] = None  # width, height, format, etc.
     video_metadata: Optional[Dict[str, Any]] = None  # duration, resolution, codec, etc.
+    # Miniatura y versiones por ancho: name (thumbnail, w640...), format, width, height, url...
+    renditions: Optional[List[Dict[str, Any]]] = None
     
     class Config:
         allow_population_by_field_name = True
@@ -82,10 +88,12 @@ class MediaFile(MediaFileBase):
 class MediaFileList(BaseModel):
     """Modelo para listar archivos multimedia con paginación"""
     files: list[MediaFile]
-    total: int
+    total: Optional[int] = None  # None si no se solicitó el total
     page: int
     size: int
-    pages: int
+    pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # Cursor opaco para la página siguiente
+    has_more: bool = False
 
 
 class MediaUploadResponse(BaseModel):
@@ -4,14 +4,37 @@ Servicio de autenticación y autorización
 
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
+import hashlib
+import time
+import uuid
 import jwt
 import structlog
 
 from app.core.config import settings
-from app.core.exceptions import UnauthorizedError, ValidationError
+from app.core.exceptions import UnauthorizedError, ValidationError, ServiceUnavailableError
+from app.core.password_hashing import get_password_hasher
+from app.core.local_cache import LocalLRUCache
+from app.services.revocation_service import get_revocation_store
 
 logger = structlog.get_logger()
 
+# Claims de tokens ya verificados, por hash del token. Cada entrada caduca en
+# el `exp` del token, así que la firma se verifica una vez por token y worker.
+verified_tokens = LocalLRUCache(
+    max_entries=settings.AUTH_TOKEN_CACHE_MAX_ENTRIES,
+    default_ttl=settings.AUTH_TOKEN_CACHE_MAX_TTL_SECONDS
+)
+
+
+def user_tokens_tag(user_id: str) -> str:
+    """Etiqueta que agrupa los tokens cacheados de un usuario"""
+    return f"user:{user_id}"
+
+
+def token_cache_key(token: str) -> str:
+    """Clave de caché de un token (no se guarda el token en claro)"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
 
 class AuthService:
     """Servicio para autenticación y autorización"""
@@ -25,8 +48,10 @@ class AuthService:
         """Crear token de acceso JWT"""
         try:
             to_encode = data.copy()
-            expire = datetime.utcnow() + timedelta(minutes=self.expire_minutes)
-            to_encode.update({"exp": expire})
+            now = datetime.utcnow()
+            expire = now + timedelta(minutes=self.expire_minutes)
+            # jti identifica el token para poder revocarlo
+            to_encode.update({"exp": expire, "iat": now, "jti": uuid.uuid4().hex})
             
             encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
             
@@ -39,7 +64,29 @@ class AuthService:
             raise ValidationError("Error creating access token")
     
     async def verify_token(self, token: str) -> Dict[str, Any]:
-        """Verificar y decodificar token JWT"""
+        """Verificar y decodificar token JWT, usando la caché de tokens verificados"""
+        cache_key = token_cache_key(token) if settings.AUTH_TOKEN_CACHE_ENABLED else None
+        payload = verified_tokens.get(cache_key) if cache_key else None
+        
+        if payload is None:
+            payload = self._decode_token(token)
+            if cache_key:
+                exp = payload.get("exp")
+                ttl = exp - time.time() if exp else None
+                tags = (user_tokens_tag(payload["user_id"]),) if payload.get("user_id") else ()
+                verified_tokens.set(cache_key, payload, ttl=ttl, tags=tags)
+        
+        # La revocación se comprueba también con el token en caché
+        jti = payload.get("jti")
+        revocation_store = get_revocation_store()
+        if jti and revocation_store and await revocation_store.is_revoked(jti):
+            logger.warning("Revoked token used", user_id=payload.get("user_id"), jti=jti)
+            raise UnauthorizedError("Token has been revoked")
+        
+        return dict(payload)
+    
+    def _decode_token(self, token: str) -> Dict[str, Any]:
+        """Verificar la firma y la expiración de un token JWT"""
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
             
@@ -52,6 +99,8 @@ class AuthService:
             
             return payload
             
+        except UnauthorizedError:
+            raise
         except jwt.ExpiredSignatureError:
             logger.error("Token has expired")
             raise UnauthorizedError("Token has expired")
@@ -62,6 +111,22 @@ class AuthService:
             logger.error("Error verifying token", error=str(e))
             raise UnauthorizedError("Error verifying token")
     
+    async def revoke_token(self, payload: Dict[str, Any]):
+        """Revocar un token ya verificado hasta su expiración"""
+        jti = payload.get("jti")
+        if not jti:
+            raise ValidationError("Token cannot be revoked")
+        
+        revocation_store = get_revocation_store()
+        if revocation_store is None:
+            raise Exception("Token revocation not initialized")
+        
+        await revocation_store.revoke(jti, payload["exp"])
+    
+    def forget_user_tokens(self, user_id: str):
+        """Descartar de la caché local los tokens verificados de un usuario"""
+        verified_tokens.invalidate_tags([user_tokens_tag(user_id)])
+    
     async def authenticate_user(
         self, 
         username: str, 
@@ -90,34 +155,30 @@ class AuthService:
             
             return user
             
+        except ServiceUnavailableError:
+            raise
         except Exception as e:
             logger.error("Error authenticating user", username=username, error=str(e))
             return None
     
-    def hash_password(self, password: str) -> str:
-        """Hashear contraseña"""
+    async def hash_password(self, password: str) -> str:
+        """Hashear contraseña en el pool de bcrypt"""
         try:
-            from passlib.context import CryptContext
-            
-            pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-            hashed = pwd_context.hash(password)
-            
-            return hashed
+            return await get_password_hasher().hash(password)
             
+        except ServiceUnavailableError:
+            raise
         except Exception as e:
             logger.error("Error hashing password", error=str(e))
             raise ValidationError("Error hashing password")
     
     async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Verificar contraseña"""
+        """Verificar contraseña en el pool de bcrypt"""
         try:
-            from passlib.context import CryptContext
-            
-            pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-            is_valid = pwd_context.verify(plain_password, hashed_password)
-            
-            return is_valid
+            return await get_password_hasher().verify(plain_password, hashed_password)
             
+        except ServiceUnavailableError:
+            raise
         except Exception as e:
             logger.error("Error verifying password", error=str(e))
             return False
@@ -2,20 +2,36 @@
 Servicio para gestión de campañas
 """
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from bson import ObjectId
+from pymongo import ReturnDocument
+import re
 import structlog
 
 from app.models.campaign import (
     Campaign, CampaignCreate, CampaignUpdate, CampaignList, 
-    CampaignStats, CampaignStatus
+    CampaignStats, CampaignStatus, SearchMode, MetricGranularity, CampaignSummary
 )
+from app.core.config import settings
 from app.core.database import get_database
 from app.core.exceptions import NotFoundError, ValidationError, DatabaseError
+from app.core.pagination import TotalMode, count_total, encode_cursor, keyset_filter
+from app.core.targeting import target_geometry_document
+from app.core.text import normalize_search_text
+from app.services.metrics_service import MetricsService, to_utc_naive
 
 logger = structlog.get_logger()
 
+# Transiciones de estado permitidas
+VALID_STATUS_TRANSITIONS = {
+    CampaignStatus.DRAFT: [CampaignStatus.ACTIVE, CampaignStatus.CANCELLED],
+    CampaignStatus.ACTIVE: [CampaignStatus.PAUSED, CampaignStatus.FINISHED, CampaignStatus.CANCELLED],
+    CampaignStatus.PAUSED: [CampaignStatus.ACTIVE, CampaignStatus.FINISHED, CampaignStatus.CANCELLED],
+    CampaignStatus.FINISHED: [],  # No se puede cambiar desde finished
+    CampaignStatus.CANCELLED: []  # No se puede cambiar desde cancelled
+}
+
 
 class CampaignService:
     """Servicio para operaciones de campañas"""
@@ -31,6 +47,8 @@ class CampaignService:
             
             campaign_dict = campaign_data.dict()
             campaign_dict.update({
+                "name_normalized": normalize_search_text(campaign_data.name),
+                "target_geometry": self._target_geometry(campaign_dict["target_locations"]),
                 "user_id": user_id,
                 "status": CampaignStatus.DRAFT,
                 "created_at": now,
@@ -96,9 +114,18 @@ class CampaignService:
         page: int = 1,
         size: int = 10,
         status: Optional[CampaignStatus] = None,
-        search: Optional[str] = None
+        search: Optional[str] = None,
+        cursor: Optional[str] = None,
+        total_mode: TotalMode = TotalMode.EXACT,
+        search_mode: SearchMode = SearchMode.REGEX
     ) -> CampaignList:
-        """Listar campañas con paginación y filtros"""
+        """
+        Listar campañas con paginación y filtros.
+        
+        Con `cursor` se usa paginación keyset sobre (created_at, _id) y se
+        ignora `page`; sin él se mantiene la paginación por offset. La
+        búsqueda en modo texto ordena por relevancia y solo admite offset.
+        """
         try:
             # Construir filtros
             filters = {"user_id": user_id}
@@ -106,18 +133,49 @@ class CampaignService:
             if status:
                 filters["status"] = status
             
-            if search:
+            text_search = bool(search) and search_mode == SearchMode.TEXT
+            if text_search:
+                if cursor:
+                    raise ValidationError("Cursor pagination is not supported with text search")
+                filters["$text"] = {"$search": search}
+            elif search and search_mode == SearchMode.PREFIX:
+                # Prefijo anclado y sensible a mayúsculas: usa el índice sobre name_normalized
+                prefix = normalize_search_text(search)
+                filters["name_normalized"] = {"$regex": f"^{re.escape(prefix)}"}
+            elif search:
                 filters["name"] = {"$regex": search, "$options": "i"}
             
-            # Calcular skip
-            skip = (page - 1) * size
-            
-            # Obtener total de documentos
-            total = await self.collection.count_documents(filters)
-            
-            # Obtener campañas
-            cursor = self.collection.find(filters).skip(skip).limit(size).sort("created_at", -1)
-            campaigns_docs = await cursor.to_list(length=size)
+            # Obtener total de documentos (opcional)
+            total = await count_total(self.collection, filters, total_mode)
+            
+            # Obtener campañas (una de más para saber si hay página siguiente)
+            if text_search:
+                db_cursor = self.collection.find(
+                    filters,
+                    {"score": {"$meta": "textScore"}}
+                ).skip((page - 1) * size).sort([
+                    ("score", {"$meta": "textScore"}),
+                    ("created_at", -1),
+                    ("_id", -1)
+                ])
+            else:
+                if cursor:
+                    cursor_filters = {**filters, **keyset_filter("created_at", cursor)}
+                    db_cursor = self.collection.find(cursor_filters)
+                else:
+                    db_cursor = self.collection.find(filters).skip((page - 1) * size)
+                db_cursor = db_cursor.sort([("created_at", -1), ("_id", -1)])
+            
+            db_cursor = db_cursor.limit(size + 1)
+            campaigns_docs = await db_cursor.to_list(length=size + 1)
+            
+            has_more = len(campaigns_docs) > size
+            campaigns_docs = campaigns_docs[:size]
+            
+            next_cursor = None
+            if has_more and not text_search:
+                last = campaigns_docs[-1]
+                next_cursor = encode_cursor(last["created_at"], last["_id"])
             
             # Convertir a objetos Campaign
             campaigns = []
@@ -126,48 +184,156 @@ class CampaignService:
                 campaigns.append(Campaign(**doc))
             
             # Calcular páginas
-            pages = (total + size - 1) // size
+            pages = (total + size - 1) // size if total is not None else None
             
             return CampaignList(
                 campaigns=campaigns,
                 total=total,
                 page=page,
                 size=size,
-                pages=pages
+                pages=pages,
+                next_cursor=next_cursor,
+                has_more=has_more
             )
             
+        except ValidationError:
+            raise
         except Exception as e:
             logger.error("Error listing campaigns", error=str(e))
             raise DatabaseError("Error listing campaigns")
     
+    async def autocomplete_campaigns(
+        self,
+        user_id: str,
+        prefix: str,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Sugerir campañas cuyo nombre normalizado empieza por el prefijo"""
+        try:
+            normalized = normalize_search_text(prefix)
+            if not normalized:
+                return []
+            
+            cursor = self.collection.find(
+                {
+                    "user_id": user_id,
+                    "name_normalized": {"$regex": f"^{re.escape(normalized)}"}
+                },
+                {"name": 1, "status": 1}
+            ).sort("name_normalized", 1).limit(limit)
+            
+            return [
+                {"id": str(doc["_id"]), "name": doc["name"], "status": doc.get("status")}
+                for doc in await cursor.to_list(length=limit)
+            ]
+            
+        except Exception as e:
+            logger.error("Error autocompleting campaigns", error=str(e))
+            raise DatabaseError("Error autocompleting campaigns")
+    
+    async def get_campaign_summary(self, user_id: str, recent_limit: int = 5) -> CampaignSummary:
+        """
+        Resumen del dashboard en una sola agregación.
+        
+        El $match inicial usa el índice por user_id; el $facet calcula en la
+        misma pasada los conteos por estado, los totales y las campañas recientes.
+        """
+        try:
+            facet_stages = {
+                "by_status": [
+                    {"$group": {
+                        "_id": "$status",
+                        "count": {"$sum": 1},
+                        "budget": {"$sum": "$budget"}
+                    }}
+                ],
+                "totals": [
+                    {"$group": {
+                        "_id": None,
+                        "campaigns": {"$sum": 1},
+                        "budget": {"$sum": "$budget"},
+                        "views": {"$sum": "$views_count"},
+                        "clicks": {"$sum": "$clicks_count"},
+                        "conversions": {"$sum": "$conversions_count"}
+                    }}
+                ]
+            }
+            # $limit tiene que ser positivo: con 0 no se piden campañas recientes
+            if recent_limit > 0:
+                facet_stages["recent"] = [
+                    {"$sort": {"created_at": -1, "_id": -1}},
+                    {"$limit": recent_limit}
+                ]
+            
+            pipeline = [
+                {"$match": {"user_id": user_id}},
+                {"$facet": facet_stages}
+            ]
+            
+            result = await self.collection.aggregate(pipeline).to_list(length=1)
+            facets = result[0] if result else {}
+            
+            totals = (facets.get("totals") or [{}])[0]
+            views = totals.get("views", 0)
+            clicks = totals.get("clicks", 0)
+            conversions = totals.get("conversions", 0)
+            
+            recent_campaigns = []
+            for doc in facets.get("recent", []):
+                doc["_id"] = str(doc["_id"])
+                recent_campaigns.append(Campaign(**doc))
+            
+            return CampaignSummary(
+                total_campaigns=totals.get("campaigns", 0),
+                by_status={item["_id"]: item["count"] for item in facets.get("by_status", [])},
+                total_budget=round(totals.get("budget", 0), 2),
+                budget_by_status={
+                    item["_id"]: round(item["budget"], 2) for item in facets.get("by_status", [])
+                },
+                views=views,
+                clicks=clicks,
+                conversions=conversions,
+                ctr=round(clicks / views * 100, 2) if views > 0 else 0,
+                conversion_rate=round(conversions / clicks * 100, 2) if clicks > 0 else 0,
+                recent_campaigns=recent_campaigns,
+                generated_at=datetime.utcnow()
+            )
+            
+        except Exception as e:
+            logger.error("Error getting campaign summary", user_id=user_id, error=str(e))
+            raise DatabaseError("Error retrieving campaign summary")
+    
     async def update_campaign(
         self,
         campaign_id: str,
         campaign_data: CampaignUpdate,
         user_id: str
     ) -> Campaign:
-        """Actualizar una campaña"""
+        """Actualizar una campaña en una sola operación (propiedad verificada en el filtro)"""
         try:
-            # Verificar que la campaña existe y pertenece al usuario
-            existing_campaign = await self.get_campaign(campaign_id, user_id)
-            if not existing_campaign:
+            if not ObjectId.is_valid(campaign_id):
                 raise NotFoundError("Campaign", campaign_id)
             
             # Preparar datos de actualización
             update_data = campaign_data.dict(exclude_unset=True)
             update_data["updated_at"] = datetime.utcnow()
+            if update_data.get("name"):
+                update_data["name_normalized"] = normalize_search_text(update_data["name"])
+            if "target_locations" in update_data:
+                update_data["target_geometry"] = self._target_geometry(update_data["target_locations"] or [])
             
-            # Actualizar en la base de datos
-            result = await self.collection.update_one(
+            # Actualizar y obtener el documento resultante en un solo viaje
+            campaign_doc = await self.collection.find_one_and_update(
                 {"_id": ObjectId(campaign_id), "user_id": user_id},
-                {"$set": update_data}
+                {"$set": update_data},
+                return_document=ReturnDocument.AFTER
             )
             
-            if result.matched_count == 0:
+            if not campaign_doc:
                 raise NotFoundError("Campaign", campaign_id)
             
-            # Obtener la campaña actualizada
-            updated_campaign = await self.get_campaign_by_id(campaign_id)
+            campaign_doc["_id"] = str(campaign_doc["_id"])
+            updated_campaign = Campaign(**campaign_doc)
             
             logger.info(
                 "Campaign updated successfully",
@@ -184,19 +350,17 @@ class CampaignService:
             raise DatabaseError("Error updating campaign")
     
     async def delete_campaign(self, campaign_id: str, user_id: str) -> bool:
-        """Eliminar una campaña"""
+        """Eliminar una campaña en una sola operación (propiedad verificada en el filtro)"""
         try:
-            # Verificar que la campaña existe y pertenece al usuario
-            existing_campaign = await self.get_campaign(campaign_id, user_id)
-            if not existing_campaign:
+            if not ObjectId.is_valid(campaign_id):
                 raise NotFoundError("Campaign", campaign_id)
             
-            # Eliminar de la base de datos
-            result = await self.collection.delete_one(
-                {"_id": ObjectId(campaign_id), "user_id": user_id}
+            deleted = await self.collection.find_one_and_delete(
+                {"_id": ObjectId(campaign_id), "user_id": user_id},
+                projection={"_id": 1}
             )
             
-            if result.deleted_count == 0:
+            if not deleted:
                 raise NotFoundError("Campaign", campaign_id)
             
             logger.info(
@@ -219,35 +383,38 @@ class CampaignService:
         new_status: CampaignStatus,
         user_id: str
     ) -> Campaign:
-        """Actualizar el estado de una campaña"""
+        """
+        Actualizar el estado de una campaña.
+        
+        La transición se valida en el propio filtro (estado actual entre los
+        que pueden pasar a `new_status`), así que el cambio es atómico y cuesta
+        un viaje. Solo si no hay coincidencia se lee la campaña para distinguir
+        entre no encontrada y transición inválida.
+        """
         try:
-            # Verificar que la campaña existe y pertenece al usuario
-            existing_campaign = await self.get_campaign(campaign_id, user_id)
-            if not existing_campaign:
+            if not ObjectId.is_valid(campaign_id):
                 raise NotFoundError("Campaign", campaign_id)
             
-            # Validar transición de estado
-            if not self._is_valid_status_transition(existing_campaign.status, new_status):
+            campaign_doc = await self.collection.find_one_and_update(
+                {
+                    "_id": ObjectId(campaign_id),
+                    "user_id": user_id,
+                    "status": {"$in": self._source_statuses(new_status)}
+                },
+                {"$set": {"status": new_status, "updated_at": datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER
+            )
+            
+            if not campaign_doc:
+                existing_campaign = await self.get_campaign(campaign_id, user_id)
+                if not existing_campaign:
+                    raise NotFoundError("Campaign", campaign_id)
                 raise ValidationError(
                     f"Invalid status transition from {existing_campaign.status} to {new_status}"
                 )
             
-            # Actualizar estado
-            update_data = {
-                "status": new_status,
-                "updated_at": datetime.utcnow()
-            }
-            
-            result = await self.collection.update_one(
-                {"_id": ObjectId(campaign_id), "user_id": user_id},
-                {"$set": update_data}
-            )
-            
-            if result.matched_count == 0:
-                raise NotFoundError("Campaign", campaign_id)
-            
-            # Obtener la campaña actualizada
-            updated_campaign = await self.get_campaign_by_id(campaign_id)
+            campaign_doc["_id"] = str(campaign_doc["_id"])
+            updated_campaign = Campaign(**campaign_doc)
             
             logger.info(
                 "Campaign status updated successfully",
@@ -264,30 +431,61 @@ class CampaignService:
             logger.error("Error updating campaign status", campaign_id=campaign_id, error=str(e))
             raise DatabaseError("Error updating campaign status")
     
-    async def get_campaign_stats(self, campaign_id: str) -> CampaignStats:
-        """Obtener estadísticas de una campaña"""
+    async def get_campaign_stats(
+        self,
+        campaign_id: str,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        granularity: Optional[MetricGranularity] = None
+    ) -> CampaignStats:
+        """
+        Obtener estadísticas de una campaña.
+        
+        Sin rango ni granularidad se usan los contadores acumulados de la
+        campaña. Con alguno de ellos se leen los buckets de campaign_metrics
+        (por defecto: últimas 24 horas por hora) y se devuelve la serie.
+        """
         try:
             campaign = await self.get_campaign_by_id(campaign_id)
             if not campaign:
                 raise NotFoundError("Campaign", campaign_id)
             
+            series = []
+            views, clicks, conversions = campaign.views_count, campaign.clicks_count, campaign.conversions_count
+            
+            if from_date or to_date or granularity:
+                granularity = granularity or MetricGranularity.HOUR
+                to_date = to_utc_naive(to_date) if to_date else datetime.utcnow()
+                from_date = to_utc_naive(from_date) if from_date else to_date - timedelta(days=1)
+                if from_date >= to_date:
+                    raise ValidationError("'from' must be earlier than 'to'")
+                
+                series = await MetricsService(self.db).get_series(campaign_id, from_date, to_date, granularity)
+                views = sum(bucket.views for bucket in series)
+                clicks = sum(bucket.clicks for bucket in series)
+                conversions = sum(bucket.conversions for bucket in series)
+            
             # Calcular métricas
-            ctr = (campaign.clicks_count / campaign.views_count * 100) if campaign.views_count > 0 else 0
-            conversion_rate = (campaign.conversions_count / campaign.clicks_count * 100) if campaign.clicks_count > 0 else 0
-            cost_per_click = (campaign.budget / campaign.clicks_count) if campaign.clicks_count > 0 else 0
-            cost_per_conversion = (campaign.budget / campaign.conversions_count) if campaign.conversions_count > 0 else 0
+            ctr = (clicks / views * 100) if views > 0 else 0
+            conversion_rate = (conversions / clicks * 100) if clicks > 0 else 0
+            cost_per_click = (campaign.budget / clicks) if clicks > 0 else 0
+            cost_per_conversion = (campaign.budget / conversions) if conversions > 0 else 0
             
             stats = CampaignStats(
                 campaign_id=campaign_id,
-                views=campaign.views_count,
-                clicks=campaign.clicks_count,
-                conversions=campaign.conversions_count,
+                views=views,
+                clicks=clicks,
+                conversions=conversions,
                 ctr=round(ctr, 2),
                 conversion_rate=round(conversion_rate, 2),
                 cost_per_click=round(cost_per_click, 2),
                 cost_per_conversion=round(cost_per_conversion, 2),
                 total_spent=campaign.budget,
-                last_updated=datetime.utcnow()
+                last_updated=datetime.utcnow(),
+                granularity=granularity,
+                from_date=from_date,
+                to_date=to_date,
+                series=series
             )
             
             logger.info(
@@ -297,20 +495,28 @@ class CampaignService:
             
             return stats
             
-        except NotFoundError:
+        except (NotFoundError, ValidationError):
             raise
         except Exception as e:
             logger.error("Error getting campaign stats", campaign_id=campaign_id, error=str(e))
             raise DatabaseError("Error retrieving campaign stats")
     
+    def _target_geometry(self, target_locations: List[Dict[str, Any]]) -> Optional[dict]:
+        """GeoJSON de los objetivos para el índice 2dsphere de `target_geometry`"""
+        return target_geometry_document(
+            target_locations,
+            settings.TARGETING_POINT_RADIUS_KM,
+            settings.TARGETING_CIRCLE_SEGMENTS
+        )
+    
     def _is_valid_status_transition(self, current_status: CampaignStatus, new_status: CampaignStatus) -> bool:
         """Validar si una transición de estado es válida"""
-        valid_transitions = {
-            CampaignStatus.DRAFT: [CampaignStatus.ACTIVE, CampaignStatus.CANCELLED],
-            CampaignStatus.ACTIVE: [CampaignStatus.PAUSED, CampaignStatus.FINISHED, CampaignStatus.CANCELLED],
-            CampaignStatus.PAUSED: [CampaignStatus.ACTIVE, CampaignStatus.FINISHED, CampaignStatus.CANCELLED],
-            CampaignStatus.FINISHED: [],  # No se puede cambiar desde finished
-            CampaignStatus.CANCELLED: []  # No se puede cambiar desde cancelled
-        }
-        
-        return new_status in valid_transitions.get(current_status, [])
+        return new_status in VALID_STATUS_TRANSITIONS.get(current_status, [])
+    
+    def _source_statuses(self, new_status: CampaignStatus) -> List[str]:
+        """Estados desde los que se puede pasar a `new_status`"""
+        return [
+            current_status.value
+            for current_status, targets in VALID_STATUS_TRANSITIONS.items()
+            if new_status in targets
+        ]
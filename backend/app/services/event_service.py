@@ -0,0 +1,279 @@
+"""
+Servicio de ingesta de eventos de campañas
+
+Los eventos se acumulan en memoria del worker y se vuelcan periódicamente a
+MongoDB como operaciones `$inc` agrupadas en `bulk_write`, en lugar de hacer
+una escritura por evento. Cada volcado actualiza también los buckets por
+minuto de `campaign_metrics` (ver metrics_service). La pérdida máxima ante una caída del worker está
+acotada por el intervalo de volcado y por el máximo de eventos pendientes;
+al superarse ese máximo se rechazan eventos (backpressure) en vez de crecer
+sin límite.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+import structlog
+
+from app.core.config import settings
+from app.core.exceptions import ServiceUnavailableError
+from app.models.campaign import MetricGranularity
+from app.models.event import CampaignEvent, EVENT_COUNTER_FIELDS, EVENT_METRIC_FIELDS
+from app.services.metrics_service import MetricsService, to_utc_naive, truncate_bucket
+
+logger = structlog.get_logger()
+
+
+class EventAggregator:
+    """Acumulador de contadores de eventos con volcado periódico a MongoDB"""
+    
+    def __init__(
+        self,
+        db,
+        flush_interval: float = 1.0,
+        flush_threshold: int = 50000,
+        max_pending_events: int = 200000,
+        bulk_batch_size: int = 1000
+    ):
+        self.db = db
+        self.collection = db.campaigns
+        self.metrics_collection = db.campaign_metrics
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.max_pending_events = max_pending_events
+        self.bulk_batch_size = bulk_batch_size
+        
+        # campaign_id -> {campo_contador: incremento}
+        self._pending: Dict[str, Dict[str, int]] = {}
+        # (campaign_id, inicio del minuto) -> {métrica: incremento}
+        self._pending_buckets: Dict[Tuple[str, datetime], Dict[str, int]] = {}
+        self._pending_events = 0
+        
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        
+        self.stats = {
+            "accepted": 0,
+            "rejected": 0,
+            "flushed": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "dropped": 0
+        }
+    
+    @property
+    def pending_events(self) -> int:
+        """Eventos aceptados pendientes de volcar"""
+        return self._pending_events
+    
+    def add_events(self, events: List[CampaignEvent]) -> int:
+        """
+        Acumular eventos en memoria.
+        
+        Es síncrono y O(len(events)): no hay E/S en el camino de ingesta.
+        Lanza ServiceUnavailableError si se superaría el máximo de pendientes.
+        """
+        total = sum(event.count for event in events)
+        
+        if self._pending_events + total > self.max_pending_events:
+            self.stats["rejected"] += total
+            self._schedule_flush()
+            raise ServiceUnavailableError(
+                "Event ingestion backlog is full",
+                retry_after=max(1, int(self.flush_interval))
+            )
+        
+        now = datetime.utcnow()
+        current_minute = truncate_bucket(now, MetricGranularity.MINUTE)
+        
+        pending = self._pending
+        pending_buckets = self._pending_buckets
+        for event in events:
+            counters = pending.get(event.campaign_id)
+            if counters is None:
+                counters = pending[event.campaign_id] = {}
+            field = EVENT_COUNTER_FIELDS[event.type]
+            counters[field] = counters.get(field, 0) + event.count
+            
+            bucket_key = (event.campaign_id, self._event_minute(event, now, current_minute))
+            bucket = pending_buckets.get(bucket_key)
+            if bucket is None:
+                bucket = pending_buckets[bucket_key] = {}
+            metric = EVENT_METRIC_FIELDS[event.type]
+            bucket[metric] = bucket.get(metric, 0) + event.count
+        
+        self._pending_events += total
+        self.stats["accepted"] += total
+        
+        if self._pending_events >= self.flush_threshold:
+            self._schedule_flush()
+        
+        return total
+    
+    @staticmethod
+    def _event_minute(event: CampaignEvent, now: datetime, current_minute: datetime) -> datetime:
+        """Minuto (UTC) al que se imputa un evento; sin marca o futuro, el actual"""
+        timestamp = event.timestamp
+        if timestamp is None:
+            return current_minute
+        timestamp = to_utc_naive(timestamp)
+        if timestamp >= now:
+            return current_minute
+        return truncate_bucket(timestamp, MetricGranularity.MINUTE)
+    
+    def _schedule_flush(self):
+        """Lanzar un volcado anticipado si no hay uno en curso"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self.flush())
+    
+    async def flush(self) -> int:
+        """Volcar los contadores pendientes a MongoDB; devuelve eventos volcados"""
+        async with self._flush_lock:
+            if not self._pending and not self._pending_buckets:
+                return 0
+            
+            # Intercambiar los buffers: los eventos nuevos van a unos vacíos
+            pending, self._pending = self._pending, {}
+            pending_buckets, self._pending_buckets = self._pending_buckets, {}
+            self._pending_events = 0
+            
+            flushed = await self._write_chunks(
+                self.collection,
+                [
+                    (campaign_id, counters, UpdateOne({"_id": ObjectId(campaign_id)}, {"$inc": counters}))
+                    for campaign_id, counters in pending.items()
+                ],
+                self._requeue
+            )
+            
+            # Los buckets no cuentan para el total volcado: son los mismos eventos
+            await self._write_chunks(
+                self.metrics_collection,
+                [
+                    (key, counters, MetricsService.minute_bucket_update(key[0], key[1], counters))
+                    for key, counters in pending_buckets.items()
+                ],
+                self._requeue_buckets
+            )
+            
+            self.stats["flushes"] += 1
+            self.stats["flushed"] += flushed
+            
+            return flushed
+    
+    async def _write_chunks(self, collection, operations: list, requeue) -> int:
+        """Ejecutar (clave, contadores, operación) en lotes; reencolar los que fallen"""
+        written = 0
+        for start in range(0, len(operations), self.bulk_batch_size):
+            chunk = operations[start:start + self.bulk_batch_size]
+            chunk_events = sum(sum(counters.values()) for _, counters, _ in chunk)
+            try:
+                await collection.bulk_write([op for _, _, op in chunk], ordered=False)
+                written += chunk_events
+            except Exception as e:
+                # Entrega al menos una vez: se reintenta en el siguiente volcado
+                self.stats["flush_errors"] += 1
+                logger.error(
+                    "Error flushing campaign events",
+                    collection=collection.name,
+                    error=str(e),
+                    events=chunk_events
+                )
+                requeue({key: counters for key, counters, _ in chunk})
+        return written
+    
+    def _requeue(self, counters_by_campaign: Dict[str, Dict[str, int]]):
+        """Devolver contadores no volcados al buffer, respetando el máximo de pendientes"""
+        for campaign_id, counters in counters_by_campaign.items():
+            events = sum(counters.values())
+            if self._pending_events + events > self.max_pending_events:
+                self.stats["dropped"] += events
+                logger.error("Dropping campaign events, backlog full", campaign_id=campaign_id, events=events)
+                continue
+            
+            self._merge_counters(self._pending, campaign_id, counters)
+            self._pending_events += events
+    
+    def _requeue_buckets(self, counters_by_bucket: Dict[Tuple[str, datetime], Dict[str, int]]):
+        """
+        Devolver buckets no volcados al buffer.
+        
+        No suman a los pendientes (sus eventos ya se contaron en los contadores
+        de campaña), pero se descartan si el buffer de buckets está lleno.
+        """
+        for key, counters in counters_by_bucket.items():
+            if len(self._pending_buckets) >= self.max_pending_events:
+                self.stats["dropped"] += sum(counters.values())
+                continue
+            self._merge_counters(self._pending_buckets, key, counters)
+    
+    @staticmethod
+    def _merge_counters(target: dict, key, counters: Dict[str, int]):
+        merged = target.setdefault(key, {})
+        for field, value in counters.items():
+            merged[field] = merged.get(field, 0) + value
+    
+    async def start(self):
+        """Iniciar el volcado periódico"""
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._flush_loop())
+            logger.info("Event ingestion started", flush_interval=self.flush_interval)
+    
+    async def stop(self):
+        """Detener el volcado periódico y volcar lo pendiente"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        
+        await self.flush()
+        logger.info("Event ingestion stopped", stats=self.stats)
+    
+    async def _flush_loop(self):
+        """Volcar periódicamente hasta que se cancele la tarea"""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Unexpected error in event flush loop", error=str(e))
+
+
+# Instancia global del acumulador
+event_aggregator: EventAggregator = None
+
+
+async def start_event_ingestion(db):
+    """Crear e iniciar el acumulador de eventos"""
+    global event_aggregator
+    
+    event_aggregator = EventAggregator(
+        db,
+        flush_interval=settings.EVENTS_FLUSH_INTERVAL_SECONDS,
+        flush_threshold=settings.EVENTS_FLUSH_THRESHOLD,
+        max_pending_events=settings.EVENTS_MAX_PENDING,
+        bulk_batch_size=settings.EVENTS_BULK_BATCH_SIZE
+    )
+    await event_aggregator.start()
+
+
+async def stop_event_ingestion():
+    """Detener el acumulador volcando los eventos pendientes"""
+    global event_aggregator
+    
+    if event_aggregator:
+        await event_aggregator.stop()
+        event_aggregator = None
+
+
+async def get_event_aggregator() -> EventAggregator:
+    """Obtener el acumulador de eventos"""
+    if event_aggregator is None:
+        raise Exception("Event ingestion not initialized")
+    return event_aggregator
@@ -2,17 +2,78 @@
 Servicio para operaciones de geolocalización
 """
 
+from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
+from pymongo import UpdateOne
+import asyncio
 import httpx
+import numpy as np
 import structlog
 
-from app.models.campaign import GeoLocation, LocationType
+from app.models.campaign import DistanceMatrixResponse, DistanceMode, GeoLocation, LocationType, TargetedCampaigns
 from app.core.config import settings
 from app.core.database import get_database
+from app.core.http_client import get_http_client
+from app.core.redis_client import get_cache
+from app.core.geohash import encode_geohash
+from app.core.geodesy import haversine_matrix, vincenty_matrix
+from app.core.gazetteer import get_gazetteer
+from app.core.text import normalize_search_text
 from app.core.exceptions import GeolocationError, ValidationError, ExternalServiceError
+from app.services.targeting_service import get_targeting_engine
 
 logger = structlog.get_logger()
 
+# Prefijos de las claves de Redis de resultados de geocodificación
+GEOCODING_SEARCH_PREFIX = "geo:search:"
+GEOCODING_REVERSE_PREFIX = "geo:reverse:"
+
+# Campos de `locations` que forman un resultado
+PLACE_PROJECTION = {
+    "_id": 0,
+    "mapbox_id": 1,
+    "name": 1,
+    "full_name": 1,
+    "coordinates": 1,
+    "place_type": 1,
+    "context": 1,
+    "relevance": 1
+}
+
+# Prefijo del id de Mapbox en el contexto -> campo de `locations`
+_CONTEXT_FIELDS = {"country": "country", "region": "region", "place": "city"}
+
+
+def geocoding_search_key(query: str, country: Optional[str] = None) -> str:
+    """Clave de caché de una búsqueda: consulta normalizada y país"""
+    return f"{(country or '').lower()}:{normalize_search_text(query)}"
+
+
+def place_from_feature(feature: Dict[str, Any]) -> Dict[str, Any]:
+    """Resultado de búsqueda a partir de una feature de Mapbox"""
+    return {
+        "id": feature.get("id"),
+        "name": feature.get("text"),
+        "full_name": feature.get("place_name"),
+        "coordinates": feature.get("center"),  # [longitude, latitude]
+        "place_type": feature.get("place_type", []),
+        "context": feature.get("context", []),
+        "relevance": feature.get("relevance", 0)
+    }
+
+
+def place_from_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Resultado de búsqueda a partir de un documento de `locations`"""
+    return {
+        "id": document.get("mapbox_id"),
+        "name": document.get("name"),
+        "full_name": document.get("full_name"),
+        "coordinates": document.get("coordinates"),
+        "place_type": document.get("place_type", []),
+        "context": document.get("context", []),
+        "relevance": document.get("relevance", 0)
+    }
+
 
 class GeolocationService:
     """Servicio para operaciones de geolocalización"""
@@ -28,57 +89,48 @@ class GeolocationService:
         country: Optional[str] = None,
         limit: int = 10
     ) -> List[Dict[str, Any]]:
-        """Buscar ubicaciones por nombre o dirección"""
+        """
+        Buscar ubicaciones por nombre o dirección.
+        
+        Se responde desde el gazetteer local si hay lugares cuyo nombre empiece
+        por la consulta. Si no, la consulta se normaliza (minúsculas, sin
+        acentos ni espacios extra) y se busca en Redis, después en la
+        colección `locations` y solo como último recurso en Mapbox. Las búsquedas sin resultados se
+        cachean con un TTL más corto.
+        """
         try:
-            if not self.mapbox_token:
-                raise GeolocationError("Mapbox token not configured")
+            # Primero el gazetteer local: nombres de lugares sin salir del proceso
+            gazetteer = get_gazetteer()
+            if gazetteer is not None:
+                locations = gazetteer.search(query, country=country, limit=limit)
+                if locations:
+                    return locations
             
-            # Construir parámetros de búsqueda
-            params = {
-                "access_token": self.mapbox_token,
-                "q": query,
-                "limit": limit,
-                "types": "place,locality,neighborhood,address,poi"
-            }
+            search_key = geocoding_search_key(query, country)
+            cache_key = f"{GEOCODING_SEARCH_PREFIX}{search_key}"
+            cache = await self._get_geocoding_cache()
+            
+            if cache is not None:
+                cached = await cache.get(cache_key)
+                if cached is not None:
+                    return cached["results"][:limit]
+            
+            locations = await self._find_persisted_search(search_key)
+            if locations is None:
+                locations = await self._mapbox_search(query, country)
+                await self._persist_places(locations, "search_keys", search_key)
+            
+            if cache is not None:
+                await cache.set(cache_key, {"results": locations}, expire=self._cache_ttl(bool(locations)))
+            
+            logger.info(
+                "Location search completed",
+                query=query,
+                results_count=len(locations)
+            )
+            
+            return locations[:limit]
             
-            if country:
-                params["country"] = country
-            
-            # Realizar búsqueda
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/geocoding/v5/mapbox.places/{query}.json",
-                    params=params,
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    raise ExternalServiceError("Mapbox", f"Search failed: {response.text}")
-                
-                data = response.json()
-                
-                # Procesar resultados
-                locations = []
-                for feature in data.get("features", []):
-                    location = {
-                        "id": feature.get("id"),
-                        "name": feature.get("text"),
-                        "full_name": feature.get("place_name"),
-                        "coordinates": feature.get("center"),  # [longitude, latitude]
-                        "place_type": feature.get("place_type", []),
-                        "context": feature.get("context", []),
-                        "relevance": feature.get("relevance", 0)
-                    }
-                    locations.append(location)
-                
-                logger.info(
-                    "Location search completed",
-                    query=query,
-                    results_count=len(locations)
-                )
-                
-                return locations
-                
         except httpx.TimeoutException:
             logger.error("Mapbox API timeout", query=query)
             raise ExternalServiceError("Mapbox", "Request timeout")
@@ -94,56 +146,60 @@ class GeolocationService:
         latitude: float,
         longitude: float
     ) -> Dict[str, Any]:
-        """Obtener información de ubicación a partir de coordenadas"""
+        """
+        Obtener información de ubicación a partir de coordenadas.
+        
+        Las coordenadas se cuantizan a un geohash de precisión
+        GEOCODING_GEOHASH_PRECISION: todos los puntos de la misma celda
+        comparten la entrada de Redis y de `locations`.
+        """
         try:
-            if not self.mapbox_token:
-                raise GeolocationError("Mapbox token not configured")
-            
-            # Realizar geocodificación inversa
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.base_url}/geocoding/v5/mapbox.places/{longitude},{latitude}.json",
-                    params={
-                        "access_token": self.mapbox_token,
-                        "types": "place,locality,neighborhood,address,poi"
-                    },
-                    timeout=10.0
-                )
-                
-                if response.status_code != 200:
-                    raise ExternalServiceError("Mapbox", f"Reverse geocoding failed: {response.text}")
-                
-                data = response.json()
-                
-                # Procesar resultado
-                if not data.get("features"):
-                    return {
-                        "coordinates": [longitude, latitude],
-                        "name": "Unknown location",
-                        "full_name": "Unknown location",
-                        "place_type": [],
-                        "context": []
-                    }
+            geohash = encode_geohash(latitude, longitude, settings.GEOCODING_GEOHASH_PRECISION)
+            cache_key = f"{GEOCODING_REVERSE_PREFIX}{geohash}"
+            cache = await self._get_geocoding_cache()
+            
+            place = None
+            if cache is not None:
+                place = await cache.get(cache_key)
+            
+            if place is None:
+                place = await self._find_persisted_reverse(geohash)
+                if place is None:
+                    place = await self._mapbox_reverse(latitude, longitude)
+                    if place.get("name"):
+                        await self._persist_places([place], "geohashes", geohash)
                 
-                feature = data["features"][0]
-                location_info = {
+                if cache is not None:
+                    await cache.set(cache_key, place, expire=self._cache_ttl(bool(place.get("name"))))
+            
+            # Resultado sin ubicación conocida (también cacheado)
+            if not place.get("name"):
+                return {
                     "coordinates": [longitude, latitude],
-                    "name": feature.get("text"),
-                    "full_name": feature.get("place_name"),
-                    "place_type": feature.get("place_type", []),
-                    "context": feature.get("context", []),
-                    "relevance": feature.get("relevance", 0)
+                    "name": "Unknown location",
+                    "full_name": "Unknown location",
+                    "place_type": [],
+                    "context": []
                 }
-                
-                logger.info(
-                    "Reverse geocoding completed",
-                    latitude=latitude,
-                    longitude=longitude,
-                    location=location_info["full_name"]
-                )
-                
-                return location_info
-                
+            
+            location_info = {
+                "coordinates": [longitude, latitude],
+                "name": place.get("name"),
+                "full_name": place.get("full_name"),
+                "place_type": place.get("place_type", []),
+                "context": place.get("context", []),
+                "relevance": place.get("relevance", 0)
+            }
+            
+            logger.info(
+                "Reverse geocoding completed",
+                latitude=latitude,
+                longitude=longitude,
+                location=location_info["full_name"]
+            )
+            
+            return location_info
+            
         except httpx.TimeoutException:
             logger.error("Mapbox API timeout", latitude=latitude, longitude=longitude)
             raise ExternalServiceError("Mapbox", "Request timeout")
@@ -154,6 +210,138 @@ class GeolocationService:
             logger.error("Error reverse geocoding", latitude=latitude, longitude=longitude, error=str(e))
             raise GeolocationError("Error reverse geocoding")
     
+    async def _mapbox_search(self, query: str, country: Optional[str]) -> List[Dict[str, Any]]:
+        """Búsqueda directa en Mapbox (siempre con el límite máximo, para cachear una sola vez)"""
+        if not self.mapbox_token:
+            raise GeolocationError("Mapbox token not configured")
+        
+        # Construir parámetros de búsqueda
+        params = {
+            "access_token": self.mapbox_token,
+            "limit": settings.GEOCODING_SEARCH_FETCH_LIMIT,
+            "types": "place,locality,neighborhood,address,poi"
+        }
+        
+        if country:
+            params["country"] = country
+        
+        # Realizar búsqueda con el cliente compartido (conexión reutilizada)
+        client = await get_http_client()
+        response = await client.get(
+            f"{self.base_url}/geocoding/v5/mapbox.places/{query.strip()}.json",
+            params=params
+        )
+        
+        if response.status_code != 200:
+            raise ExternalServiceError("Mapbox", f"Search failed: {response.text}")
+        
+        return [place_from_feature(feature) for feature in response.json().get("features", [])]
+    
+    async def _mapbox_reverse(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        """Geocodificación inversa directa en Mapbox; {} si no hay resultado"""
+        if not self.mapbox_token:
+            raise GeolocationError("Mapbox token not configured")
+        
+        client = await get_http_client()
+        response = await client.get(
+            f"{self.base_url}/geocoding/v5/mapbox.places/{longitude},{latitude}.json",
+            params={
+                "access_token": self.mapbox_token,
+                "types": "place,locality,neighborhood,address,poi"
+            }
+        )
+        
+        if response.status_code != 200:
+            raise ExternalServiceError("Mapbox", f"Reverse geocoding failed: {response.text}")
+        
+        features = response.json().get("features")
+        return place_from_feature(features[0]) if features else {}
+    
+    async def _get_geocoding_cache(self):
+        """Caché de Redis, o None si está deshabilitado o Redis no está disponible"""
+        if not settings.GEOCODING_CACHE_ENABLED:
+            return None
+        try:
+            return await get_cache()
+        except Exception:
+            return None
+    
+    def _cache_ttl(self, found: bool) -> int:
+        return settings.GEOCODING_CACHE_TTL_SECONDS if found else settings.GEOCODING_NEGATIVE_TTL_SECONDS
+    
+    async def _find_persisted_search(self, search_key: str) -> Optional[List[Dict[str, Any]]]:
+        """Resultados guardados de una búsqueda normalizada; None si no hay"""
+        if not settings.GEOCODING_CACHE_ENABLED:
+            return None
+        try:
+            cursor = self.db.locations.find(
+                {"search_keys": search_key, "expires_at": {"$gt": datetime.utcnow()}},
+                PLACE_PROJECTION
+            ).sort("relevance", -1).limit(settings.GEOCODING_SEARCH_FETCH_LIMIT)
+            places = await cursor.to_list(length=settings.GEOCODING_SEARCH_FETCH_LIMIT)
+        except Exception as e:
+            logger.error("Error reading persisted geocoding results", error=str(e))
+            return None
+        
+        return [place_from_document(doc) for doc in places] or None
+    
+    async def _find_persisted_reverse(self, geohash: str) -> Optional[Dict[str, Any]]:
+        """Ubicación guardada para una celda geohash; None si no hay"""
+        if not settings.GEOCODING_CACHE_ENABLED:
+            return None
+        try:
+            doc = await self.db.locations.find_one(
+                {"geohashes": geohash, "expires_at": {"$gt": datetime.utcnow()}},
+                PLACE_PROJECTION
+            )
+        except Exception as e:
+            logger.error("Error reading persisted geocoding results", error=str(e))
+            return None
+        
+        return place_from_document(doc) if doc else None
+    
+    async def _persist_places(self, places: List[Dict[str, Any]], lookup_field: str, lookup_value: str):
+        """
+        Guardar ubicaciones de Mapbox en `locations`, una por id de Mapbox,
+        añadiendo la clave de búsqueda o el geohash por el que se encontraron.
+        """
+        if not settings.GEOCODING_CACHE_ENABLED or not places:
+            return
+        
+        now = datetime.utcnow()
+        expires_at = now + timedelta(days=settings.GEOCODING_PERSIST_DAYS)
+        operations = []
+        for place in places:
+            if not place.get("id") or not place.get("coordinates"):
+                continue
+            
+            document = {key: value for key, value in place.items() if key != "id"}
+            
+            # País, región y ciudad para los índices de `locations`
+            for item in place.get("context") or []:
+                field = _CONTEXT_FIELDS.get(str(item.get("id", "")).split(".", 1)[0])
+                if field:
+                    document[field] = item.get("text")
+            
+            operations.append(UpdateOne(
+                {"mapbox_id": place["id"]},
+                {
+                    "$set": {**document, "expires_at": expires_at, "updated_at": now},
+                    "$addToSet": {lookup_field: lookup_value},
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            ))
+        
+        if not operations:
+            return
+        
+        try:
+            await self.db.locations.bulk_write(operations, ordered=False)
+        except Exception as e:
+            # El resultado ya está en Redis; la persistencia no debe romper la petición
+            logger.error("Error persisting geocoding results", error=str(e))
+    
     async def validate_location(self, location: GeoLocation) -> Dict[str, Any]:
         """Validar una ubicación geográfica"""
         try:
@@ -225,7 +413,11 @@ class GeolocationService:
     async def get_countries(self) -> List[Dict[str, Any]]:
         """Obtener lista de países disponibles"""
         try:
-            # Lista básica de países (en producción se obtendría de una API)
+            gazetteer = get_gazetteer()
+            if gazetteer is not None and gazetteer.country_names:
+                return gazetteer.countries()
+            
+            # Lista básica de países si no hay gazetteer cargado
             countries = [
                 {"code": "ES", "name": "España"},
                 {"code": "US", "name": "Estados Unidos"},
@@ -257,7 +449,11 @@ class GeolocationService:
     async def get_regions(self, country_code: Optional[str] = None) -> List[Dict[str, Any]]:
         """Obtener lista de regiones/estados de un país"""
         try:
-            # Lista básica de regiones (en producción se obtendría de una API)
+            gazetteer = get_gazetteer()
+            if gazetteer is not None and gazetteer.admin1_names:
+                return gazetteer.regions(country_code)
+            
+            # Lista básica de regiones si no hay gazetteer cargado
             regions_data = {
                 "ES": [
                     {"code": "AN", "name": "Andalucía"},
@@ -318,7 +514,11 @@ class GeolocationService:
     ) -> List[Dict[str, Any]]:
         """Obtener lista de ciudades"""
         try:
-            # Lista básica de ciudades (en producción se obtendría de una API)
+            gazetteer = get_gazetteer()
+            if gazetteer is not None and len(gazetteer):
+                return gazetteer.cities(country_code, region_code, limit)
+            
+            # Lista básica de ciudades si no hay gazetteer cargado
             cities_data = {
                 "ES": [
                     {"name": "Madrid", "region": "MD", "coordinates": [-3.7038, 40.4168]},
@@ -425,3 +625,135 @@ class GeolocationService:
         except Exception as e:
             logger.error("Error calculating distance", error=str(e))
             raise GeolocationError("Error calculating distance")
+    
+    async def calculate_distance_matrix(
+        self,
+        origins: List[List[float]],
+        destinations: Optional[List[List[float]]] = None,
+        mode: DistanceMode = DistanceMode.FAST
+    ) -> DistanceMatrixResponse:
+        """
+        Calcular las distancias de todos los orígenes a todos los destinos.
+        
+        El cálculo es vectorizado (NumPy) y se ejecuta en un hilo para no
+        bloquear el event loop con matrices grandes.
+        """
+        origin_points = self._validate_points(origins, "origins")
+        destination_points = origin_points if destinations is None else self._validate_points(destinations, "destinations")
+        
+        cells = origin_points.shape[0] * destination_points.shape[0]
+        if cells > settings.DISTANCE_MATRIX_MAX_CELLS:
+            raise ValidationError(
+                f"Distance matrix too large ({cells} cells, max {settings.DISTANCE_MATRIX_MAX_CELLS})"
+            )
+        
+        def compute() -> DistanceMatrixResponse:
+            matrix = vincenty_matrix if mode == DistanceMode.EXACT else haversine_matrix
+            distances = matrix(origin_points, destination_points)
+            return DistanceMatrixResponse(
+                mode=mode,
+                rows=distances.shape[0],
+                columns=distances.shape[1],
+                distances_km=np.round(distances, 3).tolist()
+            )
+        
+        try:
+            result = await asyncio.to_thread(compute)
+            
+            logger.info(
+                "Distance matrix calculated",
+                rows=result.rows,
+                columns=result.columns,
+                mode=mode
+            )
+            
+            return result
+            
+        except Exception as e:
+            logger.error("Error calculating distance matrix", error=str(e))
+            raise GeolocationError("Error calculating distance matrix")
+    
+    async def find_targeted_campaigns(
+        self,
+        longitude: float,
+        latitude: float,
+        country: Optional[str] = None,
+        region: Optional[str] = None
+    ) -> TargetedCampaigns:
+        """
+        Campañas activas y en curso cuyos objetivos cubren un punto.
+        
+        Se resuelve con el índice en memoria del motor de segmentación; si no
+        está iniciado, con $geoIntersects sobre el índice 2dsphere de
+        `target_geometry` (país y región se comparan entonces literalmente).
+        """
+        if not (-180 <= longitude <= 180) or not (-90 <= latitude <= 90):
+            raise ValidationError("Invalid coordinates")
+        
+        engine = get_targeting_engine()
+        if engine is not None:
+            campaign_ids = engine.query(longitude, latitude, country, region)
+            source = "index"
+        else:
+            campaign_ids = await self._find_targeted_in_database(longitude, latitude, country, region)
+            source = "database"
+        
+        return TargetedCampaigns(
+            longitude=longitude,
+            latitude=latitude,
+            campaign_ids=campaign_ids,
+            count=len(campaign_ids),
+            source=source
+        )
+    
+    async def _find_targeted_in_database(
+        self,
+        longitude: float,
+        latitude: float,
+        country: Optional[str],
+        region: Optional[str]
+    ) -> List[str]:
+        try:
+            clauses = [{
+                "target_geometry": {
+                    "$geoIntersects": {
+                        "$geometry": {"type": "Point", "coordinates": [longitude, latitude]}
+                    }
+                }
+            }]
+            if country:
+                clauses.append({
+                    "target_locations": {"$elemMatch": {"type": LocationType.COUNTRY, "country": country}}
+                })
+            if region:
+                clauses.append({
+                    "target_locations": {"$elemMatch": {"type": LocationType.REGION, "region": region}}
+                })
+            
+            now = datetime.utcnow()
+            cursor = self.db.campaigns.find(
+                {
+                    "status": "active",
+                    "start_date": {"$lte": now},
+                    "end_date": {"$gte": now},
+                    "$or": clauses
+                },
+                {"_id": 1}
+            )
+            return sorted([str(doc["_id"]) async for doc in cursor])
+            
+        except Exception as e:
+            logger.error("Error finding targeted campaigns", error=str(e))
+            raise GeolocationError("Error finding targeted campaigns")
+    
+    def _validate_points(self, points: List[List[float]], field: str) -> np.ndarray:
+        """Convertir una lista de [longitud, latitud] en array validando rangos"""
+        if any(len(point) != 2 for point in points):
+            raise ValidationError(f"Each point in {field} must be [longitude, latitude]")
+        
+        array = np.asarray(points, dtype=np.float64)
+        if not np.isfinite(array).all():
+            raise ValidationError(f"Invalid coordinates in {field}")
+        if (np.abs(array[:, 0]) > 180).any() or (np.abs(array[:, 1]) > 90).any():
+            raise ValidationError(f"Coordinates out of range in {field}")
+        return array
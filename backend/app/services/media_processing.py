@@ -0,0 +1,272 @@
+"""
+Procesamiento de archivos multimedia (trabajo de CPU)
+
+Funciones puras que el worker de multimedia ejecuta en su pool de procesos,
+nunca en los workers de la API: reciben la ruta de una copia local del
+archivo y devuelven un diccionario serializable con lo que hay que guardar en
+media_files. Los errores del contenido (archivo corrupto, tipo que no coincide
+con el declarado...) se lanzan como MediaProcessingError, que el worker no
+reintenta.
+"""
+
+import hashlib
+import os
+import struct
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.exceptions import MediaProcessingError
+
+try:
+    import magic
+except ImportError:  # dependencia opcional (python-magic + libmagic)
+    magic = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # dependencia opcional
+    Image = ImageOps = None
+
+CHUNK_SIZE = 1024 * 1024
+
+# Formato de salida -> (formato de Pillow, tipo MIME, extensión)
+RENDITION_FORMATS = {
+    "webp": ("WEBP", "image/webp", ".webp"),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+}
+
+# Firmas de contenedor cuando no hay libmagic: (desplazamiento, bytes, tipo MIME)
+_SIGNATURES = [
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+    (4, b"ftypqt", "video/quicktime"),
+    (4, b"ftyp", "video/mp4"),
+    (4, b"moov", "video/quicktime"),
+]
+
+
+def file_checksum(path: str) -> str:
+    """SHA-256 del archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def detect_mime_type(path: str) -> Optional[str]:
+    """Tipo MIME según el contenido (no según la extensión ni lo declarado)"""
+    with open(path, "rb") as handle:
+        head = handle.read(4096)
+    
+    if magic is not None:
+        return magic.from_buffer(head, mime=True)
+    
+    for offset, signature, mime_type in _SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return mime_type
+    return None
+
+
+def _iter_boxes(handle, end: int):
+    """Cajas ISO BMFF (MP4/QuickTime) entre la posición actual y `end`"""
+    while handle.tell() + 8 <= end:
+        start = handle.tell()
+        size, box_type = struct.unpack(">I4s", handle.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", handle.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - start
+        if size < header:
+            return
+        yield box_type, start + header, start + size
+        handle.seek(start + size)
+
+
+def mp4_metadata(path: str) -> Dict[str, Any]:
+    """Duración y resolución de un MP4/QuickTime leyendo moov/mvhd y tkhd"""
+    metadata: Dict[str, Any] = {}
+    with open(path, "rb") as handle:
+        handle.seek(0, 2)
+        file_end = handle.tell()
+        handle.seek(0)
+        
+        for box_type, body, box_end in _iter_boxes(handle, file_end):
+            if box_type != b"moov":
+                continue
+            
+            handle.seek(body)
+            for child_type, child_body, child_end in _iter_boxes(handle, box_end):
+                if child_type == b"mvhd":
+                    handle.seek(child_body)
+                    version = handle.read(1)[0]
+                    if version == 1:
+                        handle.seek(child_body + 20)
+                        timescale, duration = struct.unpack(">IQ", handle.read(12))
+                    else:
+                        handle.seek(child_body + 12)
+                        timescale, duration = struct.unpack(">II", handle.read(8))
+                    if timescale:
+                        metadata["duration"] = round(duration / timescale, 3)
+                        
+                elif child_type == b"trak" and "width" not in metadata:
+                    handle.seek(child_body)
+                    for track_type, track_body, track_end in _iter_boxes(handle, child_end):
+                        if track_type != b"tkhd":
+                            continue
+                        # Ancho y alto en punto fijo 16.16 al final de tkhd
+                        handle.seek(track_end - 8)
+                        width, height = struct.unpack(">II", handle.read(8))
+                        if width and height:
+                            metadata["width"] = width >> 16
+                            metadata["height"] = height >> 16
+                handle.seek(child_end)
+            break
+    
+    if "duration" not in metadata:
+        raise MediaProcessingError("Invalid video: moov/mvhd box not found")
+    return metadata
+
+
+def image_metadata(path: str) -> Dict[str, Any]:
+    """Comprobar que la imagen se puede decodificar y leer sus dimensiones"""
+    if Image is None:
+        return {}
+    try:
+        with Image.open(path) as image:
+            image.verify()
+        # verify() deja la imagen inservible: reabrir para leer atributos
+        with Image.open(path) as image:
+            dpi = image.info.get("dpi")
+            return {
+                "width": image.width,
+                "height": image.height,
+                "format": image.format,
+                "mode": image.mode,
+                "dpi": [round(float(value), 2) for value in dpi] if dpi else None,
+                "frames": getattr(image, "n_frames", 1)
+            }
+    except Exception as e:
+        raise MediaProcessingError(f"Invalid image: {e}")
+
+
+def _for_format(image, image_format: str):
+    """Convertir el modo de color a uno que acepte el formato de salida"""
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if image_format == "WEBP" and has_alpha:
+        return image.convert("RGBA")
+    if has_alpha:
+        # JPEG no tiene transparencia: componer sobre blanco
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def image_renditions(
+    path: str,
+    output_dir: str,
+    widths: Sequence[int],
+    formats: Sequence[str],
+    thumbnail_size: int,
+    quality: int = 80
+) -> List[Dict[str, Any]]:
+    """
+    Generar la miniatura y las versiones adaptativas de una imagen.
+    
+    La miniatura cabe en thumbnail_size x thumbnail_size; cada versión tiene
+    uno de los anchos de `widths` (nunca mayor que el original) y se guarda
+    en cada formato de `formats`. Las versiones se calculan de mayor a menor,
+    cada una a partir de la anterior, así la imagen original solo se
+    decodifica y reduce una vez.
+    """
+    if Image is None:
+        return []
+    formats = [name for name in formats if name in RENDITION_FORMATS]
+    
+    with Image.open(path) as source:
+        # Solo el primer fotograma (GIF/WebP animados) y con la orientación EXIF aplicada
+        source.seek(0)
+        # JPEG: decodificar ya reducido (1/2, 1/4, 1/8) si sobra resolución.
+        # Con orientación EXIF 5-8 el ancho final es el alto almacenado
+        largest = max(list(widths) + [thumbnail_size])
+        if source.getexif().get(0x0112) in (5, 6, 7, 8):
+            source.draft("RGB", (largest * source.width // source.height, largest))
+        else:
+            source.draft("RGB", (largest, largest * source.height // source.width))
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode == "PA" else "RGB")
+    
+    targets = [(f"w{width}", width, None) for width in widths if width < image.width]
+    targets.append(("thumbnail", thumbnail_size, thumbnail_size))
+    targets.sort(key=lambda target: target[1], reverse=True)
+    
+    renditions = []
+    current = image
+    for name, max_width, max_height in targets:
+        current = current.copy()
+        current.thumbnail((max_width, max_height or current.height), Image.LANCZOS, reducing_gap=3.0)
+        for format_name in formats:
+            image_format, content_type, extension = RENDITION_FORMATS[format_name]
+            output_path = os.path.join(output_dir, f"{name}{extension}")
+            options = {"quality": quality}
+            if image_format == "JPEG":
+                options.update(optimize=True, progressive=True)
+            else:
+                options.update(method=4)
+            _for_format(current, image_format).save(output_path, image_format, **options)
+            
+            renditions.append({
+                "name": name,
+                "format": format_name,
+                "content_type": content_type,
+                "width": current.width,
+                "height": current.height,
+                "path": output_path
+            })
+    return renditions
+
+
+def process_media(
+    path: str,
+    file_type: str,
+    mime_type: str,
+    checksum: Optional[str] = None,
+    output_dir: Optional[str] = None,
+    rendition_options: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Validar un archivo subido y extraer sus metadatos.
+    
+    Devuelve los campos a actualizar en media_files. Si es una imagen y se
+    indica `output_dir`, genera además sus versiones (argumentos de
+    image_renditions en `rendition_options`) y las devuelve en
+    "rendition_files" para que el worker las suba.
+    """
+    if checksum and file_checksum(path) != checksum:
+        raise MediaProcessingError("Stored file does not match its checksum")
+    
+    detected = detect_mime_type(path)
+    if detected and file_type in ("image", "video") and not detected.startswith(f"{file_type}/"):
+        raise MediaProcessingError(f"Content is {detected}, not {file_type}")
+    
+    result: Dict[str, Any] = {"detected_mime_type": detected or mime_type}
+    if file_type == "image":
+        result["image_metadata"] = image_metadata(path)
+        if output_dir is not None:
+            try:
+                result["rendition_files"] = image_renditions(path, output_dir, **(rendition_options or {}))
+            except MediaProcessingError:
+                raise
+            except Exception as e:
+                raise MediaProcessingError(f"Could not generate renditions: {e}")
+    elif file_type == "video" and (detected or mime_type) in ("video/mp4", "video/quicktime"):
+        result["video_metadata"] = mp4_metadata(path)
+    return result
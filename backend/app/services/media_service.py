@@ -8,8 +8,7 @@ from datetime import datetime
 from typing import Optional, List
 from bson import ObjectId
 import structlog
-import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
 
 from app.models.media import (
     MediaFile, MediaFileCreate, MediaFileUpdate, MediaFileList,
@@ -18,40 +17,36 @@ from app.models.media import (
 from app.core.config import settings
 from app.core.database import get_database
 from app.core.exceptions import FileUploadError, NotFoundError, ValidationError, DatabaseError, ExternalServiceError
+from app.core.job_queue import RedisJobQueue
+from app.core.pagination import TotalMode, count_total, encode_cursor, keyset_filter
+from app.core.redis_client import get_redis
+from app.core.storage import StoredFile, get_storage
 
 logger = structlog.get_logger()
 
 
+def build_media_queue(redis_client) -> RedisJobQueue:
+    """Cola de procesamiento de multimedia (la consume app/workers/media_worker.py)"""
+    return RedisJobQueue(
+        redis_client,
+        settings.MEDIA_QUEUE_NAME,
+        dead_letter_max=settings.MEDIA_DEAD_LETTER_MAX
+    )
+
+
 class MediaService:
     """Servicio para operaciones de archivos multimedia"""
     
     def __init__(self, db):
         self.db = db
         self.collection = db.media_files
-        self.s3_client = self._get_s3_client()
-    
-    def _get_s3_client(self):
-        """Obtener cliente de S3"""
-        try:
-            if not all([settings.AWS_ACCESS_KEY_ID, settings.AWS_SECRET_ACCESS_KEY]):
-                logger.warning("AWS credentials not configured, using local storage")
-                return None
-            
-            return boto3.client(
-                's3',
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                region_name=settings.AWS_REGION
-            )
-        except Exception as e:
-            logger.error("Error creating S3 client", error=str(e))
-            return None
+        self.storage = get_storage()
     
     async def validate_file(self, file, file_type: MediaType) -> bool:
         """Validar archivo antes de subir"""
         try:
-            # Verificar tamaño
-            if file.size > settings.MAX_FILE_SIZE:
+            # Verificar tamaño (si el cliente lo indica; al guardar se vuelve a comprobar)
+            if file.size is not None and file.size > settings.MAX_FILE_SIZE:
                 raise FileUploadError(
                     f"File size exceeds maximum allowed size of {settings.MAX_FILE_SIZE // (1024*1024)}MB"
                 )
@@ -93,13 +88,11 @@ class MediaService:
             
             # Determinar ruta de almacenamiento
             folder = "images" if file_type == MediaType.IMAGE else "videos"
-            s3_key = f"campaigns/{campaign_id}/{folder}/{unique_filename}"
+            storage_key = f"campaigns/{campaign_id}/{folder}/{unique_filename}"
             
-            # Subir archivo a S3 o almacenamiento local
-            if self.s3_client and settings.AWS_S3_BUCKET:
-                file_url = await self._upload_to_s3(file, s3_key)
-            else:
-                file_url = await self._upload_locally(file, s3_key)
+            # Guardar en el almacenamiento configurado (S3, local o memoria)
+            stored = await self._store(file, storage_key)
+            file_url = stored.url
             
             # Crear registro en la base de datos
             now = datetime.utcnow()
@@ -108,24 +101,33 @@ class MediaService:
                 "original_filename": file.filename,
                 "file_type": file_type,
                 "mime_type": file.content_type,
-                "size": file.size,
+                "size": stored.size,
+                "checksum": stored.checksum,
+                "storage_key": stored.key,
                 "url": file_url,
                 "thumbnail_url": None,
                 "status": MediaStatus.UPLOADING,
                 "upload_date": now,
                 "processed_date": None,
+                "processing_progress": 0,
                 "user_id": user_id,
                 "campaign_id": campaign_id,
                 "error_message": None,
                 "image_metadata": None,
-                "video_metadata": None
+                "video_metadata": None,
+                "renditions": None
             }
             
-            result = await self.collection.insert_one(media_data)
+            try:
+                result = await self.collection.insert_one(media_data)
+            except BaseException:
+                # Sin documento nadie liberaría la referencia que añadió _store
+                await self._release_stored(stored)
+                raise
             file_id = str(result.inserted_id)
             
-            # Iniciar procesamiento asíncrono
-            await self._start_processing(file_id, file_type)
+            # Encolar el procesamiento (lo hace el worker de multimedia)
+            queued = await self._start_processing(file_id, file_type)
             
             logger.info(
                 "File uploaded successfully",
@@ -139,8 +141,9 @@ class MediaService:
                 file_id=file_id,
                 filename=unique_filename,
                 url=file_url,
-                status=MediaStatus.UPLOADING,
-                message="File uploaded successfully, processing started"
+                status=MediaStatus.UPLOADING if queued else MediaStatus.ERROR,
+                message="File uploaded successfully, processing queued" if queued
+                else "File uploaded, but processing could not be queued"
             )
             
         except (FileUploadError, ValidationError):
@@ -149,85 +152,73 @@ class MediaService:
             logger.error("Error uploading file", error=str(e))
             raise FileUploadError("Error uploading file")
     
-    async def _upload_to_s3(self, file, s3_key: str) -> str:
-        """Subir archivo a S3"""
+    async def _release_stored(self, stored: StoredFile):
+        """Deshacer un _store cuyo documento no llegó a crearse"""
+        try:
+            await self.storage.delete(stored.key)
+        except Exception as e:
+            logger.error("Error releasing stored file", storage_key=stored.key, error=str(e))
+    
+    async def _store(self, file, storage_key: str) -> StoredFile:
+        """
+        Guardar el contenido de una subida.
+        
+        Se copia por bloques fuera del event loop, calculando tamaño y SHA-256
+        y aplicando MAX_FILE_SIZE sobre los bytes recibidos.
+        """
         try:
-            file.file.seek(0)  # Resetear posición del archivo
+            await file.seek(0)  # Resetear posición del archivo
             
-            self.s3_client.upload_fileobj(
+            stored = await self.storage.save(
                 file.file,
-                settings.AWS_S3_BUCKET,
-                s3_key,
-                ExtraArgs={
-                    'ContentType': file.content_type,
-                    'ACL': 'public-read'
-                }
+                storage_key,
+                content_type=file.content_type,
+                max_size=settings.MAX_FILE_SIZE
             )
             
-            file_url = f"https://{settings.AWS_S3_BUCKET}.s3.{settings.AWS_REGION}.amazonaws.com/{s3_key}"
-            
-            logger.info("File uploaded to S3", s3_key=s3_key)
+            logger.info(
+                "File stored",
+                backend=self.storage.name,
+                storage_key=stored.key,
+                size=stored.size
+            )
             
-            return file_url
+            return stored
             
-        except ClientError as e:
-            logger.error("Error uploading to S3", error=str(e))
-            raise ExternalServiceError("S3", "Error uploading file to S3")
-        except Exception as e:
+        except FileUploadError:
+            raise
+        except (ClientError, BotoCoreError) as e:
             logger.error("Error uploading to S3", error=str(e))
             raise ExternalServiceError("S3", "Error uploading file to S3")
-    
-    async def _upload_locally(self, file, local_path: str) -> str:
-        """Subir archivo a almacenamiento local"""
-        try:
-            # Crear directorio si no existe
-            os.makedirs(os.path.dirname(f"uploads/{local_path}"), exist_ok=True)
-            
-            # Guardar archivo
-            with open(f"uploads/{local_path}", "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            
-            file_url = f"/uploads/{local_path}"
-            
-            logger.info("File uploaded locally", local_path=local_path)
-            
-            return file_url
-            
         except Exception as e:
-            logger.error("Error uploading locally", error=str(e))
-            raise FileUploadError("Error uploading file locally")
+            logger.error("Error storing file", backend=self.storage.name, error=str(e))
+            raise FileUploadError("Error storing file")
     
-    async def _start_processing(self, file_id: str, file_type: MediaType):
-        """Iniciar procesamiento del archivo"""
+    async def _start_processing(self, file_id: str, file_type: MediaType) -> bool:
+        """
+        Encolar el procesamiento del archivo.
+        
+        El trabajo de CPU (validación, metadatos) lo hace el worker de
+        multimedia en sus propios procesos; aquí solo se añade a la cola. Si
+        no se puede encolar el archivo queda en ERROR (se puede reprocesar).
+        """
         try:
-            # Actualizar estado a procesando
-            await self.collection.update_one(
-                {"_id": ObjectId(file_id)},
-                {"$set": {"status": MediaStatus.PROCESSING}}
-            )
-            
-            # Aquí se implementaría el procesamiento real
-            # Por ahora, marcamos como completado
-            await self.collection.update_one(
-                {"_id": ObjectId(file_id)},
-                {"$set": {
-                    "status": MediaStatus.READY,
-                    "processed_date": datetime.utcnow()
-                }}
-            )
-            
-            logger.info("File processing completed", file_id=file_id)
+            queue = build_media_queue(await get_redis())
+            job_id = await queue.enqueue({"file_id": file_id})
+            logger.info("File processing queued", file_id=file_id, file_type=file_type, job_id=job_id)
+            return True
             
         except Exception as e:
-            logger.error("Error processing file", file_id=file_id, error=str(e))
+            logger.error("Error queueing file processing", file_id=file_id, error=str(e))
             await self.collection.update_one(
                 {"_id": ObjectId(file_id)},
                 {"$set": {
                     "status": MediaStatus.ERROR,
-                    "error_message": str(e)
+                    "processing_progress": 0,
+                    "error_message": "Could not queue processing"
                 }}
             )
+            return False
     
     async def get_file(self, file_id: str, user_id: str) -> Optional[MediaFile]:
         """Obtener archivo por ID"""
@@ -256,9 +247,16 @@ class MediaService:
         campaign_id: Optional[str] = None,
         file_type: Optional[MediaType] = None,
         page: int = 1,
-        size: int = 10
+        size: int = 10,
+        cursor: Optional[str] = None,
+        total_mode: TotalMode = TotalMode.EXACT
     ) -> MediaFileList:
-        """Listar archivos con paginación y filtros"""
+        """
+        Listar archivos con paginación y filtros.
+        
+        Con `cursor` se usa paginación keyset sobre (upload_date, _id) y se
+        ignora `page`; sin él se mantiene la paginación por offset.
+        """
         try:
             # Construir filtros
             filters = {"user_id": user_id}
@@ -269,15 +267,26 @@ class MediaService:
             if file_type:
                 filters["file_type"] = file_type
             
-            # Calcular skip
-            skip = (page - 1) * size
+            # Obtener total de documentos (opcional)
+            total = await count_total(self.collection, filters, total_mode)
+            
+            # Obtener archivos (uno de más para saber si hay página siguiente)
+            if cursor:
+                cursor_filters = {**filters, **keyset_filter("upload_date", cursor)}
+                db_cursor = self.collection.find(cursor_filters)
+            else:
+                db_cursor = self.collection.find(filters).skip((page - 1) * size)
+            
+            db_cursor = db_cursor.sort([("upload_date", -1), ("_id", -1)]).limit(size + 1)
+            files_docs = await db_cursor.to_list(length=size + 1)
             
-            # Obtener total de documentos
-            total = await self.collection.count_documents(filters)
+            has_more = len(files_docs) > size
+            files_docs = files_docs[:size]
             
-            # Obtener archivos
-            cursor = self.collection.find(filters).skip(skip).limit(size).sort("upload_date", -1)
-            files_docs = await cursor.to_list(length=size)
+            next_cursor = None
+            if has_more:
+                last = files_docs[-1]
+                next_cursor = encode_cursor(last["upload_date"], last["_id"])
             
             # Convertir a objetos MediaFile
             files = []
@@ -286,16 +295,20 @@ class MediaService:
                 files.append(MediaFile(**doc))
             
             # Calcular páginas
-            pages = (total + size - 1) // size
+            pages = (total + size - 1) // size if total is not None else None
             
             return MediaFileList(
                 files=files,
                 total=total,
                 page=page,
                 size=size,
-                pages=pages
+                pages=pages,
+                next_cursor=next_cursor,
+                has_more=has_more
             )
             
+        except ValidationError:
+            raise
         except Exception as e:
             logger.error("Error listing files", error=str(e))
             raise DatabaseError("Error listing files")
@@ -312,10 +325,6 @@ class MediaService:
             if not file_doc:
                 raise NotFoundError("Media file", file_id)
             
-            # Eliminar archivo del almacenamiento
-            if file_doc.get("url"):
-                await self._delete_from_storage(file_doc["url"])
-            
             # Eliminar de la base de datos
             result = await self.collection.delete_one({
                 "_id": ObjectId(file_id),
@@ -325,6 +334,10 @@ class MediaService:
             if result.deleted_count == 0:
                 raise NotFoundError("Media file", file_id)
             
+            # Eliminar archivo del almacenamiento (después, para no dejar
+            # documentos apuntando a archivos borrados)
+            await self._delete_from_storage(file_doc)
+            
             logger.info("File deleted successfully", file_id=file_id, user_id=user_id)
             
             return True
@@ -335,28 +348,32 @@ class MediaService:
             logger.error("Error deleting file", file_id=file_id, error=str(e))
             raise DatabaseError("Error deleting file")
     
-    async def _delete_from_storage(self, file_url: str):
-        """Eliminar archivo del almacenamiento"""
+    async def _delete_from_storage(self, file_doc: dict):
+        """Eliminar archivo del almacenamiento (una referencia si está compartido)"""
+        storage_key = file_doc.get("storage_key")
         try:
-            if file_url.startswith("https://") and self.s3_client:
-                # Extraer clave S3 de la URL
-                s3_key = file_url.split(f"{settings.AWS_S3_BUCKET}.s3.{settings.AWS_REGION}.amazonaws.com/")[1]
-                
-                self.s3_client.delete_object(
-                    Bucket=settings.AWS_S3_BUCKET,
-                    Key=s3_key
-                )
+            # Documentos anteriores a storage_key: deducir la clave de la URL
+            if not storage_key and file_doc.get("url"):
+                storage_key = self.storage.key_from_url(file_doc["url"])
+            if not storage_key:
+                return
                 
-                logger.info("File deleted from S3", s3_key=s3_key)
-            else:
-                # Eliminar archivo local
-                local_path = file_url.replace("/uploads/", "uploads/")
-                if os.path.exists(local_path):
-                    os.remove(local_path)
-                    logger.info("File deleted locally", local_path=local_path)
+            removed = await self.storage.delete(storage_key)
+            
+            # Miniatura y versiones adaptativas generadas por el worker
+            for rendition in file_doc.get("renditions") or []:
+                await self.storage.delete(rendition["key"])
+            
+            logger.info(
+                "File deleted from storage",
+                backend=self.storage.name,
+                storage_key=storage_key,
+                removed=removed,
+                renditions=len(file_doc.get("renditions") or [])
+            )
                     
         except Exception as e:
-            logger.error("Error deleting file from storage", file_url=file_url, error=str(e))
+            logger.error("Error deleting file from storage", storage_key=storage_key, error=str(e))
     
     async def get_processing_status(self, file_id: str) -> MediaProcessingStatus:
         """Obtener estado de procesamiento del archivo"""
@@ -366,16 +383,10 @@ class MediaService:
             if not file_doc:
                 raise NotFoundError("Media file", file_id)
             
-            # Calcular progreso basado en el estado
-            progress = 0
-            if file_doc["status"] == MediaStatus.UPLOADING:
-                progress = 25
-            elif file_doc["status"] == MediaStatus.PROCESSING:
-                progress = 75
-            elif file_doc["status"] == MediaStatus.READY:
-                progress = 100
-            elif file_doc["status"] == MediaStatus.ERROR:
-                progress = 0
+            # Progreso real del worker; los documentos anteriores no lo tienen
+            progress = file_doc.get("processing_progress")
+            if progress is None:
+                progress = 100 if file_doc["status"] == MediaStatus.READY else 0
             
             return MediaProcessingStatus(
                 file_id=file_id,
@@ -403,18 +414,25 @@ class MediaService:
                 {"_id": ObjectId(file_id)},
                 {"$set": {
                     "status": MediaStatus.PROCESSING,
+                    "processing_progress": 0,
                     "error_message": None
                 }}
             )
             
-            # Iniciar procesamiento
-            await self._start_processing(file_id, file_doc["file_type"])
+            # Volver a encolar
+            if not await self._start_processing(file_id, file_doc["file_type"]):
+                return MediaProcessingStatus(
+                    file_id=file_id,
+                    status=MediaStatus.ERROR,
+                    progress=0,
+                    message="Could not queue processing"
+                )
             
             return MediaProcessingStatus(
                 file_id=file_id,
                 status=MediaStatus.PROCESSING,
-                progress=75,
-                message="Reprocessing started"
+                progress=0,
+                message="Reprocessing queued"
             )
             
         except NotFoundError:
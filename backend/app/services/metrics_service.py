@@ -0,0 +1,241 @@
+"""
+Servicio de métricas de campañas por intervalos de tiempo
+
+Las métricas se guardan en la colección `campaign_metrics` como buckets
+(campaign_id, granularity, bucket) con los contadores del intervalo:
+
+- minute: los escribe el volcado de eventos con upserts `$inc`
+- hour / day: los calcula el job de rollup a partir de la granularidad
+  inmediatamente inferior, reemplazando el bucket completo ($merge), por lo
+  que repetir un rollup es idempotente
+
+Los buckets finos caducan (índice TTL sobre `expires_at`) después de haber
+sido compactados; los diarios se conservan. Leer un rango cuesta
+O(buckets del rango) con el índice único, independientemente del volumen
+de eventos.
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+import structlog
+
+from app.core.config import settings
+from app.core.exceptions import ValidationError
+from app.models.campaign import MetricBucket, MetricGranularity
+
+logger = structlog.get_logger()
+
+METRIC_FIELDS = ("views", "clicks", "conversions")
+
+GRANULARITY_DELTAS = {
+    MetricGranularity.MINUTE: timedelta(minutes=1),
+    MetricGranularity.HOUR: timedelta(hours=1),
+    MetricGranularity.DAY: timedelta(days=1)
+}
+
+# Granularidad de origen de cada rollup
+ROLLUP_SOURCES = {
+    MetricGranularity.HOUR: MetricGranularity.MINUTE,
+    MetricGranularity.DAY: MetricGranularity.HOUR
+}
+
+ROLLUP_LOCK_KEY = "metrics:rollup:lock"
+
+
+def to_utc_naive(value: datetime) -> datetime:
+    """Convertir a UTC sin zona horaria, como se guardan las fechas en MongoDB"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def truncate_bucket(value: datetime, granularity: MetricGranularity) -> datetime:
+    """Inicio del bucket que contiene `value`"""
+    if granularity == MetricGranularity.MINUTE:
+        return value.replace(second=0, microsecond=0)
+    if granularity == MetricGranularity.HOUR:
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_retention(granularity: MetricGranularity) -> Optional[timedelta]:
+    """Tiempo que se conservan los buckets de una granularidad (None = siempre)"""
+    if granularity == MetricGranularity.MINUTE:
+        return timedelta(hours=settings.METRICS_MINUTE_RETENTION_HOURS)
+    if granularity == MetricGranularity.HOUR:
+        return timedelta(days=settings.METRICS_HOUR_RETENTION_DAYS)
+    return None
+
+
+class MetricsService:
+    """Servicio para buckets de métricas de campañas"""
+    
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.campaign_metrics
+    
+    @staticmethod
+    def minute_bucket_update(campaign_id: str, bucket: datetime, counters: Dict[str, int]) -> UpdateOne:
+        """Upsert `$inc` de un bucket por minuto, usado por el volcado de eventos"""
+        return UpdateOne(
+            {"campaign_id": ObjectId(campaign_id), "granularity": MetricGranularity.MINUTE.value, "bucket": bucket},
+            {
+                "$inc": counters,
+                "$setOnInsert": {"expires_at": bucket + bucket_retention(MetricGranularity.MINUTE)}
+            },
+            upsert=True
+        )
+    
+    async def get_series(
+        self,
+        campaign_id: str,
+        start: datetime,
+        end: datetime,
+        granularity: MetricGranularity
+    ) -> List[MetricBucket]:
+        """Buckets de [start, end) en orden cronológico; se omiten los vacíos"""
+        points = (end - start) / GRANULARITY_DELTAS[granularity]
+        if points > settings.METRICS_MAX_SERIES_POINTS:
+            raise ValidationError(
+                f"Range too large for granularity '{granularity.value}' "
+                f"(max {settings.METRICS_MAX_SERIES_POINTS} buckets)"
+            )
+        
+        cursor = self.collection.find(
+            {
+                "campaign_id": ObjectId(campaign_id),
+                "granularity": granularity.value,
+                "bucket": {"$gte": truncate_bucket(start, granularity), "$lt": end}
+            },
+            {"_id": 0, "bucket": 1, **{field: 1 for field in METRIC_FIELDS}}
+        ).sort("bucket", 1)
+        
+        return [MetricBucket(**doc) async for doc in cursor]
+    
+    async def rollup(self, target: MetricGranularity, since: datetime, until: datetime):
+        """
+        Recalcular los buckets `target` de [since, until) desde la granularidad inferior.
+        
+        `since` se alinea al inicio de un bucket destino para que cada bucket se
+        calcule con todos sus buckets de origen.
+        """
+        source = ROLLUP_SOURCES[target]
+        since = truncate_bucket(since, target)
+        
+        output = {
+            "_id": 0,
+            "campaign_id": "$_id.campaign_id",
+            "granularity": {"$literal": target.value},
+            "bucket": "$_id.bucket",
+            "updated_at": "$$NOW",
+            **{field: 1 for field in METRIC_FIELDS}
+        }
+        retention = bucket_retention(target)
+        if retention is not None:
+            output["expires_at"] = {
+                "$dateAdd": {"startDate": "$_id.bucket", "unit": "second", "amount": int(retention.total_seconds())}
+            }
+        
+        pipeline = [
+            {"$match": {"granularity": source.value, "bucket": {"$gte": since, "$lt": until}}},
+            {"$group": {
+                "_id": {
+                    "campaign_id": "$campaign_id",
+                    "bucket": {"$dateTrunc": {"date": "$bucket", "unit": target.value}}
+                },
+                **{field: {"$sum": f"${field}"} for field in METRIC_FIELDS}
+            }},
+            {"$project": output},
+            {"$merge": {
+                "into": self.collection.name,
+                "on": ["campaign_id", "granularity", "bucket"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }}
+        ]
+        
+        async for _ in self.collection.aggregate(pipeline):
+            pass
+
+
+class MetricsRollupJob:
+    """Job periódico que compacta minutos en horas y horas en días"""
+    
+    def __init__(self, db, redis_client, interval: float = 60.0, lookback: timedelta = timedelta(hours=1)):
+        self.service = MetricsService(db)
+        self.redis = redis_client
+        self.interval = interval
+        self.lookback = lookback
+        self._task: Optional[asyncio.Task] = None
+    
+    async def run_once(self, now: Optional[datetime] = None) -> bool:
+        """
+        Ejecutar un rollup si ningún otro worker lo ha hecho en este intervalo.
+        
+        El bucket en curso también se recalcula, así que las granularidades
+        gruesas van como mucho un intervalo por detrás de los minutos.
+        """
+        acquired = await self.redis.set(ROLLUP_LOCK_KEY, "1", nx=True, px=int(self.interval * 1000))
+        if not acquired:
+            return False
+        
+        now = now or datetime.utcnow()
+        since = now - self.lookback
+        for target in (MetricGranularity.HOUR, MetricGranularity.DAY):
+            await self.service.rollup(target, since, now)
+        
+        logger.debug("Campaign metrics rolled up", since=since.isoformat())
+        return True
+    
+    async def start(self):
+        """Iniciar el rollup periódico"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info("Metrics rollup started", interval=self.interval)
+    
+    async def stop(self):
+        """Detener el rollup periódico"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Error rolling up campaign metrics", error=str(e))
+            await asyncio.sleep(self.interval)
+
+
+# Instancia global del job de rollup
+metrics_rollup_job: MetricsRollupJob = None
+
+
+async def start_metrics_rollup(db, redis_client):
+    """Crear e iniciar el job de rollup de métricas"""
+    global metrics_rollup_job
+    
+    metrics_rollup_job = MetricsRollupJob(
+        db,
+        redis_client,
+        interval=settings.METRICS_ROLLUP_INTERVAL_SECONDS,
+        lookback=timedelta(minutes=settings.METRICS_ROLLUP_LOOKBACK_MINUTES)
+    )
+    await metrics_rollup_job.start()
+
+
+async def stop_metrics_rollup():
+    """Detener el job de rollup de métricas"""
+    global metrics_rollup_job
+    
+    if metrics_rollup_job:
+        await metrics_rollup_job.stop()
+        metrics_rollup_job = None
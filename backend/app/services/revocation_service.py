@@ -0,0 +1,210 @@
+"""
+Servicio de revocación de tokens JWT
+
+La fuente de verdad está en Redis:
+
+- `auth:revoked:{jti}`: marca de revocación con TTL hasta el `exp` del token
+- `auth:revoked`: sorted set jti -> exp, para reconstruir el filtro al arrancar
+
+Cada worker mantiene un filtro de Bloom con los jti revocados vigentes,
+alimentado por pub/sub y reconstruido periódicamente para descartar los ya
+caducados. verify_token solo consulta Redis cuando el filtro da positivo, así
+que la revocación no añade E/S al camino habitual.
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+import redis.asyncio as redis
+import structlog
+
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+REVOKED_KEY_PREFIX = "auth:revoked:"
+REVOKED_INDEX_KEY = "auth:revoked"
+
+
+class TokenRevocationStore:
+    """Lista de tokens revocados en Redis con filtro de Bloom local"""
+    
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        channel: str = "auth:revocations",
+        capacity: int = 100000,
+        error_rate: float = 0.001,
+        rebuild_interval: float = 600.0
+    ):
+        self.redis = redis_client
+        self.channel = channel
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        
+        self._bloom = BloomFilter(capacity, error_rate)
+        # jti recibidos mientras se reconstruye el filtro
+        self._received_during_rebuild: Optional[list] = None
+        self._pubsub = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+        
+        self.stats = {
+            "checks": 0,
+            "bloom_positives": 0,
+            "revoked_hits": 0
+        }
+    
+    async def revoke(self, jti: str, expires_at: float):
+        """Revocar un token hasta su expiración (timestamp UNIX)"""
+        ttl = int(expires_at - time.time()) + 1
+        if ttl <= 0:
+            return
+        
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(f"{REVOKED_KEY_PREFIX}{jti}", "1", ex=ttl)
+            pipe.zadd(REVOKED_INDEX_KEY, {jti: expires_at})
+            pipe.publish(self.channel, jti)
+            await pipe.execute()
+        
+        # Sin esperar al mensaje propio: el worker que revoca lo aplica ya
+        self._add(jti)
+        logger.info("Token revoked", jti=jti)
+    
+    async def is_revoked(self, jti: str) -> bool:
+        """
+        Comprobar si un token está revocado.
+        
+        Un negativo del filtro es definitivo; un positivo se confirma en Redis.
+        Si Redis falla en ese caso se trata el token como revocado.
+        """
+        self.stats["checks"] += 1
+        if jti not in self._bloom:
+            return False
+        
+        self.stats["bloom_positives"] += 1
+        try:
+            revoked = bool(await self.redis.exists(f"{REVOKED_KEY_PREFIX}{jti}"))
+        except Exception as e:
+            logger.error("Error checking token revocation", jti=jti, error=str(e))
+            return True
+        
+        if revoked:
+            self.stats["revoked_hits"] += 1
+        return revoked
+    
+    def _add(self, jti: str):
+        self._bloom.add(jti)
+        if self._received_during_rebuild is not None:
+            self._received_during_rebuild.append(jti)
+    
+    async def rebuild(self):
+        """Reconstruir el filtro con los jti revocados aún vigentes"""
+        self._received_during_rebuild = []
+        try:
+            now = time.time()
+            await self.redis.zremrangebyscore(REVOKED_INDEX_KEY, "-inf", now)
+            jtis = await self.redis.zrangebyscore(REVOKED_INDEX_KEY, now, "+inf")
+            
+            bloom = BloomFilter(max(self.capacity, len(jtis) * 2), self.error_rate)
+            bloom.update(jtis)
+            # Revocaciones llegadas por pub/sub mientras se leía el índice
+            bloom.update(self._received_during_rebuild)
+            self._bloom = bloom
+        finally:
+            self._received_during_rebuild = None
+        
+        logger.debug("Revocation filter rebuilt", revoked=len(jtis))
+    
+    async def start(self):
+        """Cargar el filtro y suscribirse a nuevas revocaciones"""
+        if self._listener_task is not None:
+            return
+        
+        # Suscribirse antes de cargar para no perder revocaciones intermedias
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        await self.rebuild()
+        
+        self._listener_task = asyncio.create_task(self._listen())
+        self._rebuild_task = asyncio.create_task(self._rebuild_loop())
+        logger.info("Token revocation listener started", channel=self.channel)
+    
+    async def stop(self):
+        """Detener la suscripción y la reconstrucción periódica"""
+        for task in (self._listener_task, self._rebuild_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._listener_task = None
+        self._rebuild_task = None
+        
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.close()
+            self._pubsub = None
+    
+    async def _listen(self):
+        """Añadir al filtro los jti publicados hasta que se cancele la tarea"""
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get("type") == "message":
+                        self._add(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Pudieron perderse mensajes: reconstruir antes de seguir
+                logger.error("Token revocation listener error", error=str(e))
+                await asyncio.sleep(1)
+                try:
+                    await self.rebuild()
+                except Exception as rebuild_error:
+                    logger.error("Error rebuilding revocation filter", error=str(rebuild_error))
+    
+    async def _rebuild_loop(self):
+        """Reconstruir periódicamente para descartar revocaciones caducadas"""
+        while True:
+            await asyncio.sleep(self.rebuild_interval)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error("Error rebuilding revocation filter", error=str(e))
+
+
+# Instancia global del almacén de revocaciones
+revocation_store: Optional[TokenRevocationStore] = None
+
+
+async def start_token_revocation(redis_client: redis.Redis):
+    """Crear el almacén de revocaciones y cargar el filtro"""
+    global revocation_store
+    
+    revocation_store = TokenRevocationStore(
+        redis_client,
+        channel=settings.AUTH_REVOCATION_CHANNEL,
+        capacity=settings.AUTH_REVOCATION_BLOOM_CAPACITY,
+        error_rate=settings.AUTH_REVOCATION_BLOOM_ERROR_RATE,
+        rebuild_interval=settings.AUTH_REVOCATION_REBUILD_SECONDS
+    )
+    await revocation_store.start()
+
+
+async def stop_token_revocation():
+    """Detener el almacén de revocaciones"""
+    global revocation_store
+    
+    if revocation_store:
+        await revocation_store.stop()
+        revocation_store = None
+
+
+def get_revocation_store() -> Optional[TokenRevocationStore]:
+    """Obtener el almacén de revocaciones (None si no se ha iniciado)"""
+    return revocation_store
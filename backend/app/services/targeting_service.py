@@ -0,0 +1,262 @@
+"""
+Motor de segmentación y elegibilidad de campañas activas
+
+Mantiene en cada worker un EligibilityIndex (STRtree de objetivos más canal,
+prioridad y demographics) con las campañas en estado active, del que se
+sirven /geolocation/targeting y /decide. Se carga completo al arrancar y se
+actualiza campaña a campaña:
+
+- el worker que modifica una campaña la aplica en su índice al momento y
+  publica su id en `TARGETING_CHANNEL`
+- el resto de workers reciben el id por pub/sub y releen la campaña de MongoDB
+
+Cada `TARGETING_RELOAD_SECONDS` se recarga el índice completo para corregir
+mensajes perdidos.
+"""
+
+import asyncio
+import uuid
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+import redis.asyncio as redis
+import structlog
+
+from app.core.config import settings
+from app.core.eligibility import CampaignProfile, EligibilityIndex
+
+logger = structlog.get_logger()
+
+TARGETING_PROJECTION = {
+    "name": 1,
+    "channel": 1,
+    "priority": 1,
+    "budget": 1,
+    "demographics": 1,
+    "media_files": 1,
+    "target_locations": 1,
+    "status": 1,
+    "start_date": 1,
+    "end_date": 1
+}
+
+
+class TargetingEngine:
+    """Índice de elegibilidad sincronizado con MongoDB y entre workers"""
+    
+    def __init__(
+        self,
+        db,
+        redis_client: redis.Redis,
+        channel: str = "campaigns:targeting",
+        point_radius_km: float = 1.0,
+        circle_segments: int = 64,
+        rebuild_threshold: int = 128,
+        reload_interval: float = 900.0
+    ):
+        self.db = db
+        self.redis = redis_client
+        self.channel = channel
+        self.point_radius_km = point_radius_km
+        self.circle_segments = circle_segments
+        self.rebuild_threshold = rebuild_threshold
+        self.reload_interval = reload_interval
+        
+        # Identifica los mensajes propios, que ya se aplicaron al publicarlos
+        self.instance_id = uuid.uuid4().hex
+        self.index = self._new_index()
+        # Campañas cambiadas mientras se recarga el índice completo
+        self._changed_during_reload: Optional[set] = None
+        self._pubsub = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._reload_task: Optional[asyncio.Task] = None
+    
+    def _new_index(self) -> EligibilityIndex:
+        return EligibilityIndex(
+            point_radius_km=self.point_radius_km,
+            circle_segments=self.circle_segments,
+            rebuild_threshold=self.rebuild_threshold
+        )
+    
+    def query(
+        self,
+        longitude: float,
+        latitude: float,
+        country: Optional[str] = None,
+        region: Optional[str] = None
+    ) -> List[str]:
+        """IDs de las campañas activas que cubren el punto"""
+        return self.index.targeting.query(longitude, latitude, country, region)
+    
+    def decide(
+        self,
+        channel: str,
+        longitude: float,
+        latitude: float,
+        country: Optional[str] = None,
+        region: Optional[str] = None,
+        demographics: Optional[Dict[str, Any]] = None,
+        limit: int = 1
+    ) -> List[CampaignProfile]:
+        """Mejores campañas elegibles para una petición de anuncio"""
+        return self.index.decide(channel, longitude, latitude, country, region, demographics, limit)
+    
+    def apply(self, campaign_id: str, campaign: Optional[Dict[str, Any]]):
+        """Aplicar el estado actual de una campaña (None si se eliminó)"""
+        if self._changed_during_reload is not None:
+            self._changed_during_reload.add(campaign_id)
+        
+        if campaign is not None and campaign.get("status") == "active":
+            self.index.upsert({**campaign, "_id": campaign_id})
+        else:
+            self.index.remove(campaign_id)
+    
+    async def campaign_changed(self, campaign_id: str, campaign: Optional[Dict[str, Any]] = None):
+        """Aplicar un cambio en local y avisar al resto de workers"""
+        self.apply(campaign_id, campaign)
+        try:
+            await self.redis.publish(self.channel, f"{self.instance_id}:{campaign_id}")
+        except Exception as e:
+            # Los demás workers lo recogerán en la siguiente recarga completa
+            logger.error("Error publishing targeting change", campaign_id=campaign_id, error=str(e))
+    
+    async def refresh(self, campaign_id: str):
+        """Releer una campaña de MongoDB y aplicarla"""
+        campaign = None
+        if ObjectId.is_valid(campaign_id):
+            campaign = await self.db.campaigns.find_one(
+                {"_id": ObjectId(campaign_id)},
+                TARGETING_PROJECTION
+            )
+        self.apply(campaign_id, campaign)
+    
+    async def reload(self):
+        """Recargar todas las campañas activas en un índice nuevo"""
+        self._changed_during_reload = set()
+        try:
+            campaigns = await self.db.campaigns.find(
+                {"status": "active"},
+                TARGETING_PROJECTION
+            ).to_list(length=None)
+            
+            # Convertir geometrías y construir el árbol fuera del event loop
+            index = self._new_index()
+            await asyncio.to_thread(index.load, campaigns)
+            self.index = index
+            changed = self._changed_during_reload
+        finally:
+            self._changed_during_reload = None
+        
+        # Cambios recibidos mientras se leía la colección
+        for campaign_id in changed:
+            await self.refresh(campaign_id)
+        
+        logger.info("Targeting index loaded", campaigns=len(self.index))
+    
+    def get_stats(self) -> dict:
+        """Estadísticas del índice"""
+        return self.index.get_stats()
+    
+    async def start(self):
+        """Cargar el índice y suscribirse a los cambios de campañas"""
+        if self._listener_task is not None:
+            return
+        
+        # Suscribirse antes de cargar para no perder cambios intermedios
+        self._pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        await self.reload()
+        
+        self._listener_task = asyncio.create_task(self._listen())
+        self._reload_task = asyncio.create_task(self._reload_loop())
+        logger.info("Targeting listener started", channel=self.channel)
+    
+    async def stop(self):
+        """Detener la suscripción y la recarga periódica"""
+        for task in (self._listener_task, self._reload_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._listener_task = None
+        self._reload_task = None
+        
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.close()
+            self._pubsub = None
+    
+    async def _listen(self):
+        """Aplicar los cambios publicados por otros workers"""
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    instance_id, _, campaign_id = message["data"].partition(":")
+                    if instance_id != self.instance_id:
+                        await self.refresh(campaign_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Pudieron perderse mensajes: recargar antes de seguir
+                logger.error("Targeting listener error", error=str(e))
+                await asyncio.sleep(1)
+                try:
+                    await self.reload()
+                except Exception as reload_error:
+                    logger.error("Error reloading targeting index", error=str(reload_error))
+    
+    async def _reload_loop(self):
+        """Recargar periódicamente el índice completo"""
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error("Error reloading targeting index", error=str(e))
+
+
+# Instancia global del motor de segmentación
+targeting_engine: Optional[TargetingEngine] = None
+
+
+async def start_targeting(db, redis_client: redis.Redis):
+    """Crear el motor de segmentación y cargar las campañas activas"""
+    global targeting_engine
+    
+    if not settings.TARGETING_ENABLED:
+        return
+    
+    targeting_engine = TargetingEngine(
+        db,
+        redis_client,
+        channel=settings.TARGETING_CHANNEL,
+        point_radius_km=settings.TARGETING_POINT_RADIUS_KM,
+        circle_segments=settings.TARGETING_CIRCLE_SEGMENTS,
+        rebuild_threshold=settings.TARGETING_REBUILD_THRESHOLD,
+        reload_interval=settings.TARGETING_RELOAD_SECONDS
+    )
+    await targeting_engine.start()
+
+
+async def stop_targeting():
+    """Detener el motor de segmentación"""
+    global targeting_engine
+    
+    if targeting_engine:
+        await targeting_engine.stop()
+        targeting_engine = None
+
+
+def get_targeting_engine() -> Optional[TargetingEngine]:
+    """Obtener el motor de segmentación (None si no se ha iniciado)"""
+    return targeting_engine
+
+
+async def notify_campaign_changed(campaign_id: str, campaign: Optional[Dict[str, Any]] = None):
+    """Propagar el nuevo estado de una campaña al índice (None si se eliminó)"""
+    if targeting_engine is not None:
+        await targeting_engine.campaign_changed(campaign_id, campaign)
@@ -9,7 +9,7 @@ import structlog
 
 from app.models.user import User, UserCreate, UserUpdate
 from app.core.database import get_database
-from app.core.exceptions import NotFoundError, ValidationError, DatabaseError
+from app.core.exceptions import NotFoundError, ValidationError, DatabaseError, ServiceUnavailableError
 from app.services.auth_service import AuthService
 
 logger = structlog.get_logger()
@@ -37,7 +37,7 @@ class UserService:
                 raise ValidationError("Email already exists")
             
             # Hashear contraseña
-            hashed_password = self.auth_service.hash_password(user_data.password)
+            hashed_password = await self.auth_service.hash_password(user_data.password)
             
             # Preparar datos del usuario
             now = datetime.utcnow()
@@ -68,7 +68,7 @@ class UserService:
             
             return user
             
-        except ValidationError:
+        except (ValidationError, ServiceUnavailableError):
             raise
         except Exception as e:
             logger.error("Error creating user", error=str(e))
@@ -228,6 +228,8 @@ class UserService:
         try:
             return await self.auth_service.verify_password(password, hashed_password)
             
+        except ServiceUnavailableError:
+            raise
         except Exception as e:
             logger.error("Error verifying password", error=str(e))
             return False
@@ -250,7 +252,7 @@ class UserService:
                 raise ValidationError("Current password is incorrect")
             
             # Hashear nueva contraseña
-            new_hashed_password = self.auth_service.hash_password(new_password)
+            new_hashed_password = await self.auth_service.hash_password(new_password)
             
             # Actualizar contraseña
             result = await self.collection.update_one(
@@ -268,7 +270,7 @@ class UserService:
             
             return True
             
-        except (NotFoundError, ValidationError):
+        except (NotFoundError, ValidationError, ServiceUnavailableError):
             raise
         except Exception as e:
             logger.error("Error changing password", user_id=user_id, error=str(e))
@@ -283,7 +285,7 @@ class UserService:
                 raise NotFoundError("User", user_id)
             
             # Hashear nueva contraseña
-            new_hashed_password = self.auth_service.hash_password(new_password)
+            new_hashed_password = await self.auth_service.hash_password(new_password)
             
             # Actualizar contraseña y limpiar tokens de reset
             result = await self.collection.update_one(
@@ -303,7 +305,7 @@ class UserService:
             
             return True
             
-        except NotFoundError:
+        except (NotFoundError, ServiceUnavailableError):
             raise
         except Exception as e:
             logger.error("Error resetting password", user_id=user_id, error=str(e))
@@ -0,0 +1,393 @@
+"""
+Worker de procesamiento de multimedia
+
+Proceso aparte de la API que consume la cola `MEDIA_QUEUE_NAME` en Redis:
+
+    python -m app.workers.media_worker                 # procesar
+    python -m app.workers.media_worker --stats         # estado de la cola
+    python -m app.workers.media_worker --requeue-dead  # reintentar descartados
+
+Cada trabajo (un media_file) pasa por UPLOADING -> PROCESSING -> READY, con
+`processing_progress` actualizado en cada etapa: copia local del archivo,
+procesamiento (en un pool de MEDIA_WORKER_PROCESSES procesos, fuera del event
+loop), subida de la miniatura y las versiones de las imágenes y guardado del
+resultado. Los fallos transitorios (almacenamiento, red) se reintentan con
+backoff exponencial hasta MEDIA_JOB_MAX_ATTEMPTS; los errores del contenido
+(MediaProcessingError) y los trabajos que agotan los intentos van a la dead
+letter y dejan el archivo en ERROR.
+
+Al parar (SIGINT/SIGTERM) no se reservan más trabajos, se terminan los que
+están en curso y se devuelve a la cola lo que quede reservado.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from bson import ObjectId
+import structlog
+
+from app.core.config import settings
+from app.core.database import connect_to_mongo, close_mongo_connection, get_database
+from app.core.exceptions import MediaProcessingError
+from app.core.job_queue import Job, RedisJobQueue
+from app.core.redis_client import connect_to_redis, close_redis_connection, get_redis
+from app.core.storage import StorageBackend, close_storage, get_storage
+from app.models.media import MediaStatus
+from app.services.media_processing import process_media
+from app.services.media_service import build_media_queue
+
+logger = structlog.get_logger()
+
+
+class MediaWorker:
+    """Consumidor de la cola de multimedia con un pool de procesos para la CPU"""
+    
+    def __init__(
+        self,
+        db,
+        queue: RedisJobQueue,
+        storage: StorageBackend,
+        processes: int = 2,
+        concurrency: int = 4,
+        max_attempts: int = 5,
+        retry_base_seconds: float = 5.0,
+        heartbeat_interval: float = 5.0,
+        stale_after: float = 60.0,
+        rendition_options: Optional[Dict[str, Any]] = None
+    ):
+        self.collection = db.media_files
+        self.queue = queue
+        self.storage = storage
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.rendition_options = rendition_options
+        
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._processes = processes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._stopping = asyncio.Event()
+        self._in_flight: Set[asyncio.Task] = set()  # _handle en curso
+        
+        self.stats = {
+            "completed": 0,
+            "retried": 0,
+            "dead_lettered": 0
+        }
+    
+    async def run(self):
+        """Procesar trabajos hasta que se llame a stop()"""
+        self._pool = ProcessPoolExecutor(max_workers=self._processes)
+        await self.queue.heartbeat(self.worker_id)
+        logger.info(
+            "Media worker started",
+            worker_id=self.worker_id,
+            processes=self._processes,
+            concurrency=self.concurrency
+        )
+        
+        maintenance = asyncio.create_task(self._maintenance_loop())
+        consumers = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+        try:
+            await self._stopping.wait()
+        finally:
+            # Dejar de reservar y terminar los trabajos en curso; el latido
+            # sigue mientras tanto para que nadie los recupere como caídos
+            for task in consumers:
+                task.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
+            if self._in_flight:
+                logger.info("Waiting for in-flight media jobs", jobs=len(self._in_flight))
+                await asyncio.gather(*self._in_flight, return_exceptions=True)
+            maintenance.cancel()
+            await asyncio.gather(maintenance, return_exceptions=True)
+            
+            # Solo queda reservado lo que BLMOVE movió al cancelar la espera
+            try:
+                await self.queue.unregister(self.worker_id)
+            except Exception as e:
+                logger.error("Error unregistering media worker", worker_id=self.worker_id, error=str(e))
+            await asyncio.to_thread(self._pool.shutdown, wait=True, cancel_futures=True)
+            logger.info("Media worker stopped", worker_id=self.worker_id, **self.stats)
+    
+    def stop(self):
+        self._stopping.set()
+    
+    async def _maintenance_loop(self):
+        """Latido, reintentos vencidos y recuperación de workers caídos"""
+        while True:
+            try:
+                await self.queue.heartbeat(self.worker_id)
+                await self.queue.promote_due()
+                await self.queue.recover(self.stale_after)
+            except Exception as e:
+                logger.error("Media queue maintenance error", error=str(e))
+            await asyncio.sleep(self.heartbeat_interval)
+    
+    async def _consume(self):
+        """Reservar y procesar trabajos de uno en uno; un error no para el bucle"""
+        failures = 0
+        while True:
+            try:
+                job = await self.queue.reserve(self.worker_id, timeout=1.0)
+                if job is not None:
+                    # Un trabajo empezado se termina aunque se pida parar: al
+                    # cancelar el consumidor la tarea sigue y run() la espera
+                    task = asyncio.create_task(self._handle(job))
+                    self._in_flight.add(task)
+                    task.add_done_callback(self._in_flight.discard)
+                    await asyncio.shield(task)
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                logger.error("Media consumer error", worker_id=self.worker_id, failures=failures, error=str(e))
+                await asyncio.sleep(min(30.0, 2 ** (failures - 1)))
+    
+    async def _handle(self, job: Job):
+        file_id = job.data.get("file_id")
+        try:
+            if job.attempts >= self.max_attempts:
+                # Ya agotó los intentos (p. ej. tumbó a otro worker)
+                await self._dead_letter(job, file_id, job.last_error or "Too many attempts")
+                return
+            
+            file_doc = None
+            if file_id and ObjectId.is_valid(file_id):
+                file_doc = await self.collection.find_one({"_id": ObjectId(file_id)})
+            if file_doc is None:
+                # El archivo se eliminó mientras esperaba en la cola
+                await self.queue.ack(self.worker_id, job)
+                return
+            
+            updates = await self._process(file_id, file_doc)
+            try:
+                result = await self.collection.update_one(
+                    {"_id": ObjectId(file_id)},
+                    {"$set": {
+                        **updates,
+                        "status": MediaStatus.READY,
+                        "processing_progress": 100,
+                        "processed_date": datetime.utcnow(),
+                        "error_message": None
+                    }}
+                )
+            except Exception:
+                # Sin documento que las referencie: el reintento las vuelve a generar
+                await self._delete_renditions(updates.get("renditions") or [])
+                raise
+            if result.matched_count == 0:
+                # Eliminado durante el procesamiento: no dejar versiones huérfanas
+                await self._delete_renditions(updates.get("renditions") or [])
+            else:
+                await self._delete_renditions(file_doc.get("renditions") or [], keep=updates.get("renditions"))
+            await self.queue.ack(self.worker_id, job)
+            self.stats["completed"] += 1
+            logger.info("Media file processed", file_id=file_id, attempts=job.attempts + 1)
+            
+        except MediaProcessingError as e:
+            await self._dead_letter(job, file_id, e.message)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job.attempts + 1 >= self.max_attempts:
+                await self._dead_letter(job, file_id, error)
+                return
+            
+            delay = self.retry_base_seconds * 2 ** job.attempts
+            await self.queue.retry(self.worker_id, job, error, delay)
+            self.stats["retried"] += 1
+            await self._try_update(file_id, {
+                "status": MediaStatus.PROCESSING,
+                "processing_progress": 0,
+                "error_message": f"Attempt {job.attempts + 1} failed, retrying: {error}"
+            })
+            logger.warning("Media job failed, retrying", file_id=file_id, attempt=job.attempts + 1, delay=delay, error=error)
+    
+    async def _process(self, file_id: str, file_doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Copiar el archivo a local y procesarlo en el pool de procesos"""
+        storage_key = file_doc.get("storage_key") or self.storage.key_from_url(file_doc.get("url", ""))
+        if not storage_key:
+            raise MediaProcessingError("File has no storage key")
+        
+        await self._set_progress(file_id, 10)
+        with tempfile.TemporaryDirectory(prefix="inmax-media-") as temp_dir:
+            path = os.path.join(temp_dir, "source")
+            await self.storage.fetch(storage_key, path)
+            await self._set_progress(file_id, 30)
+            
+            loop = asyncio.get_running_loop()
+            updates = await loop.run_in_executor(
+                self._pool,
+                process_media,
+                path,
+                file_doc["file_type"],
+                file_doc["mime_type"],
+                file_doc.get("checksum"),
+                temp_dir if self.rendition_options is not None else None,
+                self.rendition_options
+            )
+            await self._set_progress(file_id, 70)
+            
+            rendition_files = updates.pop("rendition_files", None)
+            if rendition_files is not None:
+                updates["renditions"] = await self._store_renditions(storage_key, rendition_files)
+                thumbnail = self._pick_thumbnail(updates["renditions"])
+                updates["thumbnail_url"] = thumbnail["url"] if thumbnail else None
+        await self._set_progress(file_id, 90)
+        return updates
+    
+    async def _store_renditions(self, storage_key: str, rendition_files: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Subir las versiones generadas junto al original: <clave sin extensión>/<nombre><ext>"""
+        base_key = os.path.splitext(storage_key)[0]
+        renditions = []
+        try:
+            for rendition in rendition_files:
+                path = rendition.pop("path")
+                key = f"{base_key}/{os.path.basename(path)}"
+                with open(path, "rb") as handle:
+                    stored = await self.storage.save(handle, key, content_type=rendition["content_type"])
+                renditions.append({**rendition, "key": stored.key, "url": stored.url, "size": stored.size})
+        except Exception:
+            # Fallo a medias: no dejar las ya subidas sin documento que las referencie
+            await self._delete_renditions(renditions)
+            raise
+        return renditions
+    
+    @staticmethod
+    def _pick_thumbnail(renditions: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Miniatura para thumbnail_url: JPEG si se generó (lo muestra cualquier cliente)"""
+        thumbnails = [rendition for rendition in renditions if rendition["name"] == "thumbnail"]
+        for rendition in thumbnails:
+            if rendition["format"] == "jpeg":
+                return rendition
+        return thumbnails[0] if thumbnails else None
+    
+    async def _delete_renditions(self, renditions: List[Dict[str, Any]], keep: Optional[List[Dict[str, Any]]] = None):
+        """
+        Borrar versiones del almacenamiento, salvo las claves de `keep`.
+        
+        Al reprocesar, las claves nuevas pueden coincidir con las anteriores
+        (S3 sobrescribe); en local las iguales cuentan una referencia más.
+        """
+        kept = {rendition["key"] for rendition in keep or []}
+        for rendition in renditions:
+            if rendition.get("key") in kept and self.storage.name != "local":
+                continue
+            try:
+                await self.storage.delete(rendition["key"])
+            except Exception as e:
+                logger.warning("Could not delete rendition", key=rendition.get("key"), error=str(e))
+    
+    async def _set_progress(self, file_id: str, progress: int, message: Optional[str] = None):
+        update = {"status": MediaStatus.PROCESSING, "processing_progress": progress}
+        if message is not None:
+            update["error_message"] = message
+        await self.collection.update_one({"_id": ObjectId(file_id)}, {"$set": update})
+    
+    async def _dead_letter(self, job: Job, file_id: Optional[str], error: str):
+        await self.queue.dead_letter(self.worker_id, job, error)
+        self.stats["dead_lettered"] += 1
+        logger.error("Media job dead-lettered", file_id=file_id, attempts=job.attempts + 1, error=error)
+        
+        await self._try_update(file_id, {
+            "status": MediaStatus.ERROR,
+            "processing_progress": 0,
+            "error_message": error
+        })
+    
+    async def _try_update(self, file_id: Optional[str], fields: Dict[str, Any]):
+        """
+        Actualizar el documento en las rutas de error, sin lanzar.
+        
+        El trabajo ya está reprogramado o descartado en Redis; si MongoDB
+        falla aquí solo se pierde el mensaje de estado, no el trabajo.
+        """
+        if not file_id or not ObjectId.is_valid(file_id):
+            return
+        try:
+            await self.collection.update_one({"_id": ObjectId(file_id)}, {"$set": fields})
+        except Exception as e:
+            logger.error("Error updating media file status", file_id=file_id, error=str(e))
+
+
+def rendition_options() -> Optional[Dict[str, Any]]:
+    """Argumentos de image_renditions según la configuración (None: desactivado)"""
+    if not settings.MEDIA_RENDITIONS_ENABLED:
+        return None
+    return {
+        "widths": settings.MEDIA_RENDITION_WIDTHS,
+        "formats": settings.MEDIA_RENDITION_FORMATS,
+        "thumbnail_size": settings.MEDIA_THUMBNAIL_SIZE,
+        "quality": settings.MEDIA_RENDITION_QUALITY
+    }
+
+
+async def run_worker():
+    """Conectar a MongoDB y Redis y procesar hasta SIGINT/SIGTERM"""
+    await connect_to_mongo()
+    await connect_to_redis()
+    try:
+        worker = MediaWorker(
+            await get_database(),
+            build_media_queue(await get_redis()),
+            get_storage(),
+            processes=settings.MEDIA_WORKER_PROCESSES,
+            concurrency=settings.MEDIA_WORKER_CONCURRENCY,
+            max_attempts=settings.MEDIA_JOB_MAX_ATTEMPTS,
+            retry_base_seconds=settings.MEDIA_JOB_RETRY_BASE_SECONDS,
+            heartbeat_interval=settings.MEDIA_WORKER_HEARTBEAT_SECONDS,
+            stale_after=settings.MEDIA_WORKER_STALE_SECONDS,
+            rendition_options=rendition_options()
+        )
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, worker.stop)
+            except NotImplementedError:  # Windows
+                pass
+        await worker.run()
+    finally:
+        await close_storage()
+        await close_redis_connection()
+        await close_mongo_connection()
+
+
+async def run_admin(stats: bool, requeue_dead: bool):
+    await connect_to_redis()
+    try:
+        queue = build_media_queue(await get_redis())
+        if requeue_dead:
+            print(f"Requeued {await queue.requeue_dead()} dead-lettered jobs")
+        if stats:
+            print(json.dumps(await queue.get_stats(), indent=2))
+            print(json.dumps(await queue.dead_letters(limit=10), indent=2, default=str))
+    finally:
+        await close_redis_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stats", action="store_true", help="Mostrar el estado de la cola y salir")
+    parser.add_argument("--requeue-dead", action="store_true", help="Devolver a la cola los trabajos descartados")
+    args = parser.parse_args()
+    
+    if args.stats or args.requeue_dead:
+        asyncio.run(run_admin(args.stats, args.requeue_dead))
+    else:
+        asyncio.run(run_worker())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Rellenar name_normalized en campañas creadas antes del autocompletado por prefijo
+
+Uso (desde backend/):
+    python -m scripts.backfill_campaign_search
+"""
+
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.core.text import normalize_search_text
+
+BATCH_SIZE = 1000
+
+
+async def backfill():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    collection = client[settings.MONGO_DATABASE].campaigns
+    
+    updated = 0
+    operations = []
+    cursor = collection.find({"name_normalized": {"$exists": False}}, {"name": 1})
+    
+    async for doc in cursor:
+        operations.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {"name_normalized": normalize_search_text(doc.get("name", ""))}}
+        ))
+        if len(operations) >= BATCH_SIZE:
+            result = await collection.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+            operations = []
+    
+    if operations:
+        result = await collection.bulk_write(operations, ordered=False)
+        updated += result.modified_count
+    
+    print(f"Campaigns updated: {updated}")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
@@ -0,0 +1,114 @@
+"""
+Benchmark de códecs del caché para payloads de CampaignList
+
+Genera listados de campañas realistas (con polígonos en target_locations) y
+compara, para cada combinación códec/compresión disponible, el tiempo de
+codificación y decodificación y los bytes que se guardarían en Redis.
+
+No necesita Redis. Uso (desde backend/):
+    python -m scripts.benchmarks.cache_codecs --sizes 10 50 100 --polygon-points 64
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.core.cache_codecs import CODECS_BY_NAME, COMPRESSIONS_BY_NAME, CacheSerializer
+from app.models.campaign import Campaign, CampaignList
+
+
+def make_polygon(center_lon: float, center_lat: float, points: int) -> list:
+    """Polígono aproximadamente circular alrededor de un centro"""
+    coords = []
+    for i in range(points):
+        angle = 2 * math.pi * i / points
+        radius = random.uniform(0.01, 0.05)
+        coords.append([
+            round(center_lon + radius * math.cos(angle), 6),
+            round(center_lat + radius * math.sin(angle), 6)
+        ])
+    return coords
+
+
+def make_campaign_list(size: int, polygon_points: int) -> dict:
+    """Construir un CampaignList serializado como lo guarda el endpoint"""
+    now = datetime.utcnow()
+    campaigns = []
+    for i in range(size):
+        lon, lat = random.uniform(-10, 5), random.uniform(36, 44)
+        campaigns.append(Campaign(
+            _id=f"65a1b2c3d4e5f6a7b8c9{i:04d}",
+            user_id="65a1b2c3d4e5f6a7b8c90000",
+            name=f"Campaña de verano {i}",
+            description="Campaña publicitaria de prueba con segmentación geográfica " * 3,
+            budget=round(random.uniform(100, 50000), 2),
+            demographics={"age_range": [18, 45], "gender": "all", "interests": ["deportes", "viajes"]},
+            channel="digital",
+            start_date=now,
+            end_date=now + timedelta(days=30),
+            target_locations=[
+                {"type": "polygon", "coordinates": [lon, lat],
+                 "polygon_coordinates": make_polygon(lon, lat, polygon_points)},
+                {"type": "circle", "coordinates": [lon, lat], "radius": 5.0, "city": "Madrid"},
+            ],
+            media_files=[f"65a1b2c3d4e5f6a7b8c9{j:04d}" for j in range(3)],
+            created_at=now,
+            updated_at=now,
+        ))
+    return CampaignList(campaigns=campaigns, total=size * 10, page=1, size=size, pages=10).dict()
+
+
+def timeit(func, repeats: int) -> float:
+    """Tiempo medio por llamada en microsegundos"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--polygon-points", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--threshold", type=int, default=1024, help="Umbral de compresión en bytes")
+    args = parser.parse_args()
+    
+    random.seed(42)
+    
+    print(f"{'campaigns':>9} | {'codec':<8} | {'compression':<11} | {'bytes':>9} | "
+          f"{'encode us':>10} | {'decode us':>10}")
+    print("-" * 72)
+    
+    for size in args.sizes:
+        payload = make_campaign_list(size, args.polygon_points)
+        
+        # Implementación anterior: json.dumps(default=str) sin cabecera
+        legacy = json.dumps(payload, default=str)
+        print(
+            f"{size:>9} | {'legacy':<8} | {'none':<11} | {len(legacy.encode()):>9} | "
+            f"{timeit(lambda: json.dumps(payload, default=str), args.repeats):>10.1f} | "
+            f"{timeit(lambda: json.loads(legacy), args.repeats):>10.1f}"
+        )
+        
+        for codec in CODECS_BY_NAME:
+            for compression in COMPRESSIONS_BY_NAME:
+                serializer = CacheSerializer(codec, compression, compress_threshold=args.threshold)
+                if serializer.compression != COMPRESSIONS_BY_NAME[compression]:
+                    continue  # compresión no instalada
+                
+                data = serializer.dumps(payload)
+                encode_us = timeit(lambda: serializer.dumps(payload), args.repeats)
+                decode_us = timeit(lambda: serializer.loads(data), args.repeats)
+                print(
+                    f"{size:>9} | {codec:<8} | {compression:<11} | {len(data):>9} | "
+                    f"{encode_us:>10.1f} | {decode_us:>10.1f}"
+                )
+        print("-" * 72)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark de invalidación de caché: etiquetas vs. patrones
+
+Llena una base de datos Redis dedicada con N entradas de listados de campañas
+y mide la latencia de invalidar los listados de un usuario con:
+
+- invalidate_tags: incremento del contador de generación (O(1))
+- delete_pattern: SCAN por lotes + UNLINK (O(N) en el keyspace)
+- KEYS + DEL: implementación anterior (O(N) y bloqueante)
+
+Uso (desde backend/):
+    python -m scripts.benchmarks.cache_invalidation --sizes 10000 100000 1000000
+
+ATENCIÓN: la base de datos indicada con --db se vacía (FLUSHDB) al empezar y al terminar.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import redis.asyncio as redis
+
+from app.core.redis_client import RedisCache
+
+USER_KEYS = 50
+FILL_BATCH = 10000
+PAYLOAD = '{"tags": {"campaigns:user-0": 0}, "value": {"campaigns": [], "total": 0}}'
+
+
+async def fill(client: redis.Redis, total: int):
+    """Crear `total` entradas repartidas entre usuarios ficticios"""
+    users = max(total // USER_KEYS, 1)
+    for start in range(0, total, FILL_BATCH):
+        async with client.pipeline(transaction=False) as pipe:
+            for i in range(start, min(start + FILL_BATCH, total)):
+                pipe.setex(f"campaigns:user-{i % users}:{i // users}:10:None:None", 3600, PAYLOAD)
+            await pipe.execute()
+
+
+async def measure(func, repeats: int) -> dict:
+    """Ejecutar `func` varias veces y devolver estadísticas en milisegundos"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        "max": samples[-1],
+    }
+
+
+async def keys_and_delete(client: redis.Redis, pattern: str):
+    """Implementación anterior de delete_pattern"""
+    keys = await client.keys(pattern)
+    if keys:
+        await client.delete(*keys)
+
+
+async def run(url: str, db: int, sizes: list, repeats: int):
+    client = redis.from_url(url, db=db, encoding="utf-8", decode_responses=True)
+    cache = RedisCache(client)
+    
+    print(f"{'keys':>10} | {'method':<16} | {'p50 ms':>9} | {'p99 ms':>9} | {'max ms':>9}")
+    print("-" * 66)
+    
+    try:
+        for size in sizes:
+            await client.flushdb()
+            await fill(client, size)
+            
+            tag = "campaigns:user-0"
+            pattern = "campaigns:user-0:*"
+            
+            results = {
+                "invalidate_tags": await measure(lambda: cache.invalidate_tags(tag), repeats),
+                "delete_pattern": await measure(lambda: cache.delete_pattern(pattern), max(repeats // 10, 3)),
+                "keys+del": await measure(lambda: keys_and_delete(client, pattern), max(repeats // 10, 3)),
+            }
+            
+            for method, stats in results.items():
+                print(
+                    f"{size:>10} | {method:<16} | {stats['p50']:>9.3f} | "
+                    f"{stats['p99']:>9.3f} | {stats['max']:>9.3f}"
+                )
+    finally:
+        await client.flushdb()
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="redis://localhost:6379")
+    parser.add_argument("--db", type=int, default=15, help="Base de datos Redis dedicada al benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    
+    asyncio.run(run(args.url, args.db, args.sizes, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark de búsqueda de campañas: regex sin anclar vs. índice de texto vs. prefijo
+
+Crea N campañas de un usuario en una base de datos dedicada y compara la
+latencia y los documentos examinados (explain) de cada modo de búsqueda.
+
+Uso (desde backend/):
+    python -m scripts.benchmarks.campaign_search --campaigns 100000
+
+ATENCIÓN: la base de datos indicada con --database se elimina al terminar.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.core.text import normalize_search_text
+from app.models.campaign import SearchMode
+from app.services.campaign_service import CampaignService
+
+USER_ID = "bench-user"
+WORDS = [
+    "verano", "invierno", "lanzamiento", "promoción", "descuento", "navidad", "rebajas",
+    "madrid", "barcelona", "valencia", "sevilla", "málaga", "bilbao", "campaña", "digital",
+    "exterior", "radio", "televisión", "marca", "producto", "evento", "festival", "ofertas",
+]
+
+
+async def seed(collection, total: int):
+    """Insertar campañas sintéticas con nombres y descripciones aleatorias"""
+    now = datetime.utcnow()
+    batch = []
+    for i in range(total):
+        name = " ".join(random.sample(WORDS, 3)).capitalize() + f" {i}"
+        batch.append({
+            "user_id": USER_ID,
+            "name": name,
+            "name_normalized": normalize_search_text(name),
+            "description": " ".join(random.choices(WORDS, k=12)),
+            "budget": 1000.0,
+            "channel": "digital",
+            "status": "active",
+            "priority": "medium",
+            "start_date": now,
+            "end_date": now + timedelta(days=30),
+            "target_locations": [],
+            "media_files": [],
+            "created_at": now - timedelta(seconds=i),
+            "updated_at": now,
+        })
+        if len(batch) >= 5000:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def explain_docs_examined(collection, filters: dict) -> int:
+    """Documentos examinados por el plan de ejecución ganador"""
+    plan = await collection.find(filters).limit(21).explain()
+    return plan.get("executionStats", {}).get("totalDocsExamined", -1)
+
+
+async def run(url: str, database: str, total: int, repeats: int):
+    client = AsyncIOMotorClient(url)
+    db = client[database]
+    service = CampaignService(db)
+    
+    try:
+        await db.campaigns.drop()
+        await db.campaigns.create_index([("name", "text"), ("description", "text")])
+        await db.campaigns.create_index([("user_id", 1), ("name_normalized", 1)])
+        await db.campaigns.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+        await seed(db.campaigns, total)
+        
+        cases = [
+            (SearchMode.REGEX, "navidad", {"user_id": USER_ID, "name": {"$regex": "navidad", "$options": "i"}}),
+            (SearchMode.TEXT, "navidad", {"user_id": USER_ID, "$text": {"$search": "navidad"}}),
+            (SearchMode.PREFIX, "navi", {"user_id": USER_ID, "name_normalized": {"$regex": "^navi"}}),
+        ]
+        
+        print(f"campaigns: {total}")
+        print(f"{'mode':<8} | {'p50 ms':>9} | {'p95 ms':>9} | {'docs examined':>14}")
+        print("-" * 50)
+        
+        for mode, term, filters in cases:
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                await service.list_campaigns(USER_ID, size=20, search=term, search_mode=mode)
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            examined = await explain_docs_examined(db.campaigns, filters)
+            print(
+                f"{mode.value:<8} | {statistics.median(samples):>9.2f} | "
+                f"{samples[int(len(samples) * 0.95) - 1]:>9.2f} | {examined:>14}"
+            )
+    finally:
+        await client.drop_database(database)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=settings.MONGODB_URL)
+    parser.add_argument("--database", default="inmax_bench_search")
+    parser.add_argument("--campaigns", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=30)
+    args = parser.parse_args()
+    
+    random.seed(42)
+    asyncio.run(run(args.url, args.database, args.campaigns, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
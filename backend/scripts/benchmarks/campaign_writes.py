@@ -0,0 +1,169 @@
+"""
+Benchmark de las rutas de escritura de campañas
+
+Compara, para actualizar, cambiar de estado y eliminar, la implementación
+anterior (lecturas de verificación + update_one/delete_one + relectura) con
+las operaciones atómicas find_one_and_update / find_one_and_delete de
+CampaignService. Cuenta los comandos enviados a MongoDB con un
+CommandListener y mide la latencia por operación.
+
+Uso (desde backend/):
+    python -m scripts.benchmarks.campaign_writes --mongo-url mongodb://localhost:27017 --ops 2000
+
+ATENCIÓN: la base de datos indicada con --db se elimina al terminar.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from app.models.campaign import CampaignStatus, CampaignUpdate
+from app.services.campaign_service import CampaignService
+
+USER_ID = "65a1b2c3d4e5f6a7b8c90000"
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Cuenta los comandos de datos enviados al servidor"""
+    
+    IGNORED = {"hello", "ismaster", "isMaster", "ping", "endSessions", "buildInfo"}
+    
+    def __init__(self):
+        self.count = 0
+    
+    def started(self, event):
+        if event.command_name not in self.IGNORED:
+            self.count += 1
+    
+    def succeeded(self, event):
+        pass
+    
+    def failed(self, event):
+        pass
+
+
+async def legacy_update(service: CampaignService, campaign_id: str, data: CampaignUpdate):
+    """Ruta anterior: lectura en el endpoint, lectura en el servicio, update y relectura"""
+    await service.get_campaign(campaign_id, USER_ID)
+    await service.get_campaign(campaign_id, USER_ID)
+    await service.collection.update_one(
+        {"_id": ObjectId(campaign_id), "user_id": USER_ID},
+        {"$set": {**data.dict(exclude_unset=True), "updated_at": datetime.utcnow()}}
+    )
+    return await service.get_campaign_by_id(campaign_id)
+
+
+async def legacy_status(service: CampaignService, campaign_id: str, new_status: CampaignStatus):
+    await service.get_campaign(campaign_id, USER_ID)
+    await service.get_campaign(campaign_id, USER_ID)
+    await service.collection.update_one(
+        {"_id": ObjectId(campaign_id), "user_id": USER_ID},
+        {"$set": {"status": new_status.value, "updated_at": datetime.utcnow()}}
+    )
+    return await service.get_campaign_by_id(campaign_id)
+
+
+async def legacy_delete(service: CampaignService, campaign_id: str):
+    await service.get_campaign(campaign_id, USER_ID)
+    await service.get_campaign(campaign_id, USER_ID)
+    await service.collection.delete_one({"_id": ObjectId(campaign_id), "user_id": USER_ID})
+
+
+async def seed(collection, total: int) -> list:
+    now = datetime.utcnow()
+    docs = [
+        {
+            "_id": ObjectId(),
+            "user_id": USER_ID,
+            "name": f"Campaña {i}",
+            "name_normalized": f"campana {i}",
+            "description": "Campaña de prueba",
+            "budget": 1000.0,
+            "demographics": {},
+            "channel": "digital",
+            "start_date": now,
+            "end_date": now + timedelta(days=30),
+            "target_locations": [],
+            "media_files": [],
+            "status": CampaignStatus.DRAFT.value,
+            "created_at": now,
+            "updated_at": now,
+            "views_count": 0,
+            "clicks_count": 0,
+            "conversions_count": 0
+        }
+        for i in range(total)
+    ]
+    await collection.insert_many(docs)
+    return [str(doc["_id"]) for doc in docs]
+
+
+async def measure(counter: CommandCounter, func, ids: list) -> dict:
+    samples = []
+    counter.count = 0
+    for campaign_id in ids:
+        start = time.perf_counter()
+        await func(campaign_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "round_trips": counter.count / len(ids),
+        "p50": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    }
+
+
+async def run(args):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(args.mongo_url, event_listeners=[counter])
+    db = client[args.db]
+    service = CampaignService(db)
+    update = CampaignUpdate(name="Campaña renombrada", budget=2500.0)
+    
+    try:
+        await db.campaigns.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
+        # Cada variante trabaja sobre sus propias campañas
+        legacy_ids = await seed(db.campaigns, args.ops)
+        atomic_ids = await seed(db.campaigns, args.ops)
+        
+        scenarios = [
+            ("update", lambda cid: legacy_update(service, cid, update),
+             lambda cid: service.update_campaign(cid, update, USER_ID)),
+            ("status", lambda cid: legacy_status(service, cid, CampaignStatus.ACTIVE),
+             lambda cid: service.update_campaign_status(cid, CampaignStatus.ACTIVE, USER_ID)),
+            ("delete", lambda cid: legacy_delete(service, cid),
+             lambda cid: service.delete_campaign(cid, USER_ID)),
+        ]
+        
+        print(f"{'operation':<10} | {'variant':<8} | {'round trips':>11} | {'p50 ms':>8} | {'p99 ms':>8}")
+        print("-" * 58)
+        for name, legacy, atomic in scenarios:
+            for variant, func, ids in (("legacy", legacy, legacy_ids), ("atomic", atomic, atomic_ids)):
+                stats = await measure(counter, func, ids)
+                print(
+                    f"{name:<10} | {variant:<8} | {stats['round_trips']:>11.2f} | "
+                    f"{stats['p50']:>8.3f} | {stats['p99']:>8.3f}"
+                )
+    finally:
+        await client.drop_database(args.db)
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="inmax_benchmark_writes")
+    parser.add_argument("--ops", type=int, default=2000, help="Operaciones por escenario y variante")
+    args = parser.parse_args()
+    
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
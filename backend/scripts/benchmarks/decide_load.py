@@ -0,0 +1,253 @@
+"""
+Prueba de carga de /decide
+
+Dos fases:
+
+- index: EligibilityIndex.decide directamente, sin HTTP (coste de la
+  decisión en sí)
+- http: carga en bucle abierto a --qps peticiones/s repartidas entre
+  --clients procesos. Cada latencia se mide desde el instante en que debía
+  salir la petición, así que las colas (del servidor o del cliente) cuentan
+  y no hay omisión coordinada.
+
+Sin --base-url arranca en otro proceso un uvicorn con el router real de
+/decide y un índice sintético de --campaigns campañas (sin MongoDB ni Redis y
+sin autenticación). Con --base-url ataca una API en marcha con el token de
+--token; en ese caso conviene subir el límite de POST /api/v1/decide en
+RATE_LIMIT_RULES o desactivar RATE_LIMIT_ENABLED.
+
+Uso (desde backend/):
+    python -m scripts.benchmarks.decide_load --campaigns 20000 --qps 2000 --duration 10
+    python -m scripts.benchmarks.decide_load --base-url http://localhost:8000 --token <jwt> --qps 500
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import socket
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from app.core.eligibility import EligibilityIndex
+
+CHANNELS = ["display", "social_media", "search", "video", "email"]
+PRIORITIES = ["low", "medium", "high", "urgent"]
+INTERESTS = ["technology", "business", "sports", "travel", "food", "fashion", "music", "gaming"]
+BOUNDS = (-9.5, 36.0, 3.3, 43.8)  # Península Ibérica
+
+
+def make_campaigns(count: int, seed: int) -> list:
+    """Campañas activas con objetivos, canal, prioridad y demographics variados"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    campaigns = []
+    for i in range(count):
+        lon = rng.uniform(BOUNDS[0], BOUNDS[2])
+        lat = rng.uniform(BOUNDS[1], BOUNDS[3])
+        if i % 10 == 0:
+            targets = []  # elegible en cualquier ubicación
+        elif i % 4:
+            targets = [{"type": "circle", "coordinates": [lon, lat], "radius": rng.uniform(5, 60)}]
+        else:
+            size = rng.uniform(0.1, 0.8)
+            targets = [{
+                "type": "polygon",
+                "coordinates": [lon, lat],
+                "polygon_coordinates": [[lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size]]
+            }]
+        age_from = rng.choice([18, 25, 35, 45])
+        campaigns.append({
+            "_id": f"{i:024x}",
+            "name": f"Campaign {i}",
+            "channel": rng.choice(CHANNELS),
+            "priority": rng.choice(PRIORITIES),
+            "budget": round(rng.uniform(100, 10000), 2),
+            "demographics": {
+                "age": f"{age_from}-{age_from + rng.choice([10, 20, 40])}",
+                "gender": rng.choice(["all", "all", "female", "male"]),
+                "interests": rng.sample(INTERESTS, 2)
+            },
+            "media_files": [],
+            "target_locations": targets,
+            "status": "active",
+            "start_date": now - timedelta(days=1),
+            "end_date": now + timedelta(days=30)
+        })
+    return campaigns
+
+
+def make_requests(count: int, seed: int) -> list:
+    """Cuerpos de petición aleatorios, construidos antes de medir"""
+    rng = random.Random(seed + 1)
+    return [
+        {
+            "longitude": rng.uniform(BOUNDS[0], BOUNDS[2]),
+            "latitude": rng.uniform(BOUNDS[1], BOUNDS[3]),
+            "channel": rng.choice(CHANNELS),
+            "demographics": {
+                "age": rng.randint(16, 70),
+                "gender": rng.choice(["female", "male"]),
+                "interests": rng.sample(INTERESTS, 3)
+            },
+            "limit": 3
+        }
+        for _ in range(count)
+    ]
+
+
+def summarize(samples: list) -> tuple:
+    """Texto con percentiles y el p99 en ms"""
+    samples = sorted(samples)
+    if not samples:
+        return "n=0", float("inf")
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return (
+        f"n={len(samples):>7}  p50={statistics.median(samples):7.3f} ms  "
+        f"p95={p95:7.3f} ms  p99={p99:7.3f} ms  max={samples[-1]:7.3f} ms"
+    ), p99
+
+
+def run_server(port: int, campaigns: int, seed: int):
+    """API mínima con el router de /decide y un índice sintético (proceso aparte)"""
+    import uvicorn
+    from fastapi import FastAPI
+    
+    from app.api.deps import get_current_user_id
+    from app.api.v1.endpoints import decisions
+    from app.services import targeting_service
+    
+    engine = targeting_service.TargetingEngine(None, None)
+    engine.index.load(make_campaigns(campaigns, seed))
+    targeting_service.targeting_engine = engine
+    
+    app = FastAPI()
+    app.include_router(decisions.router, prefix="/api/v1/decide")
+    app.dependency_overrides[get_current_user_id] = lambda: "benchmark"
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def open_loop(url: str, rate: float, duration: float, bodies: list, headers: dict, connections: int):
+    """Enviar a ritmo constante sin esperar a las respuestas anteriores"""
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=10.0) as client:
+        async def send(scheduled: float, body: dict):
+            nonlocal errors
+            try:
+                response = await client.post(url, json=body)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append((time.perf_counter() - scheduled) * 1000)
+            else:
+                errors += 1
+        
+        # Calentar las conexiones antes de medir
+        await asyncio.gather(*(send(time.perf_counter(), bodies[0]) for _ in range(connections)))
+        latencies.clear()
+        
+        tasks = []
+        start = time.perf_counter()
+        for i in range(int(rate * duration)):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(send(scheduled, bodies[i % len(bodies)])))
+        await asyncio.gather(*tasks)
+    
+    return latencies, errors
+
+
+def client_process(url: str, rate: float, duration: float, bodies: list, headers: dict, connections: int):
+    return asyncio.run(open_loop(url, rate, duration, bodies, headers, connections))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=None, help="API en marcha (por defecto, servidor local sintético)")
+    parser.add_argument("--token", default=None, help="JWT para --base-url")
+    parser.add_argument("--campaigns", type=int, default=20000)
+    parser.add_argument("--qps", type=float, default=2000.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=4, help="Procesos generadores de carga")
+    parser.add_argument("--connections", type=int, default=32, help="Conexiones por proceso")
+    parser.add_argument("--target-p99-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    bodies = make_requests(5000, args.seed)
+    
+    start = time.perf_counter()
+    index = EligibilityIndex()
+    index.load(make_campaigns(args.campaigns, args.seed))
+    print(f"{args.campaigns} campaigns indexed in {time.perf_counter() - start:.2f} s")
+    
+    samples = []
+    hits = 0
+    for body in bodies:
+        start = time.perf_counter()
+        hits += len(index.decide(
+            body["channel"], body["longitude"], body["latitude"],
+            demographics=body["demographics"], limit=body["limit"]
+        ))
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"index: {summarize(samples)[0]}  ({hits / len(bodies):.2f} campaigns/decision)")
+    
+    server = None
+    base_url = args.base_url
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    if base_url is None:
+        port = free_port()
+        server = multiprocessing.Process(target=run_server, args=(port, args.campaigns, args.seed), daemon=True)
+        server.start()
+        wait_for_port(port)
+        base_url = f"http://127.0.0.1:{port}"
+    
+    try:
+        rate = args.qps / args.clients
+        with multiprocessing.Pool(args.clients) as pool:
+            results = pool.starmap(client_process, [
+                (f"{base_url}/api/v1/decide/", rate, args.duration, bodies[i::args.clients], headers, args.connections)
+                for i in range(args.clients)
+            ])
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+    
+    latencies = [latency for samples, _ in results for latency in samples]
+    errors = sum(errors for _, errors in results)
+    text, p99 = summarize(latencies)
+    print(f"http @ {args.qps:.0f} qps: {text}  errors={errors}")
+    verdict = "OK" if latencies and p99 <= args.target_p99_ms and not errors else "MISSED"
+    print(f"p99 target {args.target_p99_ms} ms: {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark de la matriz de distancias: por pares (geopy) vs vectorizada (NumPy)
+
+Genera N puntos aleatorios y calcula la matriz N x N:
+
+- per-pair: una llamada a geopy.distance.geodesic por par, como hace
+  calculate_distance en cada petición a /geolocation/distance. Por defecto
+  se mide una muestra de pares y se extrapola al total (--full la calcula
+  entera; con 1000 puntos tarda minutos).
+- fast: haversine vectorizado (DistanceMode.FAST)
+- exact: Vincenty vectorizado sobre WGS84 (DistanceMode.EXACT)
+
+Para fast y exact también se mide el error máximo frente a geopy en la
+muestra.
+
+Uso (desde backend/):
+    python -m scripts.benchmarks.distance_matrix --points 1000
+    python -m scripts.benchmarks.distance_matrix --points 1000 --full
+"""
+
+import argparse
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+from app.core.geodesy import haversine_matrix, vincenty_matrix
+
+
+def per_pair(points: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    """Distancias de los pares indicados con una llamada a geodesic por par"""
+    return np.array([
+        geodesic((points[i, 1], points[i, 0]), (points[j, 1], points[j, 0])).kilometers
+        for i, j in pairs
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=1000)
+    parser.add_argument("--sample", type=int, default=20000, help="Pares medidos en per-pair")
+    parser.add_argument("--full", action="store_true", help="Calcular per-pair completo")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(args.seed)
+    n = args.points
+    points = np.column_stack([rng.uniform(-180, 180, n), rng.uniform(-85, 85, n)])
+    total_pairs = n * n
+    
+    if args.full:
+        pairs = np.array([(i, j) for i in range(n) for j in range(n)])
+    else:
+        pairs = rng.integers(0, n, size=(min(args.sample, total_pairs), 2))
+    
+    start = time.perf_counter()
+    reference = per_pair(points, pairs)
+    elapsed = time.perf_counter() - start
+    per_pair_total = elapsed * total_pairs / len(pairs)
+    label = "measured" if args.full else f"extrapolated from {len(pairs)} pairs"
+    print(f"{n}x{n} matrix ({total_pairs} pairs)")
+    print(f"per-pair geodesic: {per_pair_total:9.3f} s  ({label})")
+    
+    for name, compute in (("fast (haversine)", haversine_matrix), ("exact (vincenty)", vincenty_matrix)):
+        start = time.perf_counter()
+        matrix = compute(points)
+        elapsed = time.perf_counter() - start
+        
+        errors = np.abs(matrix[pairs[:, 0], pairs[:, 1]] - reference)
+        relative = errors / np.where(reference > 0, reference, 1)
+        print(
+            f"{name}: {elapsed:9.3f} s  x{per_pair_total / elapsed:8.0f}  "
+            f"max error {errors.max():.6f} km ({relative.max() * 100:.3f} %)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark de ingesta de eventos de campañas
+
+Mide los eventos por segundo que acepta EventAggregator.add_events (el camino
+de cada request) y el coste del volcado a MongoDB con bulk_write $inc,
+comparado con la alternativa de un update_one $inc por evento.
+
+Sin --mongo-url los volcados van a una colección nula en memoria y solo se
+mide la CPU del acumulador. Con --mongo-url se usa una base de datos dedicada.
+
+Uso (desde backend/):
+    python -m scripts.benchmarks.event_ingestion --events 1000000 --campaigns 1000
+    python -m scripts.benchmarks.event_ingestion --mongo-url mongodb://localhost:27017
+
+ATENCIÓN: con --mongo-url la base de datos indicada con --db se elimina al terminar.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from bson import ObjectId
+
+from app.models.event import CampaignEvent, EventType
+from app.services.event_service import EventAggregator
+
+
+class NullCollection:
+    """Colección que descarta las escrituras contando operaciones"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.operations = 0
+    
+    async def bulk_write(self, operations, ordered=True):
+        self.operations += len(operations)
+    
+    async def update_one(self, filter, update):
+        self.operations += 1
+
+
+class NullDatabase:
+    def __init__(self):
+        self.campaigns = NullCollection("campaigns")
+        self.campaign_metrics = NullCollection("campaign_metrics")
+
+
+def make_batches(campaign_ids: list, total: int, batch_size: int) -> list:
+    """Lotes de eventos aleatorios, construidos antes de medir"""
+    types = [EventType.VIEW] * 90 + [EventType.CLICK] * 9 + [EventType.CONVERSION]
+    batches = []
+    for start in range(0, total, batch_size):
+        batches.append([
+            CampaignEvent(campaign_id=random.choice(campaign_ids), type=random.choice(types))
+            for _ in range(min(batch_size, total - start))
+        ])
+    return batches
+
+
+async def run(args):
+    random.seed(42)
+    campaign_ids = [str(ObjectId()) for _ in range(args.campaigns)]
+    
+    client = None
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+        db = client[args.db]
+        await db.campaigns.insert_many([
+            {"_id": ObjectId(cid), "views_count": 0, "clicks_count": 0, "conversions_count": 0}
+            for cid in campaign_ids
+        ])
+    else:
+        db = NullDatabase()
+    
+    try:
+        batches = make_batches(campaign_ids, args.events, args.batch_size)
+        aggregator = EventAggregator(
+            db,
+            flush_threshold=args.events + 1,
+            max_pending_events=args.events + 1,
+            bulk_batch_size=args.bulk_batch_size
+        )
+        
+        start = time.perf_counter()
+        for batch in batches:
+            aggregator.add_events(batch)
+        ingest_seconds = time.perf_counter() - start
+        
+        updates = len(aggregator._pending) + len(aggregator._pending_buckets)
+        start = time.perf_counter()
+        await aggregator.flush()
+        flush_seconds = time.perf_counter() - start
+        
+        print(f"events:            {args.events}")
+        print(f"campaigns:         {args.campaigns}")
+        print(f"request batch:     {args.batch_size}")
+        print(f"add_events:        {args.events / ingest_seconds:,.0f} events/s")
+        print(f"flush:             {flush_seconds * 1000:.1f} ms ({aggregator.stats['flushed']} events, "
+              f"{updates} upserts)")
+        
+        if args.mongo_url and args.per_event:
+            # Alternativa ingenua: un update_one por evento (sobre una muestra)
+            sample = [event for batch in batches for event in batch][:args.per_event]
+            start = time.perf_counter()
+            for event in sample:
+                await db.campaigns.update_one(
+                    {"_id": ObjectId(event.campaign_id)},
+                    {"$inc": {"views_count": event.count}}
+                )
+            per_event_seconds = time.perf_counter() - start
+            print(f"update_one/event:  {len(sample) / per_event_seconds:,.0f} events/s")
+    finally:
+        if client is not None:
+            await client.drop_database(args.db)
+            client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=1000000)
+    parser.add_argument("--campaigns", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=500, help="Eventos por request")
+    parser.add_argument("--bulk-batch-size", type=int, default=1000)
+    parser.add_argument("--mongo-url", default=None)
+    parser.add_argument("--db", default="inmax_benchmark_events")
+    parser.add_argument("--per-event", type=int, default=10000, help="Muestra para update_one por evento")
+    args = parser.parse_args()
+    
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Prueba de carga: impacto de /users/login en la latencia de otros endpoints
+
+Contra un servidor en marcha, mide la latencia de un endpoint ligero
+(/health por defecto) primero en reposo y después mientras varios clientes
+hacen login en bucle. Con bcrypt en el event loop la latencia del endpoint
+ligero sube a cientos de ms; con el pool de hash debe mantenerse cercana a
+la de reposo, y los logins que excedan la cola reciben 503.
+
+Uso (desde backend/, con la API arrancada en un único worker):
+    python -m scripts.benchmarks.login_load --base-url http://localhost:8000 --login-clients 16
+
+El usuario indicado se registra si no existe.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def summarize(samples: list) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"n={len(samples):>5}  p50={statistics.median(samples):8.2f} ms  p99={p99:8.2f} ms  max={samples[-1]:8.2f} ms"
+
+
+async def probe(client: httpx.AsyncClient, path: str, duration: float, interval: float) -> list:
+    """Latencias del endpoint ligero durante `duration` segundos"""
+    samples = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+    return samples
+
+
+async def login_loop(client: httpx.AsyncClient, credentials: dict, deadline: float, results: dict):
+    """Hacer login en bucle hasta `deadline`"""
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.post("/api/v1/users/login", json=credentials)
+        elapsed = (time.perf_counter() - start) * 1000
+        results.setdefault(response.status_code, []).append(elapsed)
+
+
+async def ensure_user(client: httpx.AsyncClient, username: str, password: str):
+    await client.post("/api/v1/users/register", json={
+        "username": username,
+        "email": f"{username}@example.com",
+        "password": password,
+        "full_name": "Load Test"
+    })
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.login_clients + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30.0, limits=limits) as client:
+        await ensure_user(client, args.username, args.password)
+        credentials = {"username": args.username, "password": args.password}
+        
+        idle = await probe(client, args.probe_path, args.duration, args.interval)
+        print(f"{args.probe_path} idle:        {summarize(idle)}")
+        
+        logins = {}
+        deadline = time.perf_counter() + args.duration
+        tasks = [
+            asyncio.create_task(login_loop(client, credentials, deadline, logins))
+            for _ in range(args.login_clients)
+        ]
+        loaded = await probe(client, args.probe_path, args.duration, args.interval)
+        await asyncio.gather(*tasks)
+        
+        print(f"{args.probe_path} under login: {summarize(loaded)}")
+        for status_code, samples in sorted(logins.items()):
+            print(f"login {status_code}:          {summarize(samples)}")
+        
+        stats = await client.get("/health/password-hashing")
+        if stats.status_code == 200:
+            print(f"hash pool: {stats.json()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--probe-path", default="/health")
+    parser.add_argument("--login-clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por fase")
+    parser.add_argument("--interval", type=float, default=0.01, help="Pausa entre sondas")
+    parser.add_argument("--username", default="loadtest")
+    parser.add_argument("--password", default="LoadTest123!")
+    args = parser.parse_args()
+    
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Benchmark del cliente HTTP para Mapbox: cliente por petición vs compartido
+
+Arranca en otro proceso un servidor stub HTTPS (uvicorn con certificado
+autofirmado) que responde como la API de geocodificación de Mapbox, y lanza
+contra él una carga en bucle cerrado: cada cliente concurrente envía la
+siguiente petición en cuanto recibe la respuesta anterior.
+
+- per-request: un httpx.AsyncClient nuevo por llamada (comportamiento
+  anterior de GeolocationService), con handshake TCP + TLS cada vez
+- shared: el cliente de app.core.http_client, con keep-alive y HTTP/2 si el
+  servidor lo negocia
+
+En local el handshake solo cuesta CPU; contra api.mapbox.com cada handshake
+añade además varios RTT, así que la diferencia real es mayor.
+
+Uso (desde backend/):
+    python -m scripts.benchmarks.mapbox_client --concurrency 16 --duration 10
+    python -m scripts.benchmarks.mapbox_client --delay-ms 20
+"""
+
+import argparse
+import asyncio
+import datetime
+import multiprocessing
+import os
+import socket
+import statistics
+import tempfile
+import time
+
+import httpx
+
+from app.core.http_client import build_http_client
+
+STUB_RESPONSE = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "id": "place.123",
+            "text": "Madrid",
+            "place_name": "Madrid, España",
+            "center": [-3.7038, 40.4168],
+            "place_type": ["place"],
+            "context": [],
+            "relevance": 1
+        }
+    ]
+}
+
+
+def write_self_signed_cert(directory: str) -> tuple:
+    """Generar un certificado autofirmado para localhost"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+    import ipaddress
+    
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.utcnow()
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(
+            x509.SubjectAlternativeName([
+                x509.DNSName("localhost"),
+                x509.IPAddress(ipaddress.ip_address("127.0.0.1"))
+            ]),
+            critical=False
+        )
+        .sign(key, hashes.SHA256())
+    )
+    
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.TraditionalOpenSSL,
+            serialization.NoEncryption()
+        ))
+    return cert_path, key_path
+
+
+def run_stub_server(port: int, cert_path: str, key_path: str, delay_ms: float):
+    """Servidor stub de geocodificación (se ejecuta en un proceso aparte)"""
+    import uvicorn
+    from fastapi import FastAPI
+    
+    stub = FastAPI()
+    
+    @stub.get("/geocoding/v5/mapbox.places/{query}.json")
+    async def geocode(query: str):
+        if delay_ms:
+            await asyncio.sleep(delay_ms / 1000)
+        return STUB_RESPONSE
+    
+    uvicorn.run(
+        stub,
+        host="127.0.0.1",
+        port=port,
+        ssl_certfile=cert_path,
+        ssl_keyfile=key_path,
+        log_level="warning"
+    )
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("Stub server did not start")
+
+
+def summarize(samples: list, duration: float) -> str:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return (
+        f"{len(samples) / duration:8.0f} req/s  p50={statistics.median(samples):7.2f} ms  "
+        f"p99={p99:7.2f} ms"
+    )
+
+
+async def closed_loop(request, concurrency: int, duration: float) -> list:
+    """Cada cliente envía la siguiente petición al recibir la anterior"""
+    samples = []
+    deadline = time.perf_counter() + duration
+    
+    async def worker():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await request()
+            response.raise_for_status()
+            samples.append((time.perf_counter() - start) * 1000)
+    
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+async def run(args, base_url: str, cert_path: str):
+    url = f"{base_url}/geocoding/v5/mapbox.places/madrid.json"
+    params = {"access_token": "stub", "types": "place"}
+    
+    async def per_request():
+        async with httpx.AsyncClient(verify=cert_path) as client:
+            return await client.get(url, params=params, timeout=10.0)
+    
+    samples = await closed_loop(per_request, args.concurrency, args.duration)
+    print(f"per-request client: {summarize(samples, args.duration)}")
+    
+    async with build_http_client(verify=cert_path) as client:
+        async def shared():
+            return await client.get(url, params=params)
+        
+        samples = await closed_loop(shared, args.concurrency, args.duration)
+        version = (await shared()).http_version
+    print(f"shared client:      {summarize(samples, args.duration)}  ({version})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por escenario")
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Latencia simulada del servidor")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path, key_path = write_self_signed_cert(directory)
+        port = free_port()
+        server = multiprocessing.Process(
+            target=run_stub_server,
+            args=(port, cert_path, key_path, args.delay_ms),
+            daemon=True
+        )
+        server.start()
+        try:
+            wait_for_port(port)
+            asyncio.run(run(args, f"https://127.0.0.1:{port}", cert_path))
+        finally:
+            server.terminate()
+            server.join()
+
+
+if __name__ == "__main__":
+    main()
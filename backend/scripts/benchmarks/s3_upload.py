@@ -0,0 +1,132 @@
+"""
+Benchmark de subidas a S3: rendimiento por tamaño y bloqueo del event loop
+
+Para cada tamaño de archivo sube --uploads archivos (--concurrency a la vez)
+con tres estrategias:
+
+- blocking: boto3 upload_fileobj llamado directamente desde el event loop
+  (comportamiento anterior de MediaService)
+- single: S3Storage con una sola petición PUT por archivo, fuera del loop
+- multipart: S3Storage con multipart y partes en paralelo
+
+Mide MB/s y el retraso máximo del event loop (un ticker cada 10 ms): con
+blocking el loop queda congelado mientras dura cada subida.
+
+Necesita un S3 local, por ejemplo:
+    docker run -p 9000:9000 minio/minio server /data
+    moto_server -p 5000   (pip install "moto[server]")
+
+Uso (desde backend/):
+    python -m scripts.benchmarks.s3_upload --endpoint-url http://localhost:5000 --sizes 1,8,32,100
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+from app.core.s3_storage import S3Storage
+
+MB = 1024 * 1024
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Mayor retraso (ms) observado al despertar cada `interval` segundos"""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, (time.perf_counter() - start - interval) * 1000)
+    return worst
+
+
+async def run(label: str, upload, payload: bytes, uploads: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(i: int):
+        async with semaphore:
+            await upload(io.BytesIO(payload), f"benchmark/{label}/{len(payload)}/{i}")
+    
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(uploads)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lag = await lag_task
+    
+    throughput = len(payload) * uploads / MB / elapsed
+    print(f"  {label:<9} {throughput:8.1f} MB/s  {elapsed / uploads * 1000:9.1f} ms/file  loop lag max {lag:8.1f} ms")
+
+
+async def main_async(args):
+    client_args = {
+        "aws_access_key_id": args.access_key,
+        "aws_secret_access_key": args.secret_key,
+        "region_name": args.region,
+        "endpoint_url": args.endpoint_url
+    }
+    client = boto3.client("s3", **client_args)
+    try:
+        client.create_bucket(Bucket=args.bucket)
+    except ClientError:
+        pass  # ya existe
+    
+    storage_args = {
+        "bucket": args.bucket,
+        "region": args.region,
+        "access_key_id": args.access_key,
+        "secret_access_key": args.secret_key,
+        "endpoint_url": args.endpoint_url,
+        "acl": None,
+        "max_concurrency": args.max_concurrency,
+        "multipart_chunksize": args.chunk_mb * MB
+    }
+    single = S3Storage(**storage_args, multipart_threshold=1024 * 1024 * MB)
+    multipart = S3Storage(**storage_args, multipart_threshold=args.chunk_mb * MB)
+    
+    async def blocking(fileobj, key):
+        client.upload_fileobj(fileobj, args.bucket, key)
+    
+    async def single_put(fileobj, key):
+        await single.upload_fileobj(fileobj, key)
+    
+    async def multipart_upload(fileobj, key):
+        await multipart.upload_fileobj(fileobj, key)
+    
+    try:
+        for size_mb in args.sizes:
+            payload = os.urandom(int(size_mb * MB))
+            print(f"{size_mb} MB x {args.uploads} (concurrency {args.concurrency}):")
+            await run("blocking", blocking, payload, args.uploads, args.concurrency)
+            await run("single", single_put, payload, args.uploads, args.concurrency)
+            await run("multipart", multipart_upload, payload, args.uploads, args.concurrency)
+    finally:
+        single.shutdown()
+        multipart.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint-url", required=True, help="S3 local (MinIO, moto server)")
+    parser.add_argument("--bucket", default="inmax-benchmark")
+    parser.add_argument("--region", default="us-east-1")
+    parser.add_argument("--access-key", default="testing")
+    parser.add_argument("--secret-key", default="testing")
+    parser.add_argument("--sizes", default="1,8,32,100", help="Tamaños en MB separados por comas")
+    parser.add_argument("--uploads", type=int, default=8, help="Archivos por tamaño y estrategia")
+    parser.add_argument("--concurrency", type=int, default=4, help="Subidas simultáneas")
+    parser.add_argument("--chunk-mb", type=int, default=8, help="Tamaño de parte (y umbral) multipart")
+    parser.add_argument("--max-concurrency", type=int, default=10, help="Partes en paralelo")
+    args = parser.parse_args()
+    args.sizes = [float(size) for size in args.sizes.split(",")]
+    
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
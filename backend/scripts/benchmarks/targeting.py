@@ -0,0 +1,118 @@
+"""
+Benchmark de segmentación: "¿qué campañas activas cubren este punto?"
+
+Genera N campañas con objetivos circle y polygon repartidos por una zona y
+consulta puntos aleatorios de esa misma zona:
+
+- scan: comprobar todas las geometrías en cada consulta (vectorizado, pero
+  sin árbol ni geometrías preparadas)
+- index: TargetingIndex (STRtree + geometrías preparadas)
+- updates: consultas intercaladas con actualizaciones de campañas, que pasan
+  por la capa de cambios hasta la siguiente reconstrucción del árbol
+
+Uso (desde backend/):
+    python -m scripts.benchmarks.targeting --campaigns 20000 --queries 10000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import shapely
+
+from app.core.targeting import TargetingIndex, build_target_geometry
+
+
+def make_campaigns(count: int, rng: np.random.Generator, bounds: tuple) -> list:
+    """Campañas activas con un círculo o un polígono dentro de `bounds`"""
+    min_lon, min_lat, max_lon, max_lat = bounds
+    now = datetime.utcnow()
+    campaigns = []
+    for i in range(count):
+        lon = float(rng.uniform(min_lon, max_lon))
+        lat = float(rng.uniform(min_lat, max_lat))
+        if i % 4:
+            location = {"type": "circle", "coordinates": [lon, lat], "radius": float(rng.uniform(1, 25))}
+        else:
+            size = float(rng.uniform(0.02, 0.3))
+            location = {
+                "type": "polygon",
+                "coordinates": [lon, lat],
+                "polygon_coordinates": [
+                    [lon, lat], [lon + size, lat], [lon + size, lat + size], [lon, lat + size]
+                ]
+            }
+        campaigns.append({
+            "_id": str(i),
+            "status": "active",
+            "start_date": now - timedelta(days=1),
+            "end_date": now + timedelta(days=30),
+            "target_locations": [location]
+        })
+    return campaigns
+
+
+def timed(label: str, queries: int, run) -> float:
+    start = time.perf_counter()
+    hits = run()
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {elapsed / queries * 1e6:10.1f} us/query  ({hits / queries:.2f} campaigns/point)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--campaigns", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--scan-queries", type=int, default=200, help="Consultas medidas en scan")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(args.seed)
+    bounds = (-9.5, 36.0, 3.3, 43.8)  # Península Ibérica
+    campaigns = make_campaigns(args.campaigns, rng, bounds)
+    points = np.column_stack([
+        rng.uniform(bounds[0], bounds[2], args.queries),
+        rng.uniform(bounds[1], bounds[3], args.queries)
+    ])
+    
+    start = time.perf_counter()
+    index = TargetingIndex()
+    index.load(campaigns)
+    print(f"{args.campaigns} campaigns indexed in {time.perf_counter() - start:.2f} s")
+    
+    geometries = np.array(
+        [build_target_geometry(campaign["target_locations"][0]) for campaign in campaigns],
+        dtype=object
+    )
+    scan_points = points[:args.scan_queries]
+    
+    def scan():
+        return sum(
+            int(shapely.intersects_xy(geometries, lon, lat).sum())
+            for lon, lat in scan_points
+        )
+    
+    scan_elapsed = timed("scan ", len(scan_points), scan) / len(scan_points)
+    index_elapsed = timed(
+        "index",
+        len(points),
+        lambda: sum(len(index.query(lon, lat)) for lon, lat in points)
+    ) / len(points)
+    print(f"index speedup: x{scan_elapsed / index_elapsed:.0f}")
+    
+    def with_updates():
+        hits = 0
+        for i, (lon, lat) in enumerate(points):
+            if i % 10 == 0:
+                index.upsert(campaigns[int(rng.integers(len(campaigns)))])
+            hits += len(index.query(lon, lat))
+        return hits
+    
+    timed("index with 1 update every 10 queries", len(points), with_updates)
+    print(f"stats: {index.get_stats()}")
+
+
+if __name__ == "__main__":
+    main()
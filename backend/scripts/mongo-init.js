@@ -71,6 +71,9 @@ db.createCollection('campaigns', {
           minLength: 1,
           maxLength: 200
         },
+        name_normalized: {
+          bsonType: "string"
+        },
         description: {
           bsonType: ["string", "null"],
           maxLength: 1000
@@ -124,7 +127,8 @@ db.createCollection('campaigns', {
               },
               radius: {
                 bsonType: ["number", "null"],
-                minimum: 0
+                minimum: 0,
+                maximum: 10000
               },
               polygon_coordinates: {
                 bsonType: ["array", "null"],
@@ -152,6 +156,10 @@ db.createCollection('campaigns', {
             }
           }
         },
+        target_geometry: {
+          // GeoJSON derivado de target_locations para el índice 2dsphere
+          bsonType: ["object", "null"]
+        },
         media_files: {
           bsonType: "array",
           items: {
@@ -213,6 +221,12 @@ db.createCollection('media_files', {
         url: {
           bsonType: "string"
         },
+        checksum: {
+          bsonType: ["string", "null"]
+        },
+        storage_key: {
+          bsonType: ["string", "null"]
+        },
         thumbnail_url: {
           bsonType: ["string", "null"]
         },
@@ -226,6 +240,17 @@ db.createCollection('media_files', {
         processed_date: {
           bsonType: ["date", "null"]
         },
+        processing_progress: {
+          bsonType: "int",
+          minimum: 0,
+          maximum: 100
+        },
+        detected_mime_type: {
+          bsonType: ["string", "null"]
+        },
+        renditions: {
+          bsonType: ["array", "null"]
+        },
         campaign_id: {
           bsonType: "objectId"
         },
@@ -318,8 +343,11 @@ db.campaigns.createIndex({ "status": 1 });
 db.campaigns.createIndex({ "start_date": 1 });
 db.campaigns.createIndex({ "end_date": 1 });
 db.campaigns.createIndex({ "created_at": -1 });
+db.campaigns.createIndex({ "user_id": 1, "created_at": -1, "_id": -1 }); // Paginación keyset
+db.campaigns.createIndex({ "user_id": 1, "status": 1, "created_at": -1, "_id": -1 });
 db.campaigns.createIndex({ "name": "text", "description": "text" }); // Índice de texto para búsqueda
-db.campaigns.createIndex({ "target_locations": "2dsphere" }); // Índice geoespacial
+db.campaigns.createIndex({ "user_id": 1, "name_normalized": 1 }); // Autocompletado por prefijo
+db.campaigns.createIndex({ "target_geometry": "2dsphere" }); // GeoJSON de target_locations
 
 // Índices para archivos multimedia
 db.media_files.createIndex({ "campaign_id": 1 });
@@ -327,6 +355,13 @@ db.media_files.createIndex({ "user_id": 1 });
 db.media_files.createIndex({ "file_type": 1 });
 db.media_files.createIndex({ "status": 1 });
 db.media_files.createIndex({ "upload_date": -1 });
+db.media_files.createIndex({ "user_id": 1, "upload_date": -1, "_id": -1 }); // Paginación keyset
+db.media_files.createIndex({ "user_id": 1, "campaign_id": 1, "upload_date": -1, "_id": -1 });
+
+// Índices para métricas por intervalos
+db.campaign_metrics.createIndex({ "campaign_id": 1, "granularity": 1, "bucket": 1 }, { unique: true });
+db.campaign_metrics.createIndex({ "granularity": 1, "bucket": 1 }); // Rollups
+db.campaign_metrics.createIndex({ "expires_at": 1 }, { expireAfterSeconds: 0 }); // Retención de buckets finos
 
 // Índices para ubicaciones
 db.locations.createIndex({ "coordinates": "2dsphere" }); // Índice geoespacial
@@ -334,5 +369,12 @@ db.locations.createIndex({ "name": 1 });
 db.locations.createIndex({ "country": 1 });
 db.locations.createIndex({ "region": 1 });
 db.locations.createIndex({ "city": 1 });
+db.locations.createIndex(
+  { "mapbox_id": 1 },
+  { unique: true, partialFilterExpression: { "mapbox_id": { $type: "string" } } }
+); // Resultados de Mapbox persistidos
+db.locations.createIndex({ "search_keys": 1 });
+db.locations.createIndex({ "geohashes": 1 });
+db.locations.createIndex({ "expires_at": 1 }, { expireAfterSeconds: 0 }); // Retención del caché
 
 print("Database initialization completed successfully!");
@@ -0,0 +1,54 @@
+"""
+Fixtures comunes: Redis en memoria (fakeredis, con Lua) y una colección
+mínima con la parte de la API de Motor que usa el worker de multimedia.
+"""
+
+import copy
+
+import fakeredis
+import pytest
+
+from app.core.job_queue import RedisJobQueue
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int):
+        self.matched_count = matched_count
+
+
+class MemoryCollection:
+    """find_one/update_one por _id sobre un diccionario"""
+    
+    def __init__(self):
+        self.docs = {}
+    
+    async def find_one(self, query):
+        doc = self.docs.get(query["_id"])
+        return copy.deepcopy(doc) if doc is not None else None
+    
+    async def update_one(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc is None:
+            return UpdateResult(0)
+        doc.update(update["$set"])
+        return UpdateResult(1)
+
+
+class MemoryDatabase:
+    def __init__(self):
+        self.media_files = MemoryCollection()
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+
+
+@pytest.fixture
+def queue(redis_client):
+    return RedisJobQueue(redis_client, "test:jobs", dead_letter_max=5)
+
+
+@pytest.fixture
+def db():
+    return MemoryDatabase()
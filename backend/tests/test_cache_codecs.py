@@ -0,0 +1,86 @@
+"""
+Tests de los códecs del caché: ida y vuelta con cada combinación de códec y
+compresión, datetimes y valores anteriores al byte de cabecera
+"""
+
+import datetime
+import json
+
+import pytest
+
+from app.core.cache_codecs import (
+    CODECS_BY_NAME,
+    COMPRESSIONS_BY_NAME,
+    HEADER_MARKER,
+    CacheSerializer
+)
+from app.core.config import settings
+
+VALUE = {
+    "name": "Campaña de verano",
+    "budget": 1500.5,
+    "views": 12,
+    "active": True,
+    "tags": ["a", "b"],
+    "description": None,
+    "locations": [{"coordinates": [-3.7, 40.4]}] * 50
+}
+
+
+@pytest.mark.parametrize("compression", sorted(COMPRESSIONS_BY_NAME))
+@pytest.mark.parametrize("codec", sorted(CODECS_BY_NAME))
+def test_round_trip_and_header_byte(codec, compression):
+    serializer = CacheSerializer(codec=codec, compression=compression, compress_threshold=0)
+    data = serializer.dumps(VALUE)
+    
+    assert serializer.codec.name == codec
+    assert data[0] == HEADER_MARKER | (COMPRESSIONS_BY_NAME[compression] << 4) | serializer.codec.codec_id
+    assert serializer.loads(data) == VALUE
+    # La lectura no depende de la configuración con la que se escribió
+    assert CacheSerializer(codec="json", compression="none").loads(data) == VALUE
+
+
+def test_small_values_are_not_compressed():
+    serializer = CacheSerializer(codec="msgpack", compression="zstd", compress_threshold=1024)
+    data = serializer.dumps({"id": 1})
+    
+    assert (data[0] >> 4) & 0x07 == COMPRESSIONS_BY_NAME["none"]
+    assert serializer.loads(data) == {"id": 1}
+
+
+def test_default_codec_keeps_datetimes():
+    created_at = datetime.datetime(2024, 5, 17, 10, 30, 15, 123456)
+    serializer = CacheSerializer(codec=settings.CACHE_CODEC, compression=settings.CACHE_COMPRESSION)
+    
+    value = serializer.loads(serializer.dumps({"created_at": created_at, "history": [created_at]}))
+    assert value == {"created_at": created_at, "history": [created_at]}
+    assert type(value["created_at"]) is datetime.datetime
+
+
+@pytest.mark.parametrize("compression", sorted(COMPRESSIONS_BY_NAME))
+def test_msgpack_datetimes_round_trip_as_naive_utc(compression):
+    serializer = CacheSerializer(codec="msgpack", compression=compression, compress_threshold=0)
+    aware = datetime.datetime(2024, 5, 17, 12, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+    before_epoch = datetime.datetime(1969, 7, 20, 20, 17, 40)
+    
+    value = serializer.loads(serializer.dumps([aware, before_epoch]))
+    assert value == [datetime.datetime(2024, 5, 17, 10, 30), before_epoch]
+
+
+@pytest.mark.parametrize("codec", ["json", "orjson"])
+def test_json_codecs_return_datetimes_as_strings(codec):
+    serializer = CacheSerializer(codec=codec, compression="none")
+    created_at = datetime.datetime(2024, 5, 17, 10, 30)
+    
+    value = serializer.loads(serializer.dumps({"created_at": created_at}))
+    assert isinstance(value["created_at"], str)
+    assert datetime.datetime.fromisoformat(value["created_at"].replace(" ", "T")) == created_at
+
+
+def test_values_without_header_are_read_as_json():
+    serializer = CacheSerializer()
+    legacy = json.dumps(VALUE)
+    
+    assert serializer.loads(legacy) == VALUE
+    assert serializer.loads(legacy.encode("utf-8")) == VALUE
+    assert serializer.loads(None) is None
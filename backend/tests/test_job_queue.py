@@ -0,0 +1,131 @@
+"""
+Tests de RedisJobQueue: reserva, confirmación, reintentos, dead letter y
+recuperación de trabajos de workers caídos
+"""
+
+import json
+import time
+
+from app.core.job_queue import Job
+
+
+async def test_reserve_moves_job_to_processing_until_ack(queue, redis_client):
+    job_id = await queue.enqueue({"file_id": "a"})
+    
+    job = await queue.reserve("w1", timeout=0.1)
+    assert job.id == job_id
+    assert job.data == {"file_id": "a"}
+    assert job.attempts == 0
+    assert await redis_client.llen(queue.ready_key) == 0
+    assert await redis_client.llen(queue.processing_key("w1")) == 1
+    
+    await queue.ack("w1", job)
+    assert await redis_client.llen(queue.processing_key("w1")) == 0
+
+
+async def test_reserve_is_fifo_and_returns_none_when_empty(queue):
+    await queue.enqueue({"n": 1})
+    await queue.enqueue({"n": 2})
+    
+    assert (await queue.reserve("w1", timeout=0.1)).data == {"n": 1}
+    assert (await queue.reserve("w1", timeout=0.1)).data == {"n": 2}
+    assert await queue.reserve("w1", timeout=0.1) is None
+
+
+async def test_invalid_payload_goes_to_dead_letter(queue, redis_client):
+    await redis_client.lpush(queue.ready_key, "not json")
+    
+    assert await queue.reserve("w1", timeout=0.1) is None
+    assert await redis_client.llen(queue.processing_key("w1")) == 0
+    assert await redis_client.lrange(queue.dead_key, 0, -1) == ["not json"]
+
+
+async def test_retry_is_delayed_until_due(queue, redis_client):
+    await queue.enqueue({"file_id": "a"})
+    job = await queue.reserve("w1", timeout=0.1)
+    
+    await queue.retry("w1", job, "boom", delay=60)
+    assert await redis_client.llen(queue.processing_key("w1")) == 0
+    assert await redis_client.zcard(queue.delayed_key) == 1
+    assert await queue.promote_due() == 0
+    
+    # Adelantar el vencimiento en lugar de esperar
+    payload = (await redis_client.zrange(queue.delayed_key, 0, -1))[0]
+    await redis_client.zadd(queue.delayed_key, {payload: int(time.time() * 1000) - 1})
+    assert await queue.promote_due() == 1
+    
+    retried = await queue.reserve("w1", timeout=0.1)
+    assert retried.id == job.id
+    assert retried.attempts == 1
+    assert retried.last_error == "boom"
+
+
+async def test_dead_letter_keeps_error_and_is_capped(queue, redis_client):
+    for n in range(7):
+        await queue.enqueue({"n": n})
+        job = await queue.reserve("w1", timeout=0.1)
+        await queue.dead_letter("w1", job, f"error {n}")
+    
+    assert await redis_client.llen(queue.processing_key("w1")) == 0
+    dead = await queue.dead_letters()
+    assert len(dead) == 5  # dead_letter_max
+    assert dead[0]["data"] == {"n": 6}
+    assert dead[0]["last_error"] == "error 6"
+    assert dead[0]["attempts"] == 1
+    
+    assert await queue.requeue_dead(limit=2) == 2
+    requeued = await queue.reserve("w2", timeout=0.1)
+    assert requeued.attempts == 0
+    assert requeued.last_error is None
+
+
+async def test_recover_requeues_jobs_of_stale_workers(queue, redis_client):
+    await queue.enqueue({"file_id": "a"})
+    await queue.enqueue({"file_id": "b"})
+    await queue.reserve("dead", timeout=0.1)
+    await queue.heartbeat("alive")
+    await queue.reserve("alive", timeout=0.1)
+    await redis_client.zadd(queue.workers_key, {"dead": 0})
+    
+    assert await queue.recover(stale_after=60) == 1
+    assert await redis_client.llen(queue.processing_key("dead")) == 0
+    assert await redis_client.llen(queue.processing_key("alive")) == 1
+    assert await redis_client.zrange(queue.workers_key, 0, -1) == ["alive"]
+    
+    recovered = Job((await redis_client.lrange(queue.ready_key, 0, -1))[0])
+    assert recovered.data == {"file_id": "a"}
+    assert recovered.attempts == 1
+    assert recovered.last_error == "Worker stopped while processing"
+
+
+async def test_unregister_returns_reserved_jobs_without_counting_an_attempt(queue, redis_client):
+    await queue.enqueue({"file_id": "a"})
+    await queue.heartbeat("w1")
+    await queue.reserve("w1", timeout=0.1)
+    
+    await queue.unregister("w1")
+    assert await redis_client.llen(queue.processing_key("w1")) == 0
+    assert await redis_client.zcard(queue.workers_key) == 0
+    
+    job = await queue.reserve("w2", timeout=0.1)
+    assert job.data == {"file_id": "a"}
+    assert job.attempts == 0
+
+
+async def test_get_stats(queue, redis_client):
+    await queue.enqueue({"n": 1})
+    await queue.enqueue({"n": 2})
+    await queue.heartbeat("w1")
+    job = await queue.reserve("w1", timeout=0.1)
+    await redis_client.zadd(queue.delayed_key, {json.dumps({"id": "x"}): 0})
+    await queue.enqueue({"n": 3})
+    await queue.dead_letter("w1", job, "boom")
+    
+    assert await queue.get_stats() == {
+        "queue": "test:jobs",
+        "ready": 2,
+        "delayed": 1,
+        "dead": 1,
+        "processing": 0,
+        "workers": 1
+    }
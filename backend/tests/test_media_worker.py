@@ -0,0 +1,245 @@
+"""
+Tests del worker de multimedia: procesamiento, reintentos, dead letter,
+consumidores que sobreviven a errores y parada ordenada
+"""
+
+import asyncio
+import io
+
+import pytest
+from bson import ObjectId
+from PIL import Image
+
+from app.core.storage import MemoryStorage
+from app.models.media import MediaStatus
+from app.workers.media_worker import MediaWorker
+
+
+def png_bytes(width: int = 64, height: int = 32) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+async def add_media(db, storage, queue, key: str, data: bytes, mime_type: str = "image/png") -> ObjectId:
+    stored = await storage.save(io.BytesIO(data), key)
+    file_id = ObjectId()
+    db.media_files.docs[file_id] = {
+        "_id": file_id,
+        "file_type": "image",
+        "mime_type": mime_type,
+        "storage_key": stored.key,
+        "checksum": stored.checksum,
+        "url": stored.url,
+        "status": MediaStatus.UPLOADING,
+        "processing_progress": 0
+    }
+    await queue.enqueue({"file_id": str(file_id)})
+    return file_id
+
+
+def build_worker(db, queue, storage, **options) -> MediaWorker:
+    defaults = {
+        "processes": 1,
+        "concurrency": 2,
+        "max_attempts": 3,
+        "retry_base_seconds": 0.01,
+        "heartbeat_interval": 0.05
+    }
+    return MediaWorker(db, queue, storage, **{**defaults, **options})
+
+
+async def run_until(worker: MediaWorker, condition, timeout: float = 10.0):
+    """Arrancar el worker, esperar a `condition()` y pararlo"""
+    task = asyncio.create_task(worker.run())
+    try:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not await condition():
+            assert not task.done(), "worker stopped on its own"
+            assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+            await asyncio.sleep(0.02)
+    finally:
+        worker.stop()
+        await asyncio.wait_for(task, timeout)
+
+
+class SlowStorage(MemoryStorage):
+    """MemoryStorage cuya descarga tarda `delay` segundos"""
+    
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.fetch_started = asyncio.Event()
+    
+    async def fetch(self, key: str, path: str):
+        self.fetch_started.set()
+        await asyncio.sleep(self.delay)
+        await super().fetch(key, path)
+
+
+class FailingCollection:
+    """Colección con MongoDB caído"""
+    
+    async def find_one(self, query):
+        raise ConnectionError("mongo down")
+    
+    async def update_one(self, query, update):
+        raise ConnectionError("mongo down")
+
+
+async def test_processes_image_to_ready(db, queue, redis_client):
+    storage = MemoryStorage()
+    file_id = await add_media(db, storage, queue, "a.png", png_bytes())
+    worker = build_worker(db, queue, storage, rendition_options={
+        "widths": [32],
+        "formats": ["webp", "jpeg"],
+        "thumbnail_size": 16
+    })
+    
+    async def done():
+        return db.media_files.docs[file_id]["status"] == MediaStatus.READY
+    await run_until(worker, done)
+    
+    doc = db.media_files.docs[file_id]
+    assert doc["processing_progress"] == 100
+    assert doc["detected_mime_type"] == "image/png"
+    assert doc["image_metadata"]["width"] == 64
+    assert {(r["name"], r["format"]) for r in doc["renditions"]} == {
+        ("w32", "webp"), ("w32", "jpeg"), ("thumbnail", "webp"), ("thumbnail", "jpeg")
+    }
+    assert doc["thumbnail_url"].endswith("/thumbnail.jpg")
+    assert (await queue.get_stats())["ready"] == 0
+    assert await redis_client.llen(queue.processing_key(worker.worker_id)) == 0
+
+
+async def test_invalid_content_is_dead_lettered_without_retries(db, queue):
+    storage = MemoryStorage()
+    file_id = await add_media(db, storage, queue, "bad.png", b"this is not an image")
+    worker = build_worker(db, queue, storage)
+    
+    async def done():
+        return db.media_files.docs[file_id]["status"] == MediaStatus.ERROR
+    await run_until(worker, done)
+    
+    assert worker.stats == {"completed": 0, "retried": 0, "dead_lettered": 1}
+    dead = await queue.dead_letters()
+    assert dead[0]["data"] == {"file_id": str(file_id)}
+    assert "not image" in dead[0]["last_error"]
+
+
+async def test_transient_errors_are_retried_then_dead_lettered(db, queue):
+    storage = MemoryStorage()
+    file_id = await add_media(db, storage, queue, "a.png", png_bytes())
+    storage.objects.clear()  # el archivo ya no está en el almacenamiento
+    worker = build_worker(db, queue, storage, max_attempts=3)
+    
+    async def done():
+        return (await queue.get_stats())["dead"] == 1
+    await run_until(worker, done)
+    
+    assert worker.stats["retried"] == 2
+    assert worker.stats["dead_lettered"] == 1
+    doc = db.media_files.docs[file_id]
+    assert doc["status"] == MediaStatus.ERROR
+    assert doc["error_message"].startswith("KeyError")
+
+
+async def test_consumers_survive_database_outage(db, queue, redis_client):
+    db.media_files = FailingCollection()
+    for _ in range(3):
+        await queue.enqueue({"file_id": str(ObjectId())})
+    worker = build_worker(db, queue, MemoryStorage(), max_attempts=100, retry_base_seconds=0.01)
+    
+    async def retried_several_times():
+        return worker.stats["retried"] >= 9
+    await run_until(worker, retried_several_times)
+    
+    # Los tres trabajos siguen vivos (reprogramados), ninguno perdido
+    stats = await queue.get_stats()
+    assert stats["ready"] + stats["delayed"] == 3
+    assert stats["dead"] == 0
+
+
+async def test_renditions_are_deleted_when_saving_the_result_fails(db, queue, monkeypatch):
+    storage = MemoryStorage()
+    file_id = await add_media(db, storage, queue, "a.png", png_bytes())
+    update_one = db.media_files.update_one
+    
+    # MongoDB cae justo al guardar el resultado, con las versiones ya subidas
+    async def failing_update_one(query, update):
+        if update["$set"].get("status") == MediaStatus.READY:
+            raise ConnectionError("mongo down")
+        return await update_one(query, update)
+    monkeypatch.setattr(db.media_files, "update_one", failing_update_one)
+    worker = build_worker(db, queue, storage, max_attempts=2, rendition_options={
+        "widths": [32],
+        "formats": ["webp"],
+        "thumbnail_size": 16
+    })
+    
+    async def done():
+        return (await queue.get_stats())["dead"] == 1
+    await run_until(worker, done)
+    
+    assert worker.stats["retried"] == 1
+    assert db.media_files.docs[file_id]["status"] == MediaStatus.ERROR
+    assert list(storage.objects) == ["a.png"]
+
+
+async def test_consumers_survive_queue_errors(db, queue, monkeypatch):
+    storage = MemoryStorage()
+    bad_id = await add_media(db, storage, queue, "bad.png", b"this is not an image")
+    good_id = await add_media(db, storage, queue, "a.png", png_bytes())
+    
+    # Redis falla justo al descartar el primer trabajo
+    dead_letter = queue.dead_letter
+    failures = []
+    
+    async def flaky_dead_letter(worker_id, job, error):
+        if not failures:
+            failures.append(job.id)
+            raise ConnectionError("redis down")
+        await dead_letter(worker_id, job, error)
+    monkeypatch.setattr(queue, "dead_letter", flaky_dead_letter)
+    worker = build_worker(db, queue, storage, concurrency=1)
+    
+    async def done():
+        return db.media_files.docs[good_id]["status"] == MediaStatus.READY
+    await run_until(worker, done)
+    
+    assert failures
+    assert db.media_files.docs[bad_id]["status"] != MediaStatus.READY
+    # Al parar, el trabajo que no se pudo descartar vuelve a la cola
+    assert (await queue.get_stats())["ready"] == 1
+
+
+async def test_stop_waits_for_in_flight_jobs(db, queue, redis_client):
+    storage = SlowStorage(delay=0.5)
+    file_id = await add_media(db, storage, queue, "a.png", png_bytes())
+    worker = build_worker(db, queue, storage)
+    
+    task = asyncio.create_task(worker.run())
+    await asyncio.wait_for(storage.fetch_started.wait(), 5)
+    worker.stop()
+    await asyncio.wait_for(task, 10)
+    
+    # Terminado y confirmado; nada devuelto a la cola para procesarse otra vez
+    assert db.media_files.docs[file_id]["status"] == MediaStatus.READY
+    stats = await queue.get_stats()
+    assert stats["ready"] == 0
+    assert stats["processing"] == 0
+    assert await redis_client.llen(queue.processing_key(worker.worker_id)) == 0
+
+
+@pytest.mark.parametrize("file_id", ["missing", str(ObjectId())])
+async def test_jobs_for_missing_files_are_acknowledged(db, queue, file_id):
+    await queue.enqueue({"file_id": file_id})
+    worker = build_worker(db, queue, MemoryStorage())
+    
+    async def empty():
+        stats = await queue.get_stats()
+        return stats["ready"] == 0 and stats["processing"] == 0
+    await run_until(worker, empty)
+    
+    assert worker.stats == {"completed": 0, "retried": 0, "dead_lettered": 0}
+    assert (await queue.get_stats())["dead"] == 0
@@ -0,0 +1,66 @@
+"""
+Tests del limitador de tasa: ventana en Redis y bucket local por worker
+"""
+
+import asyncio
+
+from app.core.rate_limit import RATE_LIMIT_KEY_PREFIX, RateLimiter, RateLimitRule
+
+
+def build_limiter(redis_client, **options) -> RateLimiter:
+    return RateLimiter(redis_client, default_rule=None, route_rules=[], **options)
+
+
+async def redis_count(redis_client, rule: RateLimitRule, principal: str) -> int:
+    return int(await redis_client.hget(f"{RATE_LIMIT_KEY_PREFIX}{rule.name}|{principal}", "c"))
+
+
+async def test_sequential_hits_admit_exactly_the_limit(redis_client):
+    limiter = build_limiter(redis_client)
+    rule = RateLimitRule("api", 100, 60)
+    
+    decisions = [await limiter.hit(rule, "user:1") for _ in range(150)]
+    
+    assert sum(decision.allowed for decision in decisions) == 100
+    assert limiter.stats["local_hits"] > 0
+    assert await redis_count(redis_client, rule, "user:1") == 100
+    assert decisions[-1].headers()["Retry-After"]
+
+
+async def test_concurrent_hits_admit_exactly_the_limit(redis_client):
+    limiter = build_limiter(redis_client)
+    rule = RateLimitRule("api", 100, 60)
+    
+    admitted = 0
+    for _ in range(30):
+        decisions = await asyncio.gather(*(limiter.hit(rule, "user:1") for _ in range(10)))
+        admitted += sum(decision.allowed for decision in decisions)
+    
+    assert admitted == 100
+    assert limiter.stats["local_hits"] > 0
+    assert await redis_count(redis_client, rule, "user:1") == 100
+
+
+async def test_pending_hits_are_kept_when_redis_fails(redis_client):
+    limiter = build_limiter(redis_client, local_sync_every=5)
+    rule = RateLimitRule("api", 100, 60)
+    for _ in range(6):
+        await limiter.hit(rule, "user:1")
+    assert await redis_count(redis_client, rule, "user:1") == 1
+    
+    script = limiter._script
+    calls = []
+    
+    async def flaky_script(keys, args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise ConnectionError("redis down")
+        return await script(keys=keys, args=args)
+    limiter._script = flaky_script
+    
+    assert (await limiter.hit(rule, "user:1")).allowed  # fail_open
+    await limiter.hit(rule, "user:1")
+    
+    # Las 5 admitidas en local se reenvían tras el fallo, no se pierden
+    assert calls[0][3] == calls[1][3] == 5
+    assert await redis_count(redis_client, rule, "user:1") == 7